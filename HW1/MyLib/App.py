@@ -1,38 +1,26 @@
-import tkinter as tk
-import matplotlib.pyplot as plt
 import os
 import numpy as np
-import random
-
-from MyLib.simple_playground import Playground
-from MyLib.QModel import Qmodel
-
 import tkinter as tk
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.animation import FuncAnimation
-import matplotlib.pyplot as plt
+
+from MyLib.trainer import Trainer, N_EPISODES, ALHPA, GAMMA, REPLAY_BATCH_SIZE
+from MyLib.background import TrainingJob
+from MyLib.trajectory import Trajectory
+from MyLib.trajectory_io import save_trajectory
 
 
 # Global Variable
 PLAYGROUND_ROOT_PTAH = ".\\playground\\"
 INIT_PLAYGROUND = "軌道座標點.txt"
 ROOT_PATH = os.path.dirname(os.path.abspath(__name__))
+TRAJECTORY_PATH = os.path.join(ROOT_PATH, "trajectory.npy")
+CHECKPOINT_PATH = os.path.join(ROOT_PATH, "checkpoint")
 
 # UI Variable
 FIGURE_SIZE = 10
-
-# Q-Learning Variable
-N_EPISODES = 5000
-ALHPA = 0.1
-GAMMA = 0.9
+MAX_ANIMATION_FRAMES = 500  # longer runs are downsampled in draw_run
+POLL_INTERVAL = 100  # ms between two progress updates while training
 
 # Sensor Variable
-CENTER_N_STATES = 30
-COMBINE_N_STATES = 60
-MAX_CENTER_DISTANCE = 100
-MIN_CENTER_DISTANCE = 0
-MAX_COMBINE_DISTANCE = 100
-MIN_COMBINE_DISTANCE = -100
 TURN_LEFT = -40
 TURN_RIGHT = 40
 
@@ -47,16 +35,19 @@ class App():
             n_episodes = N_EPISODES,
             alpha = ALHPA,
             gamma = GAMMA,
+            replay_batch_size = REPLAY_BATCH_SIZE,
         )
 
         self.dataset_path = ROOT_PATH + "\\datasets\\train4dAll.txt"
         self.playground_path = ROOT_PATH + "\\playground\\軌道座標點.txt"
         self.track_path = ROOT_PATH + "\\track\\track4D.txt"
 
-        self.model = Qmodel(n_actions=80, n_states=(CENTER_N_STATES, COMBINE_N_STATES), alpha=0.1, gamma=0.9)
-        self.action_list = []
-        self.playground = Playground(self.playground_path)
+        self.trainer = Trainer(self.playground_path, verbose=True)
+        self.model = self.trainer.model
+        self.trajectory = Trajectory()
+        self.playground = self.trainer.playground
         self.animation = None 
+        self.job = None
 
         # UI
         self.msg = tk.Label(self.root, text="Q-Learning", font=('Arial', 16))
@@ -68,6 +59,10 @@ class App():
         self.init_config_panel()
 
     def init_plot_pannel(self):
+        # matplotlib is imported here, not at module level, so importing MyLib.App stays cheap
+        import matplotlib.pyplot as plt
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
         # Create a Matplotlib figure and axis
         self.figure, self.ax = plt.subplots()
         self.ax.set_xlim(-10, 35)
@@ -90,21 +85,45 @@ class App():
         # Button to start some process
         self.start_button = tk.Button(group3, text="Train Model", command=self.startBtn_onclick, bg="green")
         self.start_button.grid(row=1, column=0, pady=5)
+        self.cancel_button = tk.Button(group3, text="Cancel", command=self.cancelBtn_onclick, bg="light grey", state="disabled")
+        self.cancel_button.grid(row=1, column=1, pady=5)
         # reset model
         self.reset_button = tk.Button(group3, text="Reset Model", command=self.resetBtn_onclick, bg="light grey")
         self.reset_button.grid(row=2, column=0, pady=5)
         # Save button
         self.save_button = tk.Button(group3, text="Save Car Path", command=self.saveBtn_onclick, bg="grey")
         self.save_button.grid(row=3, column=0, pady=5)
+        # checkpoint buttons
+        self.save_model_button = tk.Button(group3, text="Save Model", command=self.saveModelBtn_onclick, bg="light grey")
+        self.save_model_button.grid(row=4, column=0, pady=5)
+        self.load_model_button = tk.Button(group3, text="Load Model", command=self.loadModelBtn_onclick, bg="light grey")
+        self.load_model_button.grid(row=5, column=0, pady=5)
 
 
     def resetBtn_onclick(self):
-        self.model = Qmodel(n_actions=80, n_states=(CENTER_N_STATES, COMBINE_N_STATES), alpha=0.1, gamma=0.9)
-        self.playground = Playground(self.playground_path)
+        self.trainer = Trainer(self.playground_path, verbose=True)
+        self.model = self.trainer.model
+        self.playground = self.trainer.playground
         self.draw_playground()
         self.animation.event_source.stop()        
 
+    def saveModelBtn_onclick(self):
+        self.trainer.save_checkpoint(CHECKPOINT_PATH)
+        self.msg.config(text=f"Model saved to {CHECKPOINT_PATH}", fg="black")
+
+    def loadModelBtn_onclick(self):
+        try:
+            self.trainer = Trainer.from_checkpoint(CHECKPOINT_PATH, self.playground_path, verbose=True)
+        except (OSError, ValueError) as e:
+            self.msg.config(text=str(e), fg="red")
+            return
+        self.model = self.trainer.model
+        self.playground = self.trainer.playground
+        self.msg.config(text=f"Model loaded, {self.trainer.episodes} episodes trained", fg="black")
+
     def draw_playground(self):
+        import matplotlib.pyplot as plt
+
         p = self.playground
         playground_edge_lines = [[p.lines[i].p1.x, p.lines[i].p1.y, p.lines[i].p2.x, p.lines[i].p2.y] for i in range(len(p.lines))]
 
@@ -140,89 +159,87 @@ class App():
         self.train_val_split_entry = tk.Entry(group)
         self.train_val_split_entry.insert(0, self.config["gamma"])
         self.train_val_split_entry.grid(row=2, column=1, pady=5)
+        # Entry for experience replay, 0 learns from the last step only
+        label = tk.Label(group, text="Replay batch:")
+        label.grid(row=3, column=0, pady=5)
+        self.replay_entry = tk.Entry(group)
+        self.replay_entry.insert(0, self.config["replay_batch_size"])
+        self.replay_entry.grid(row=3, column=1, pady=5)
 
     def get_configs(self) -> dict:
         return dict(
             n_episodes = int(self.epoch_entry.get()),
             alpha = float(self.lr_entry.get()),
-            gamma = float(self.train_val_split_entry.get())
+            gamma = float(self.train_val_split_entry.get()),
+            replay_batch_size = int(self.replay_entry.get())
         )
 
     def startBtn_onclick(self):
-        
-        def state_calucate(center_distance, left_distance, right_distance):
-            center_state = int((center_distance - MIN_CENTER_DISTANCE) / (MAX_CENTER_DISTANCE - MIN_CENTER_DISTANCE) * CENTER_N_STATES)
-            combine_distance = left_distance - right_distance
-            combine_state = int((combine_distance - MIN_COMBINE_DISTANCE) / (MAX_COMBINE_DISTANCE - MIN_COMBINE_DISTANCE) * COMBINE_N_STATES)
-            return center_state, combine_state
-
-        def exploration_rate(n_episodes, min_rate=0.1, max_rate=1.0, decay_rate=0.01) -> float:
-            return min_rate + (max_rate - min_rate) * np.exp(-decay_rate * n_episodes)
-
-
-        def start_training():
-            config = self.get_configs()
-            self.config = config
-
-            self.start_button.config(text="Training...", bg="grey", state="disabled")
-            self.msg.config(text="Training...", fg="black")
-            # try:
-            p = self.playground
-
-            for e in range(config["n_episodes"]):
-                sensor_output = p.reset()
-                center_distance, left_distance, right_distance = sensor_output
-                center_state, combine_state = state_calucate(center_distance, left_distance, right_distance)
-                self.action_list = []
-                while not p.done:
-                    print(f"pre_state: {center_state}, {combine_state}")
-
-                    if np.random.random() < exploration_rate(e): # explore
-                        action = random.randint(0, self.model.n_actions-1)
-                        print(f"random action: {action}")
-                    else:
-                        action = self.model.predict((center_state, combine_state))
-                        print(f"action: {action}")
-
-                    # environment
-                    next_sensor_output, reward = p.step(action)
-                    next_center_distance, next_left_distance, next_right_distance = next_sensor_output
-                    car_pos = [p.car.getPosition("center").x, p.car.getPosition("center").y]
-                    
-                    next_center_state, next_combine_state = state_calucate(next_center_distance, next_left_distance, next_right_distance)
-                    self.model.update_table((center_state, combine_state), action, reward, (next_center_state, next_combine_state))
-                    center_state, combine_state = next_center_state, next_combine_state
-                    self.action_list.append({
-                        "previous_car_pos": car_pos,
-                        "pre_state": [next_center_distance, next_left_distance, next_right_distance],
-                        "degree": action
-                    })
-                    
-                if p.isAtDestination:
-                    print("success")
-                    break
-                else:
-                    print("fail")
-                    p.reset()
-                
-            self.draw_run()
-            print("Training Ended")
-
-            # except Exception as e:
-            #     self.msg.config(text=str(e), fg="red")
-
-            self.start_button.config(text="Start Training", bg="green", state="normal")
-            self.msg.config(text="Training Ended", fg="black")
-
-        start_training()
+        config = self.get_configs()
+        self.config = config
+        trainer = self.trainer
+        trainer.replay_batch_size = config["replay_batch_size"]
+
+        def train(report, cancelled):
+            arrivals = 0
+            def on_episode(episode, arrived):
+                nonlocal arrivals
+                arrivals += arrived
+                report(episode=episode, success_rate=arrivals/(episode - first_episode + 1))
+                return cancelled()
+
+            first_episode = trainer.episodes
+            trainer.train(config["n_episodes"], callback=on_episode)
+            return trainer.trajectory.copy()
+
+        self.start_button.config(text="Training...", bg="grey", state="disabled")
+        self.cancel_button.config(state="normal")
+        # the job trains self.trainer, it must not be replaced or saved half way
+        for button in (self.reset_button, self.save_model_button, self.load_model_button):
+            button.config(state="disabled")
+        self.msg.config(text="Training...", fg="black")
+        self.job = TrainingJob(train).start()
+        self.root.after(POLL_INTERVAL, self.poll_training)
+
+    def cancelBtn_onclick(self):
+        if self.job is not None:
+            self.job.cancel()
+            self.msg.config(text="Cancelling...", fg="black")
+
+    def poll_training(self):
+        # runs on the Tk main loop, the trainer itself runs in self.job
+        done = self.job.done
+        updates = self.job.poll()
+        if updates and not self.job.cancelled:
+            progress = updates[-1]
+            self.msg.config(text=f"Episode {progress['episode'] + 1}, success rate {progress['success_rate']:.1%}", fg="black")
+        if not done:
+            self.root.after(POLL_INTERVAL, self.poll_training)
+            return
+
+        self.start_button.config(text="Start Training", bg="green", state="normal")
+        self.cancel_button.config(state="disabled")
+        for button in (self.reset_button, self.save_model_button, self.load_model_button):
+            button.config(state="normal")
+        if self.job.error is not None:
+            self.msg.config(text=str(self.job.error), fg="red")
+            return
+
+        self.trajectory = self.job.result
+        self.draw_run()
+        print("Training Ended")
+        self.msg.config(text="Training Cancelled" if self.job.cancelled else "Training Ended", fg="black")
 
     def saveBtn_onclick(self):
         save_path = os.path.join(ROOT_PATH, "car_path.txt")
-        with open("car_path.txt", "w") as f:
-            for action in self.action_list:
-                f.write(f"{action['previous_car_pos']}\n")
+        with open(save_path, "w") as f:
+            for position in self.trajectory.positions.tolist():
+                f.write(f"{position}\n")
+        # every column of the episode, see MyLib.trajectory_io.load_trajectories
+        save_trajectory(self.trajectory, TRAJECTORY_PATH)
         print("Car path saved to", save_path)
-        self.msg.config(text="Car path saved to .\\car_path.txt", fg="black")
+        print("Trajectory saved to", TRAJECTORY_PATH)
+        self.msg.config(text=f"Car path saved to {save_path}", fg="black")
 
 
     def run(self) -> None:
@@ -235,46 +252,51 @@ class App():
         self.root.mainloop()
 
 
-    def draw_run(self) -> None:
+    def draw_run(self, max_frames: int = MAX_ANIMATION_FRAMES) -> None:
+        '''
+        animate the last episode, runs longer than max_frames steps show
+        every k-th step only (the path itself keeps every step)
+        '''
+        import matplotlib.pyplot as plt
+        from matplotlib.animation import FuncAnimation
+
+        # views of the recorded columns, every frame only slices these
+        positions = self.trajectory.positions
+        sensors = self.trajectory.sensors
+        stride = -(-len(positions) // max_frames)
+        frames = np.append(np.arange(0, len(positions) - 1, stride), len(positions) - 1)
+
         line, = self.ax.plot([], [], lw=2)
-        circle = plt.Circle(self.action_list[0]["previous_car_pos"], radius=self.playground.car.radius/2, color='r')
+        circle = plt.Circle(positions[0], radius=self.playground.car.radius/2, color='r')
+        self.ax.add_patch(circle)
         annotation = self.ax.annotate("", xy=(30, -10), xytext=(5, 5),
                                         textcoords="offset points", ha='right', va='bottom',
                                         bbox=dict(boxstyle='round,pad=0.3', alpha=0.7))
 
         def update(frame):
-            xdata = [x["previous_car_pos"][0] for x in self.action_list[:frame]]
-            ydata = [x["previous_car_pos"][1] for x in self.action_list[:frame]]
-
-            line.set_data(xdata, ydata)
-
-            circle_x, circle_y = self.action_list[frame]["previous_car_pos"][0], self.action_list[frame]["previous_car_pos"][1]
-            right = self.action_list[frame]["pre_state"][1]
-            left = self.action_list[frame]["pre_state"][2]
-            front = self.action_list[frame]["pre_state"][0]
+            line.set_data(positions[:frame + 1, 0], positions[:frame + 1, 1])
 
+            circle_x, circle_y = positions[frame]
+            front, right, left = sensors[frame]
             circle.set_center((circle_x, circle_y))
 
             label = f'car pos: ({circle_x:.2f}, {circle_y:.2f})\nfront sensor: {front:.2f}\nright sensor: {right:.2f}\nleft sensor: {left:.2f}'
             annotation.set_text(label)
 
-            self.canvas.draw()
-
+            # blit=True redraws only these artists, no canvas.draw() here
             return line, circle, annotation
 
         def init():
             line.set_data([], [])
-            circle.set_center((self.action_list[0]["previous_car_pos"][0], self.action_list[0]["previous_car_pos"][1]))
-            self.ax.add_patch(circle)
-
-            annotation = self.ax.annotate("", xy=(30, 0), xytext=(5, 5))
+            circle.set_center(positions[0])
+            annotation.set_text("")
             return line, circle, annotation
 
         if self.animation:
             self.animation.event_source.stop()
 
         try:
-            self.animation = FuncAnimation(self.figure, update, frames=len(self.action_list), init_func=init, interval=100, blit=True)
+            self.animation = FuncAnimation(self.figure, update, frames=frames, init_func=init, interval=100, blit=True)
         except Exception as e:
             print("Fail to draw animation.")
             print(e)
@@ -1,6 +1,18 @@
-
+import sys
 import numpy as np
 
+from MyLib.replay_buffer import ReplayBuffer
+
+
+def _add_mean_updates(values: np.ndarray, cells: np.ndarray, updates: np.ndarray) -> None:
+    # values.flat[cells] += updates, cells given more than once get the mean of their updates
+    if not values.flags.writeable:
+        # np.add.at does not check this, e.g. a table loaded with load_checkpoint(mmap=True)
+        raise ValueError("the table is read only")
+    _, inverse, counts = np.unique(cells, return_inverse=True, return_counts=True)
+    np.add.at(values.reshape(-1), cells, updates / counts[inverse])
+
+
 class Qmodel():
 
     def __init__(self, n_actions: int, n_states: tuple, alpha: float = 0.1, gamma: float =0.9) -> None:
@@ -20,3 +32,219 @@ class Qmodel():
         old_value = self.q_table[state + (action, )]
         next_max = np.max(self.q_table[next_state])
         self.q_table[state + (action, )] = (1 - self.alpha) * old_value + self.alpha * (reward + self.gamma * next_max)
+
+    def _index(self, states) -> tuple:
+        # (n, len(n_states)) state indices -> tuple of index arrays into q_table
+        states = np.asarray(states, dtype=int).reshape(-1, len(self.n_states))
+        return tuple(states.T)
+
+    def predict_batch(self, states: np.ndarray) -> np.ndarray:
+        '''
+        states: (n, len(n_states)), returns the (n,) greedy actions
+        '''
+        return np.argmax(self.q_table[self._index(states)], axis=-1)
+
+    def act_batch(self, states: np.ndarray, epsilon, rng=np.random) -> np.ndarray:
+        '''
+        epsilon-greedy actions, epsilon is a float or (n,) rates. rng is
+        np.random or a np.random.Generator
+        '''
+        actions = self.predict_batch(states)
+        explore = rng.random(len(actions)) < epsilon
+        actions[explore] = (rng.random(np.count_nonzero(explore))*self.n_actions).astype(int)
+        return actions
+
+    def update_batch(self, states: np.ndarray, actions: np.ndarray, rewards: np.ndarray, next_states: np.ndarray, dones: np.ndarray = None) -> np.ndarray:
+        '''
+        update_table for n transitions at once. All targets are computed from
+        the table before the batch, transitions hitting the same
+        (state, action) share one update with their mean TD error, so
+        repeated samples neither overwrite nor overshoot each other.
+        A done transition has no next state value. Returns the (n,) TD errors.
+        '''
+        index = self._index(states) + (np.asarray(actions, dtype=int),)
+        next_max = np.max(self.q_table[self._index(next_states)], axis=-1)
+        if dones is not None:
+            next_max = np.where(dones, 0, next_max)
+        td_errors = np.asarray(rewards) + self.gamma * next_max - self.q_table[index]
+
+        # negative indices count from the end, as in update_table
+        flat = np.ravel_multi_index(tuple(np.where(i < 0, i + n, i) for i, n in zip(index, self.q_table.shape)), self.q_table.shape)
+        _add_mean_updates(self.q_table, flat, self.alpha * td_errors)
+        return td_errors
+
+    def replay(self, buffer: ReplayBuffer, batch_size: int, rng=np.random) -> None:
+        '''
+        one batched update from batch_size transitions sampled from buffer
+        '''
+        indices, states, actions, rewards, next_states, dones = buffer.sample(batch_size, rng)
+        td_errors = self.update_batch(states, actions, rewards, next_states, dones)
+        if buffer.prioritized:
+            buffer.update_priorities(indices, td_errors)
+
+    def memory_usage(self) -> dict:
+        '''
+        stored states and bytes of the table, dense_bytes is the size of the
+        full table for comparison
+        '''
+        n_cells = int(np.prod(self.n_states)) * self.n_actions
+        return dict(states=int(np.prod(self.n_states)), bytes=self.q_table.nbytes, dense_bytes=n_cells * 8)
+
+
+class SparseQmodel(Qmodel):
+    '''
+    Qmodel that stores only the visited states, for state grids too fine
+    for a dense table. A state is packed into one integer key, which maps
+    to a row of the values array (grown by doubling); row 0 stays zero and
+    stands for every unvisited state. Same interface as Qmodel except for
+    q_table.
+    '''
+    def __init__(self, n_actions: int, n_states: tuple, alpha: float = 0.1, gamma: float = 0.9, initial_capacity: int = 1024) -> None:
+        self.n_actions = n_actions
+        self.n_states = tuple(n_states)
+        self.alpha = alpha
+        self.gamma = gamma
+        self.rows = {}  # packed state -> row of values
+        self.values = np.zeros((max(initial_capacity, 2), n_actions))
+
+    def _key(self, state: tuple) -> int:
+        key = 0
+        for s, n in zip(state, self.n_states):
+            if not -n <= s < n:
+                raise IndexError(f"state {state} is out of range {self.n_states}")
+            key = key * n + s % n  # negative indices count from the end, as in Qmodel
+        return key
+
+    def _keys(self, states) -> list[int]:
+        states = np.asarray(states, dtype=int).reshape(-1, len(self.n_states))
+        n_states = np.array(self.n_states)
+        if np.any((states < -n_states) | (states >= n_states)):
+            raise IndexError(f"states are out of range {self.n_states}")
+        return np.ravel_multi_index(tuple(np.where(states < 0, states + n_states, states).T), self.n_states).tolist()
+
+    def _new_row(self, key: int) -> int:
+        row = len(self.rows) + 1
+        if row == len(self.values):
+            values = np.zeros((2 * len(self.values), self.n_actions))
+            values[:row] = self.values
+            self.values = values
+        self.rows[key] = row
+        return row
+
+    def _row(self, state: tuple, create: bool = False) -> int:
+        key = self._key(state)
+        row = self.rows.get(key, 0)
+        return self._new_row(key) if row == 0 and create else row
+
+    def _row_array(self, states, create: bool = False) -> np.ndarray:
+        rows = []
+        for key in self._keys(states):
+            row = self.rows.get(key, 0)
+            rows.append(self._new_row(key) if row == 0 and create else row)
+        return np.array(rows, dtype=int)
+
+    def predict(self, state: tuple) -> int:
+        return np.argmax(self.values[self._row(state)], axis=-1)
+
+    def update_table(self, state: tuple, action: int, reward: float, next_state: int):
+        next_max = np.max(self.values[self._row(next_state)])
+        row = self._row(state, create=True)
+        old_value = self.values[row, action]
+        self.values[row, action] = (1 - self.alpha) * old_value + self.alpha * (reward + self.gamma * next_max)
+
+    def predict_batch(self, states: np.ndarray) -> np.ndarray:
+        return np.argmax(self.values[self._row_array(states)], axis=-1)
+
+    def update_batch(self, states: np.ndarray, actions: np.ndarray, rewards: np.ndarray, next_states: np.ndarray, dones: np.ndarray = None) -> np.ndarray:
+        next_max = np.max(self.values[self._row_array(next_states)], axis=-1)
+        if dones is not None:
+            next_max = np.where(dones, 0, next_max)
+        rows = self._row_array(states, create=True)
+        actions = np.asarray(actions, dtype=int)
+        td_errors = np.asarray(rewards) + self.gamma * next_max - self.values[rows, actions]
+
+        _add_mean_updates(self.values, rows * self.n_actions + actions, self.alpha * td_errors)
+        return td_errors
+
+    def memory_usage(self) -> dict:
+        n_cells = int(np.prod(self.n_states)) * self.n_actions
+        # the dict and its int keys, the values array is preallocated
+        index_bytes = sys.getsizeof(self.rows) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in self.rows.items())
+        return dict(states=len(self.rows), bytes=self.values.nbytes + index_bytes, dense_bytes=n_cells * 8)
+
+
+class TileCodingQmodel(Qmodel):
+    '''
+    Linear Q-function over tile coded continuous states, a drop-in
+    alternative to Qmodel whose states are the raw sensor values.
+
+    Every one of the n_tilings grids covers [lows, highs] with n_tiles
+    tiles per dimension and is shifted by a fraction of a tile
+    (displacement 1, 3, 5, ... per dimension), a state activates one tile
+    per tiling. Q(state, a) is the sum of the weights of the active tiles
+    and an update only touches those, with step size alpha/n_tilings.
+    '''
+    def __init__(self, n_actions: int, lows: tuple, highs: tuple, n_tiles=8, n_tilings: int = 8, alpha: float = 0.1, gamma: float = 0.9) -> None:
+        self.n_actions = n_actions
+        self.alpha = alpha
+        self.gamma = gamma
+        self.lows = np.asarray(lows, dtype=float)
+        self.highs = np.asarray(highs, dtype=float)
+        self.n_tilings = n_tilings
+        self.n_tiles = np.broadcast_to(np.asarray(n_tiles, dtype=int), self.lows.shape).copy()
+
+        self.tile_width = (self.highs - self.lows) / self.n_tiles
+        displacement = 2 * np.arange(len(self.lows)) + 1
+        self.offsets = (np.arange(n_tilings)[:, None] * displacement / n_tilings) % 1  # (tilings, dims), in tiles
+        self.tiling_shape = tuple(self.n_tiles + 1)  # one more tile for the shift
+        self.tiling_base = np.arange(n_tilings) * int(np.prod(self.tiling_shape))
+        self.weights = np.zeros((n_tilings * int(np.prod(self.tiling_shape)), n_actions))
+
+    def features(self, states) -> np.ndarray:
+        '''
+        states: (..., dims) -> (..., n_tilings) indices of the active tiles,
+        values outside [lows, highs] fall into the border tiles
+        '''
+        x = (np.asarray(states, dtype=float) - self.lows) / self.tile_width  # in tiles
+        tiles = np.floor(x[..., None, :] + self.offsets).astype(int)  # (..., tilings, dims)
+        tiles = np.clip(tiles, 0, self.n_tiles)
+        return self.tiling_base + np.ravel_multi_index(np.moveaxis(tiles, -1, 0), self.tiling_shape)
+
+    def q_values(self, states) -> np.ndarray:
+        '''
+        states: (..., dims) -> (..., n_actions)
+        '''
+        return self.weights[self.features(states)].sum(axis=-2)
+
+    def predict(self, state: tuple) -> int:
+        return np.argmax(self.q_values(state), axis=-1)
+
+    def update_table(self, state: tuple, action: int, reward: float, next_state: tuple):
+        features = self.features(state)
+        next_max = np.max(self.q_values(next_state))
+        td_error = reward + self.gamma * next_max - self.weights[features, action].sum()
+        self.weights[features, action] += self.alpha / self.n_tilings * td_error
+
+    def predict_batch(self, states: np.ndarray) -> np.ndarray:
+        return np.argmax(self.q_values(states), axis=-1)
+
+    def update_batch(self, states: np.ndarray, actions: np.ndarray, rewards: np.ndarray, next_states: np.ndarray, dones: np.ndarray = None) -> np.ndarray:
+        next_max = np.max(self.q_values(next_states), axis=-1)
+        if dones is not None:
+            next_max = np.where(dones, 0, next_max)
+        features = self.features(states)  # (n, tilings)
+        actions = np.asarray(actions, dtype=int)
+        td_errors = np.asarray(rewards) + self.gamma * next_max - self.weights[features, actions[:, None]].sum(axis=-1)
+
+        cells = features * self.n_actions + actions[:, None]
+        updates = np.broadcast_to((self.alpha / self.n_tilings * td_errors)[:, None], cells.shape)
+        _add_mean_updates(self.weights, cells.reshape(-1), updates.reshape(-1))
+        return td_errors
+
+    def memory_usage(self) -> dict:
+        '''
+        like Qmodel.memory_usage, but there are no stored states: tiles is
+        the number of weight rows and updated_tiles the ones updated so far
+        '''
+        updated_tiles = int(np.count_nonzero(np.any(self.weights != 0, axis=1)))
+        return dict(tiles=len(self.weights), updated_tiles=updated_tiles, bytes=self.weights.nbytes, dense_bytes=self.weights.nbytes)
@@ -0,0 +1,70 @@
+import os
+import json
+import numpy as np
+
+from MyLib.QModel import Qmodel, SparseQmodel, TileCodingQmodel
+
+# bumped whenever the layout below changes, older versions stay loadable
+CHECKPOINT_VERSION = 1
+METADATA_FILE = "metadata.json"
+
+
+def save_checkpoint(model: Qmodel, path: str, episodes: int = 0, **metadata) -> None:
+    '''
+    Save a Qmodel, SparseQmodel or TileCodingQmodel to the directory path:
+    metadata.json (format version, model type and hyper parameters,
+    episodes trained and any extra metadata such as the state bounds) and
+    one .npy file per array.
+        Qmodel: q_table.npy
+        SparseQmodel: keys.npy (packed states, in row order), values.npy
+        TileCodingQmodel: weights.npy
+    '''
+    os.makedirs(path, exist_ok=True)
+    metadata = dict(metadata, format_version=CHECKPOINT_VERSION, model=type(model).__name__, n_actions=model.n_actions,
+                    alpha=model.alpha, gamma=model.gamma, episodes=episodes)
+
+    if isinstance(model, SparseQmodel):
+        metadata["n_states"] = list(model.n_states)
+        keys = sorted(model.rows, key=model.rows.get)
+        np.save(os.path.join(path, "keys.npy"), np.array(keys, dtype=np.int64))
+        np.save(os.path.join(path, "values.npy"), model.values[:len(keys) + 1])
+    elif isinstance(model, TileCodingQmodel):
+        metadata.update(lows=model.lows.tolist(), highs=model.highs.tolist(), n_tiles=model.n_tiles.tolist(), n_tilings=model.n_tilings)
+        np.save(os.path.join(path, "weights.npy"), model.weights)
+    else:
+        metadata["n_states"] = list(model.n_states)
+        np.save(os.path.join(path, "q_table.npy"), model.q_table)
+
+    with open(os.path.join(path, METADATA_FILE), "w") as f:
+        json.dump(metadata, f, indent=4)
+
+
+def load_checkpoint(path: str, mmap: bool = False) -> tuple[Qmodel, dict]:
+    '''
+    Returns the model and the metadata saved by save_checkpoint. With mmap
+    the arrays are memory-mapped read only (np.load(mmap_mode='r')), for
+    inference without reading the whole table.
+    '''
+    with open(os.path.join(path, METADATA_FILE)) as f:
+        metadata = json.load(f)
+    if metadata.get("format_version", 0) > CHECKPOINT_VERSION:
+        raise ValueError(f"checkpoint format {metadata.get('format_version')} is newer than the supported {CHECKPOINT_VERSION}")
+
+    mmap_mode = 'r' if mmap else None
+    load = lambda name: np.load(os.path.join(path, name), mmap_mode=mmap_mode)
+
+    if metadata["model"] == "SparseQmodel":
+        model = SparseQmodel(metadata["n_actions"], tuple(metadata["n_states"]), metadata["alpha"], metadata["gamma"])
+        model.values = load("values.npy")
+        model.rows = {key: row for row, key in enumerate(np.load(os.path.join(path, "keys.npy")).tolist(), start=1)}
+    elif metadata["model"] == "TileCodingQmodel":
+        model = TileCodingQmodel(metadata["n_actions"], metadata["lows"], metadata["highs"], metadata["n_tiles"], metadata["n_tilings"],
+                                 metadata["alpha"], metadata["gamma"])
+        model.weights = load("weights.npy")
+    elif metadata["model"] == "Qmodel":
+        model = Qmodel(metadata["n_actions"], tuple(metadata["n_states"]), metadata["alpha"], metadata["gamma"])
+        model.q_table = load("q_table.npy")
+    else:
+        raise ValueError(f"unknown model type {metadata['model']}")
+
+    return model, metadata
@@ -0,0 +1,68 @@
+import time
+import random
+import argparse
+
+from MyLib.simple_playground import Playground
+from MyLib.trainer import Trainer, PLAYGROUND_PATH, N_EPISODES, REPLAY_BATCH_SIZE
+from MyLib.trajectory import Trajectory
+from MyLib.trajectory_io import TrajectoryWriter, save_trajectory, TEXT_FORMATS
+
+MAX_STEPS = 1000  # a greedy Q-table can drive in circles
+
+
+def write_car_path(trajectory: Trajectory, path: str) -> None:
+    # same format as App.saveBtn_onclick
+    with open(path, "w") as f:
+        for position in trajectory.positions.tolist():
+            f.write(f"{position}\n")
+
+
+def describe_outcome(playground: Playground) -> str:
+    # an episode ends at the destination, against a wall, or at the step limit
+    if playground.isAtDestination:
+        return "Arrived at destination"
+    return "Crashed" if playground.done else "Stopped at the step limit"
+
+
+def main(args: list[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Drive one greedy episode with the HW1 Q-learning car without the UI")
+    parser.add_argument("--playground", default=PLAYGROUND_PATH)
+    parser.add_argument("--checkpoint", default=None, help="checkpoint directory to drive with (default: train first)")
+    parser.add_argument("--episodes", type=int, default=N_EPISODES, help="training episodes without --checkpoint")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--replay-batch-size", type=int, default=REPLAY_BATCH_SIZE, help="replayed transitions per step, 0: no experience replay")
+    parser.add_argument("--max-steps", type=int, default=MAX_STEPS)
+    parser.add_argument("--save-checkpoint", default="checkpoint", help="where the trained model is saved")
+    parser.add_argument("--output", default="car_path.txt", help="car path of the episode")
+    parser.add_argument("--trajectory", default=None, help="also save every column of the episode, .npy or a course text format")
+    parser.add_argument("--trajectory-format", choices=["npy"] + list(TEXT_FORMATS), default=None, help="default: npy for .npy paths, else track6D")
+    parser.add_argument("--record", default=None, help="stream every training episode to this .npy file")
+    args = parser.parse_args(args)
+
+    random.seed(args.seed)  # Car.reset
+    if args.checkpoint:
+        trainer = Trainer.from_checkpoint(args.checkpoint, args.playground, replay_batch_size=args.replay_batch_size, seed=args.seed)
+    else:
+        trainer = Trainer(args.playground, replay_batch_size=args.replay_batch_size, seed=args.seed)
+        start = time.perf_counter()
+        if args.record:
+            with TrajectoryWriter(args.record) as writer:
+                trainer.train(args.episodes, callback=lambda episode, arrived: writer.write(trainer.trajectory))
+            print(f"{writer.n_episodes} episodes, {writer.n_rows} rows recorded to {args.record}")
+        else:
+            trainer.train(args.episodes)
+        trainer.save_checkpoint(args.save_checkpoint)
+        print(f"Trained {trainer.episodes} episodes in {time.perf_counter() - start:.2f} s, checkpoint saved to {args.save_checkpoint}")
+
+    start = time.perf_counter()
+    trainer.run_episode(learn=False, max_steps=args.max_steps)
+    elapsed = time.perf_counter() - start
+    write_car_path(trainer.trajectory, args.output)
+    if args.trajectory:
+        save_trajectory(trainer.trajectory, args.trajectory, args.trajectory_format)
+    print(f"{describe_outcome(trainer.playground)} after {len(trainer.trajectory)} steps "
+          f"in {elapsed:.2f} s, car path saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
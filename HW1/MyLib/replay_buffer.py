@@ -0,0 +1,90 @@
+import numpy as np
+
+
+class ReplayBuffer():
+    '''
+    Fixed capacity store of (state, action, reward, next_state, done)
+    transitions in preallocated arrays, the oldest transition is overwritten
+    once the buffer is full.
+
+    With prioritized=True a transition is sampled with probability
+    proportional to priority**priority_exponent, new transitions get the
+    highest priority seen so far and update_priorities sets it from the
+    TD errors of the last update.
+
+    States are grid indices (int), state_dtype=float stores continuous
+    states such as the sensor values of a TileCodingQmodel.
+    '''
+    def __init__(self, capacity: int, state_dim: int, prioritized: bool = False, priority_exponent: float = 0.6, min_priority: float = 1e-3, state_dtype=int) -> None:
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.prioritized = prioritized
+        self.priority_exponent = priority_exponent
+        self.min_priority = min_priority
+
+        self.states = np.zeros((capacity, state_dim), dtype=state_dtype)
+        self.actions = np.zeros(capacity, dtype=int)
+        self.rewards = np.zeros(capacity)
+        self.next_states = np.zeros((capacity, state_dim), dtype=state_dtype)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.priorities = np.zeros(capacity)
+        self.max_priority = 1.0
+
+        self.position = 0  # next row to write
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, state: tuple, action: int, reward: float, next_state: tuple, done: bool = False) -> None:
+        i = self.position
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.dones[i] = done
+        self.priorities[i] = self.max_priority
+
+        self.position = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def add_batch(self, states: np.ndarray, actions: np.ndarray, rewards: np.ndarray, next_states: np.ndarray, dones: np.ndarray = False) -> None:
+        '''
+        n transitions at once, e.g. one per car of a BatchPlayground
+        '''
+        n = len(actions)
+        rows = (self.position + np.arange(max(0, n - self.capacity), n)) % self.capacity
+        start = n - len(rows)
+        self.states[rows] = np.asarray(states)[start:]
+        self.actions[rows] = np.asarray(actions)[start:]
+        self.rewards[rows] = np.asarray(rewards)[start:]
+        self.next_states[rows] = np.asarray(next_states)[start:]
+        self.dones[rows] = np.broadcast_to(dones, (n,))[start:]
+        self.priorities[rows] = self.max_priority
+
+        self.position = (self.position + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+
+    def sample(self, batch_size: int, rng=np.random):
+        '''
+        batch_size transitions drawn with replacement, rng is np.random or a
+        np.random.Generator
+        output: indices, states, actions, rewards, next_states, dones
+        '''
+        if self.size == 0:
+            raise ValueError("cannot sample from an empty buffer")
+
+        if self.prioritized:
+            cumulative = np.cumsum(self.priorities[:self.size]**self.priority_exponent)
+            indices = np.searchsorted(cumulative, rng.random(batch_size)*cumulative[-1], side='right')
+            indices = np.minimum(indices, self.size - 1)
+        else:
+            indices = (rng.random(batch_size)*self.size).astype(int)
+
+        return indices, self.states[indices], self.actions[indices], self.rewards[indices], self.next_states[indices], self.dones[indices]
+
+    def update_priorities(self, indices: np.ndarray, td_errors: np.ndarray) -> None:
+        priorities = np.maximum(np.abs(td_errors), self.min_priority)
+        self.priorities[indices] = priorities
+        self.max_priority = max(self.max_priority, float(priorities.max()))
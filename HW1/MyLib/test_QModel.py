@@ -0,0 +1,111 @@
+import numpy as np
+
+from MyLib.QModel import Qmodel, SparseQmodel, TileCodingQmodel
+from MyLib.replay_buffer import ReplayBuffer
+
+
+def test_update_batch_matches_update_table():
+    rng = np.random.default_rng(0)
+    states = rng.integers(0, [5, 7], size=(50, 2))
+    next_states = rng.integers(0, [5, 7], size=(50, 2))
+    actions = rng.integers(0, 4, size=50)
+    rewards = rng.normal(size=50)
+
+    # every transition on its own equals the scalar update
+    model, batch_model = Qmodel(4, (5, 7)), Qmodel(4, (5, 7))
+    for s, a, r, s_next in zip(states, actions, rewards, next_states):
+        model.update_table(tuple(s), a, r, tuple(s_next))
+        batch_model.update_batch([s], [a], [r], [s_next])
+    assert np.allclose(model.q_table, batch_model.q_table)
+
+    # duplicates in one batch share one update with their mean TD error
+    model = Qmodel(4, (5, 7), alpha=0.5, gamma=0)
+    model.update_batch([(1, 2), (1, 2), (3, 3)], [0, 0, 1], [1.0, 2.0, 4.0], [(0, 0)]*3)
+    assert model.q_table[1, 2, 0] == 0.75
+    assert model.q_table[3, 3, 1] == 2.0
+
+
+def test_batched_action_selection():
+    model = Qmodel(4, (5, 7))
+    model.q_table[..., 2] = 1
+    states = np.array([(0, 0), (4, 6), (2, 3)])
+
+    assert np.array_equal(model.predict_batch(states), [2, 2, 2])
+    assert model.predict_batch(states)[0] == model.predict((0, 0))
+    assert np.array_equal(model.act_batch(states, 0.0), [2, 2, 2])
+
+    actions = model.act_batch(np.zeros((1000, 2), dtype=int), 1.0, np.random.default_rng(0))
+    assert set(actions) == {0, 1, 2, 3}
+
+
+def test_replay_buffer_ring_and_prioritized_sampling():
+    buffer = ReplayBuffer(4, state_dim=2)
+    for i in range(3):
+        buffer.add((i, i), i, float(i), (i + 1, i + 1))
+    buffer.add_batch(np.array([(3, 3), (4, 4)]), [3, 4], [3.0, 4.0], np.array([(4, 4), (5, 5)]), [False, True])
+    assert len(buffer) == 4 and buffer.position == 1
+    assert sorted(buffer.actions) == [1, 2, 3, 4]
+    assert buffer.dones[buffer.actions == 4].all()
+
+    indices, states, actions, rewards, next_states, dones = buffer.sample(100, np.random.default_rng(0))
+    assert np.array_equal(states[:, 0], actions) and np.array_equal(rewards, actions)
+
+    buffer = ReplayBuffer(4, state_dim=2, prioritized=True)
+    buffer.add_batch(np.zeros((4, 2), dtype=int), [0, 1, 2, 3], np.zeros(4), np.zeros((4, 2), dtype=int))
+    buffer.update_priorities(np.arange(4), [0, 0, 0, 10])
+    _, _, actions, _, _, _ = buffer.sample(1000, np.random.default_rng(0))
+    assert np.mean(actions == 3) > 0.9
+
+
+def test_replay_updates_model():
+    model = Qmodel(2, (3,), alpha=0.5, gamma=0.9)
+    buffer = ReplayBuffer(8, state_dim=1, prioritized=True)
+    buffer.add((0,), 1, 1.0, (1,), done=True)
+    model.replay(buffer, 4, np.random.default_rng(0))
+
+    # one transition sampled 4 times is one update, no bootstrap from a done transition
+    assert model.q_table[0, 1] == 0.5 * 1.0
+    assert buffer.priorities[0] == 1.0
+
+
+def test_sparse_model_matches_dense():
+    rng = np.random.default_rng(3)
+    states = rng.integers(-5, 5, size=(300, 2))
+    next_states = rng.integers(-5, 5, size=(300, 2))
+    actions = rng.integers(0, 4, size=300)
+    rewards = rng.normal(size=300)
+
+    dense, sparse = Qmodel(4, (5, 7)), SparseQmodel(4, (5, 7), initial_capacity=2)
+    for s, a, r, s_next in zip(states[:150], actions, rewards, next_states):
+        dense.update_table(tuple(s), a, r, tuple(s_next))
+        sparse.update_table(tuple(s), a, r, tuple(s_next))
+    dense.update_batch(states[150:], actions[150:], rewards[150:], next_states[150:])
+    sparse.update_batch(states[150:], actions[150:], rewards[150:], next_states[150:])
+
+    all_states = np.array([(i, j) for i in range(5) for j in range(7)])
+    assert np.allclose(dense.q_table[tuple(all_states.T)], sparse.values[sparse._row_array(all_states)])
+    assert np.array_equal(dense.predict_batch(all_states), sparse.predict_batch(all_states))
+    assert sparse.predict((1, 1)) == dense.predict((1, 1))
+
+    memory = SparseQmodel(80, (1000, 1000, 1000)).memory_usage()
+    assert memory["states"] == 0 and memory["bytes"] < memory["dense_bytes"] / 1000
+
+
+def test_tile_coding_model():
+    model = TileCodingQmodel(3, lows=(0, 0), highs=(10, 10), n_tiles=5, n_tilings=4, alpha=0.5, gamma=0)
+    features = model.features([(0, 0), (10, 10), (-5, 50), (3.3, 7.1)])
+    assert features.shape == (4, 4) and features.min() >= 0 and features.max() < len(model.weights)
+    assert len(set(features[3] // (6 * 6))) == 4  # one tile in every tiling
+
+    model.update_table((3.3, 7.1), 1, 1.0, (0, 0))
+    assert model.q_values((3.3, 7.1))[1] == 0.5
+    assert 0 < model.q_values((3.6, 7.1))[1] < 0.5  # neighbours share tiles
+    assert model.q_values((9, 1))[1] == 0
+    assert model.predict((3.3, 7.1)) == 1
+    memory = model.memory_usage()
+    assert memory["tiles"] == len(model.weights) and memory["updated_tiles"] == 4  # one tile per tiling
+
+    batch_model = TileCodingQmodel(3, lows=(0, 0), highs=(10, 10), n_tiles=5, n_tilings=4, alpha=0.5, gamma=0)
+    batch_model.update_batch(np.array([(3.3, 7.1)] * 3), [1] * 3, [1.0] * 3, np.zeros((3, 2)))
+    assert np.allclose(batch_model.weights, model.weights)
+    assert np.array_equal(batch_model.predict_batch([(3.3, 7.1), (9, 1)]), [1, 0])
@@ -0,0 +1,42 @@
+import threading
+
+from MyLib.background import TrainingJob
+from MyLib.trainer import Trainer
+
+
+def test_job_reports_progress_and_result():
+    def count(report, cancelled):
+        for i in range(3):
+            report(step=i)
+        return "finished"
+
+    job = TrainingJob(count).start()
+    job.thread.join()
+    assert job.done and job.error is None and job.result == "finished"
+    assert job.poll() == [dict(step=0), dict(step=1), dict(step=2)]
+    assert job.poll() == []
+
+
+def test_job_can_be_cancelled_and_keeps_errors():
+    started = threading.Event()
+
+    def wait(report, cancelled):
+        started.set()
+        while not cancelled():
+            pass
+        raise RuntimeError("stopped")
+
+    job = TrainingJob(wait)
+    assert not job.done
+    job.start()
+    started.wait()
+    job.cancel()
+    job.thread.join()
+    assert job.cancelled and isinstance(job.error, RuntimeError)
+
+
+def test_trainer_callback_stops_training():
+    episodes = []
+    trainer = Trainer(seed=0)
+    assert trainer.train(10, stop_at_destination=False, callback=lambda episode, arrived: episodes.append(episode) or episode == 2) == 3
+    assert episodes == [0, 1, 2] and trainer.episodes == 3
@@ -0,0 +1,49 @@
+import json
+import os
+import numpy as np
+import pytest
+
+from MyLib.QModel import Qmodel, SparseQmodel, TileCodingQmodel
+from MyLib.checkpoint import save_checkpoint, load_checkpoint, METADATA_FILE
+from MyLib.trainer import Trainer
+
+
+def test_checkpoint_round_trip(tmp_path):
+    rng = np.random.default_rng(0)
+    states = rng.integers(0, [5, 7], size=(40, 2))
+    models = [Qmodel(4, (5, 7), alpha=0.2), SparseQmodel(4, (5, 7), gamma=0.5), TileCodingQmodel(4, (0, 0), (7, 7), n_tiles=[3, 4], n_tilings=2)]
+    for model in models:
+        model.update_batch(states, rng.integers(0, 4, size=40), rng.normal(size=40), states[::-1])
+
+        path = tmp_path / type(model).__name__
+        save_checkpoint(model, path, episodes=12, note="test")
+        loaded, metadata = load_checkpoint(path)
+        assert type(loaded) is type(model) and (loaded.alpha, loaded.gamma) == (model.alpha, model.gamma)
+        assert metadata["episodes"] == 12 and metadata["note"] == "test"
+        assert np.array_equal(loaded.predict_batch(states), model.predict_batch(states))
+
+        mapped, _ = load_checkpoint(path, mmap=True)
+        assert np.array_equal(mapped.predict_batch(states), model.predict_batch(states))
+
+    with pytest.raises(ValueError):
+        mapped.update_batch(states, np.zeros(40, dtype=int), np.ones(40), states)  # read only
+
+    with open(path / METADATA_FILE) as f:
+        metadata = json.load(f)
+    metadata["format_version"] += 1
+    with open(path / METADATA_FILE, "w") as f:
+        json.dump(metadata, f)
+    with pytest.raises(ValueError):
+        load_checkpoint(path)
+
+
+def test_trainer_resumes_from_checkpoint(tmp_path):
+    trainer = Trainer(seed=0)
+    trainer.train(3, stop_at_destination=False)
+    trainer.save_checkpoint(tmp_path)
+
+    resumed = Trainer.from_checkpoint(tmp_path)
+    assert resumed.episodes == 3
+    assert np.array_equal(resumed.model.q_table, trainer.model.q_table)
+    resumed.run_episode(learn=False)
+    assert resumed.episodes == 3 and np.array_equal(resumed.model.q_table, trainer.model.q_table)
@@ -0,0 +1,12 @@
+from MyLib.headless import main
+
+
+def test_headless_trains_and_replays(tmp_path):
+    checkpoint, output = tmp_path / "checkpoint", tmp_path / "car_path.txt"
+    main(["--episodes", "3", "--seed", "0", "--max-steps", "50", "--save-checkpoint", str(checkpoint), "--output", str(output)])
+    assert (checkpoint / "metadata.json").exists()
+    trained_path = output.read_text()
+    assert 0 < trained_path.count("\n") <= 50
+
+    main(["--checkpoint", str(checkpoint), "--seed", "0", "--max-steps", "50", "--output", str(output)])
+    assert output.read_text() == trained_path
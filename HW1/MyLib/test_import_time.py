@@ -0,0 +1,10 @@
+from MyLib.import_time import measure_import, HEADLESS_MODULES
+
+
+def test_modules_load_without_plotting_stack():
+    for module in HEADLESS_MODULES:
+        _, loaded = measure_import(module, repeat=1)
+        assert loaded == [], module
+
+    _, loaded = measure_import("MyLib.App", repeat=1)
+    assert "matplotlib" not in loaded
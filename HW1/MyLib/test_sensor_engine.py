@@ -0,0 +1,57 @@
+import math
+
+import numpy as np
+
+from MyLib.simple_geometry import Line2D
+from MyLib.sensor_engine import SensorEngine, SENSOR_ANGLES
+
+
+# same walls as Playground._setDefaultLine
+WALLS = [
+    Line2D(-6, -3, 6, -3),
+    Line2D(6, -3, 6, 10),
+    Line2D(6, 10, 30, 10),
+    Line2D(30, 10, 30, 50),
+    Line2D(18, 50, 30, 50),
+    Line2D(18, 22, 18, 50),
+    Line2D(-6, 22, 18, 22),
+    Line2D(-6, -3, -6, 22),
+]
+
+
+def sensor_points(x, y, angle, radius=6):
+    rad = np.radians(angle + SENSOR_ANGLES)
+    return np.array([x, y]) + radius/2 * np.stack([np.cos(rad), np.sin(rad)], axis=-1)
+
+
+def test_scan_start_position():
+    engine = SensorEngine(WALLS)
+    touched, ray_touch, dists = engine.scan(np.array([0., 0.]), sensor_points(0, 0, 90), 3)
+
+    assert not touched
+    assert not ray_touch.any()
+    assert np.allclose(dists, [22, 6*math.sqrt(2), 6*math.sqrt(2)])
+
+
+def test_scan_touch_wall():
+    engine = SensorEngine(WALLS)
+    touched, ray_touch, dists = engine.scan(np.array([4., 0.]), sensor_points(4, 0, 0), 3)
+
+    assert touched
+    assert ray_touch[0]
+    assert dists[0] == -1  # overlapped sensor reports no intersection
+
+
+def test_scan_batch_matches_single():
+    engine = SensorEngine(WALLS)
+    rng = np.random.default_rng(0)
+    centers = rng.uniform([-6, -3], [30, 50], size=(50, 2))
+    angles = rng.uniform(-90, 270, size=50)
+    points = np.stack([sensor_points(*c, a) for c, a in zip(centers, angles)])
+
+    touched, ray_touch, dists = engine.scan(centers, points, 3)
+    for i in range(50):
+        single = engine.scan(centers[i], points[i], 3)
+        assert touched[i] == single[0]
+        assert np.array_equal(ray_touch[i], single[1])
+        assert np.allclose(dists[i], single[2])
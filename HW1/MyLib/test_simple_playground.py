@@ -0,0 +1,26 @@
+import os
+
+import numpy as np
+
+from MyLib.simple_playground import Playground, BatchPlayground
+
+TRACK = os.path.join(os.path.dirname(__file__), "..", "playground", "軌道座標點.txt")
+
+
+def test_batch_playground_matches_playground():
+    n_cars = 8
+    rng = np.random.default_rng(0)
+    batch = BatchPlayground(TRACK, n_cars)
+    singles = [Playground(TRACK) for _ in range(n_cars)]
+
+    for step_count in range(60):
+        actions = rng.integers(0, batch.n_actions, size=n_cars)
+        states, rewards = batch.step(actions, step_count)
+
+        for i, p in enumerate(singles):
+            state, reward = p.step(actions[i], step_count)
+            assert np.allclose(states[i], state)
+            assert np.isclose(rewards[i], reward)
+            assert batch.done[i] == p.done
+            assert batch.isAtDestination[i] == p.isAtDestination
+            assert np.isclose(batch.x[i], p.car.xpos) and np.isclose(batch.y[i], p.car.ypos)
@@ -0,0 +1,49 @@
+import random
+import numpy as np
+
+from MyLib.QModel import TileCodingQmodel
+from MyLib.trainer import Trainer, ParallelTrainer, merge_q_tables
+
+
+def test_trainer_is_reproducible():
+    tables = []
+    for _ in range(2):
+        random.seed(0)
+        trainer = Trainer(seed=0, count_visits=True)
+        assert trainer.train(5, stop_at_destination=False) == 5
+        assert trainer.visits.sum() > 0 and len(trainer.trajectory) > 0
+        tables.append(trainer.model.q_table)
+    assert np.array_equal(tables[0], tables[1])
+    assert np.any(tables[0] != 0)
+
+
+def test_merge_q_tables():
+    a, b = np.array([1.0, 2.0, 3.0]), np.array([3.0, 4.0, 5.0])
+    assert np.array_equal(merge_q_tables([a, b]), [2, 3, 4])
+    assert np.array_equal(merge_q_tables([a, b], [np.array([1, 0, 0]), np.array([3, 1, 0])]), [2.5, 4, 4])
+
+
+def test_parallel_trainer_merges_workers():
+    trainer = ParallelTrainer(num_workers=2, sync_every=2, seed=0)
+    rounds = trainer.train(4)
+    assert 1 <= rounds <= 2
+    assert trainer.model.q_table.shape == (30, 60, 80)
+    assert np.any(trainer.model.q_table != 0)
+
+
+def test_trainer_with_tile_coding():
+    model = TileCodingQmodel(80, (0, 0, 0), (60, 60, 60))
+    trainer = Trainer(model=model, seed=0)
+    trainer.train(3, stop_at_destination=False)
+    assert trainer.buffer.states.dtype == float
+    assert np.any(model.weights != 0)
+
+
+def test_experience_replay_is_opt_in():
+    trainer = Trainer(seed=0)
+    trainer.train(2, stop_at_destination=False)
+    assert len(trainer.buffer) == 0
+
+    trainer = Trainer(replay_batch_size=8, seed=0)
+    trainer.train(2, stop_at_destination=False)
+    assert len(trainer.buffer) > 0
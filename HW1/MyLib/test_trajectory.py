@@ -0,0 +1,34 @@
+import numpy as np
+
+from MyLib.trajectory import Trajectory, COLUMNS
+from MyLib.trainer import Trainer
+
+
+def test_trajectory_grows_and_slices_columns():
+    trajectory = Trajectory(capacity=2)
+    for i in range(5):
+        trajectory.append(i, 2*i, 90, 0, 1, 2, 3, reward=-i, done=i == 4)
+
+    assert len(trajectory) == 5 and len(trajectory.data) == 8
+    assert np.array_equal(trajectory.positions, [[i, 2*i] for i in range(5)])
+    assert np.array_equal(trajectory["reward"], -np.arange(5)) and np.array_equal(trajectory["done"], [0, 0, 0, 0, 1])
+    assert trajectory.sensors.shape == (5, 3) and trajectory.rows.shape == (5, len(COLUMNS))
+
+    copy = trajectory.copy()
+    trajectory.clear()
+    assert len(trajectory) == 0 and len(copy) == 5 and copy["x"][-1] == 4
+
+
+def test_playground_records_every_step():
+    trainer = Trainer(seed=0)
+    trainer.run_episode(learn=False, max_steps=20)
+    p, trajectory = trainer.playground, trainer.trajectory
+    assert p.trajectory is trajectory and 0 < len(trajectory) <= 20
+
+    last = trajectory.rows[-1]
+    assert (last[0], last[1]) == (p.car.xpos, p.car.ypos)
+    assert np.array_equal(trajectory.sensors[-1], p.sensor_distances)
+    assert last[COLUMNS.index("done")] == p.done
+
+    trainer.run_episode(learn=False, max_steps=3)
+    assert len(trajectory) <= 3
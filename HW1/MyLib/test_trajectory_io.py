@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from MyLib.simple_playground import Playground
+from MyLib.trainer import PLAYGROUND_PATH
+from MyLib.trajectory import Trajectory
+from MyLib.trajectory_io import TrajectoryWriter, save_trajectory, load_trajectories, split_episodes, EXPORT_COLUMNS
+
+
+def make_trajectory(n_steps: int, offset: float = 0) -> Trajectory:
+    trajectory = Trajectory(capacity=4)
+    for i in range(n_steps):
+        trajectory.append(offset + i, 2*i, 90 + i, -i, 1.5, 2.5, 3.5, reward=-i, done=i == n_steps - 1)
+    return trajectory
+
+
+def test_npy_streams_many_episodes(tmp_path):
+    path = str(tmp_path / "episodes.npy")
+    episodes = [make_trajectory(n, offset=100*n) for n in (3, 1, 5)]
+    with TrajectoryWriter(path) as writer:
+        for trajectory in episodes:
+            writer.write(trajectory)
+    assert (writer.n_episodes, writer.n_rows) == (3, 9)
+
+    columns = load_trajectories(path)
+    assert list(columns) == list(EXPORT_COLUMNS) and isinstance(columns["x"].base, np.memmap)
+    assert np.array_equal(columns["episode"], [0, 0, 0, 1, 2, 2, 2, 2, 2])
+    assert np.load(path).shape == (9, len(EXPORT_COLUMNS))
+    for loaded, trajectory in zip(split_episodes(columns), episodes):
+        assert np.array_equal(loaded.rows, trajectory.rows)
+
+
+def test_text_formats(tmp_path):
+    # without an initial state the first step is left out, a row is the state before a step
+    trajectory = make_trajectory(4)
+    save_trajectory(trajectory, str(tmp_path / "track6D.txt"))
+    columns = load_trajectories(str(tmp_path / "track6D.txt"))
+    assert list(columns) == ["x", "y", "front", "right", "left", "wheel"]
+    assert np.allclose(columns["x"], trajectory["x"][:-1]) and np.allclose(columns["wheel"], trajectory["wheel"][1:])
+
+    trajectory.initial = np.array([-1, -2, 90, 0, 4.5, 5.5, 6.5, 0, 0])
+    save_trajectory(trajectory, str(tmp_path / "track4D.txt"), "track4D")
+    assert np.allclose(np.loadtxt(tmp_path / "track4D.txt")[0], [4.5, 5.5, 6.5, 0])
+    assert np.loadtxt(tmp_path / "track4D.txt").shape == (4, 4)
+
+    with pytest.raises(ValueError):
+        save_trajectory(trajectory, str(tmp_path / "car.parquet"), "parquet")
+
+
+def test_text_rows_pair_the_state_with_the_wheel_angle_driven_from_it(tmp_path):
+    playground = Playground(PLAYGROUND_PATH)
+    playground.trajectory = Trajectory()
+    state = playground.reset()
+    expected = []
+    for action in [1, 5, 9, 3, 7]:
+        position = playground.car.getPosition("center")
+        wheel = playground.calWheelAngleFromAction(action)
+        expected.append([position.x, position.y, *state, wheel])
+        state, _ = playground.step(action)
+
+    path = str(tmp_path / "track6D.txt")
+    save_trajectory(playground.trajectory, path)
+    assert np.allclose(np.loadtxt(path), expected, atol=1e-6)
+
+
+def test_text_formats_after_a_npy_round_trip(tmp_path):
+    playground = Playground(PLAYGROUND_PATH)
+    playground.trajectory = Trajectory()
+    episodes = []
+    for actions in ([1, 5, 9], [7, 3]):
+        playground.reset()
+        for action in actions:
+            playground.step(action)
+        episodes.append(playground.trajectory.copy())
+
+    with TrajectoryWriter(str(tmp_path / "episodes.npy")) as writer:
+        for trajectory in episodes:
+            writer.write(trajectory)
+    columns = load_trajectories(str(tmp_path / "episodes.npy"))
+    assert np.array_equal(columns["step"], [-1, 0, 1, 2, -1, 0, 1])
+
+    for i, (loaded, trajectory) in enumerate(zip(split_episodes(columns), episodes)):
+        save_trajectory(trajectory, str(tmp_path / f"direct{i}.txt"), "track4D")
+        save_trajectory(loaded, str(tmp_path / f"loaded{i}.txt"), "track4D")
+        assert (tmp_path / f"loaded{i}.txt").read_text() == (tmp_path / f"direct{i}.txt").read_text()
+        assert np.loadtxt(tmp_path / f"loaded{i}.txt").shape == (len(trajectory), 4)
+
+
+def test_empty_episode(tmp_path):
+    path = str(tmp_path / "empty.npy")
+    save_trajectory(Trajectory(), path)
+    columns = load_trajectories(path, mmap=False)
+    assert len(columns["x"]) == 0 and split_episodes(columns) == []
@@ -0,0 +1,289 @@
+import os
+import random
+import argparse
+import numpy as np
+from typing import Callable
+from concurrent.futures import ProcessPoolExecutor
+
+from MyLib.simple_playground import Playground
+from MyLib.QModel import Qmodel, SparseQmodel, TileCodingQmodel
+from MyLib.replay_buffer import ReplayBuffer
+from MyLib.checkpoint import save_checkpoint, load_checkpoint
+from MyLib.trajectory import Trajectory
+
+# Q-Learning Variable
+N_EPISODES = 5000
+N_ACTIONS = 80
+ALHPA = 0.1
+GAMMA = 0.9
+REPLAY_CAPACITY = 10000
+REPLAY_BATCH_SIZE = 0  # replayed transitions per step, 0 learns only from the last one (opt in with e.g. 32)
+
+# Sensor Variable
+CENTER_N_STATES = 30
+COMBINE_N_STATES = 60
+MAX_CENTER_DISTANCE = 100
+MIN_CENTER_DISTANCE = 0
+MAX_COMBINE_DISTANCE = 100
+MIN_COMBINE_DISTANCE = -100
+
+# Tile Coding Variable, front, right and left sensor
+TILE_LOWS = (0, 0, 0)
+TILE_HIGHS = (60, 60, 60)
+N_TILES = 8
+N_TILINGS = 8
+
+# discretization saved with a checkpoint, a grid model only fits the bounds it was trained with
+STATE_BOUNDS = dict(center=[MIN_CENTER_DISTANCE, MAX_CENTER_DISTANCE], combine=[MIN_COMBINE_DISTANCE, MAX_COMBINE_DISTANCE])
+
+PLAYGROUND_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "playground", "軌道座標點.txt")
+
+
+def state_calculate(center_distance: float, left_distance: float, right_distance: float, n_states: tuple = (CENTER_N_STATES, COMBINE_N_STATES)) -> tuple[int, int]:
+    center_n_states, combine_n_states = n_states
+    center_state = int((center_distance - MIN_CENTER_DISTANCE) / (MAX_CENTER_DISTANCE - MIN_CENTER_DISTANCE) * center_n_states)
+    combine_distance = left_distance - right_distance
+    combine_state = int((combine_distance - MIN_COMBINE_DISTANCE) / (MAX_COMBINE_DISTANCE - MIN_COMBINE_DISTANCE) * combine_n_states)
+    return center_state, combine_state
+
+
+def exploration_rate(n_episodes, min_rate=0.1, max_rate=1.0, decay_rate=0.01) -> float:
+    return min_rate + (max_rate - min_rate) * np.exp(-decay_rate * n_episodes)
+
+
+class Trainer():
+    '''
+    The Q-learning episode loop of the HW1 App without any UI. The state
+    grid is taken from model.n_states, e.g. a fine grid in a SparseQmodel,
+    a TileCodingQmodel gets the sensor values themselves.
+
+    With count_visits, visits counts the (state, action) updates since the
+    last reset_visits, it is the weight of this trainer when Q-tables are
+    merged (dense Qmodel only).
+
+    episodes counts the episodes trained so far, including the ones of a
+    loaded checkpoint, and sets the exploration rate of the next episode.
+    '''
+    def __init__(self, playground_path: str = PLAYGROUND_PATH, model: Qmodel = None, replay_batch_size: int = REPLAY_BATCH_SIZE, seed: int = None,
+                 verbose: bool = False, count_visits: bool = False, episodes: int = 0) -> None:
+        self.playground = Playground(playground_path)
+        self.model = model if model is not None else Qmodel(n_actions=N_ACTIONS, n_states=(CENTER_N_STATES, COMBINE_N_STATES), alpha=ALHPA, gamma=GAMMA)
+        continuous = isinstance(self.model, TileCodingQmodel)
+        self.buffer = ReplayBuffer(REPLAY_CAPACITY, state_dim=len(self.model.lows) if continuous else len(self.model.n_states),
+                                   state_dtype=float if continuous else int)
+        self.replay_batch_size = replay_batch_size
+        self.rng = np.random.default_rng(seed)
+        self.verbose = verbose
+        self.visits = np.zeros(self.model.q_table.shape, dtype=int) if count_visits else None
+        self.trajectory = self.playground.trajectory = Trajectory()  # steps of the last episode
+        self.arrived = False
+        self.episodes = episodes
+
+    @classmethod
+    def from_checkpoint(cls, path: str, playground_path: str = PLAYGROUND_PATH, **kwargs) -> 'Trainer':
+        '''
+        continue training a model saved by save_checkpoint
+        '''
+        model, metadata = load_checkpoint(path)
+        if "state_bounds" in metadata and metadata["state_bounds"] != STATE_BOUNDS:
+            raise ValueError(f"the checkpoint was trained with state bounds {metadata['state_bounds']}, not {STATE_BOUNDS}")
+        return cls(playground_path, model, episodes=metadata["episodes"], **kwargs)
+
+    def save_checkpoint(self, path: str) -> None:
+        save_checkpoint(self.model, path, self.episodes, state_bounds=STATE_BOUNDS)
+
+    def reset_visits(self) -> None:
+        if self.visits is not None:
+            self.visits[...] = 0
+
+    def encode_state(self, sensor_output) -> tuple:
+        if isinstance(self.model, TileCodingQmodel):
+            return tuple(sensor_output)
+        return state_calculate(*sensor_output, self.model.n_states)
+
+    def run_episode(self, episode: int = None, learn: bool = True, max_steps: int = None) -> bool:
+        '''
+        one training episode, episode sets the exploration rate (default:
+        the next one). learn=False drives greedily without updating the
+        model. Returns True if the car arrived at the destination.
+        '''
+        p = self.playground
+        model = self.model
+        episode = self.episodes if episode is None else episode
+
+        sensor_output = p.reset()
+        state = self.encode_state(sensor_output)
+        steps = 0
+        while not p.done and (max_steps is None or steps < max_steps):
+            if learn and self.rng.random() < exploration_rate(episode):  # explore
+                action = int(self.rng.integers(model.n_actions))
+            else:
+                action = model.predict(state)
+
+            # environment
+            next_sensor_output, reward = p.step(action)
+
+            next_state = self.encode_state(next_sensor_output)
+            if learn:
+                model.update_table(state, action, reward, next_state)
+                if self.visits is not None:
+                    self.visits[state + (action, )] += 1
+                if self.replay_batch_size > 0:
+                    self.buffer.add(state, action, reward, next_state, p.done)
+                    model.replay(self.buffer, self.replay_batch_size, self.rng)
+            state = next_state
+            steps += 1
+
+        if learn:
+            self.episodes = max(self.episodes, episode + 1)
+        if self.verbose:
+            print(f"Episode {episode}: {'success' if p.isAtDestination else 'fail'}, {steps} steps")
+        return p.isAtDestination
+
+    def train(self, n_episodes: int = N_EPISODES, first_episode: int = None, stop_at_destination: bool = True,
+              callback: Callable[[int, bool], bool] = None) -> int:
+        '''
+        Returns the number of episodes run, like the App training stops at
+        the first episode that reaches the destination. callback(episode,
+        arrived) is called after every episode, training stops early when
+        it returns True.
+        '''
+        first_episode = self.episodes if first_episode is None else first_episode
+        for e in range(first_episode, first_episode + n_episodes):
+            self.arrived = self.run_episode(e)
+            stop = callback is not None and callback(e, self.arrived)
+            if stop or (self.arrived and stop_at_destination):
+                return e - first_episode + 1
+        return n_episodes
+
+
+def merge_q_tables(q_tables: list[np.ndarray], visits: list[np.ndarray] = None) -> np.ndarray:
+    '''
+    average of the Q-tables, or with visits the average weighted by the
+    visit counts of every entry (plain average where nobody visited it)
+    '''
+    q_tables = np.stack(q_tables)
+    average = q_tables.mean(axis=0)
+    if visits is None:
+        return average
+
+    visits = np.stack(visits)
+    total = visits.sum(axis=0)
+    weighted = (q_tables * visits).sum(axis=0) / np.maximum(total, 1)
+    return np.where(total > 0, weighted, average)
+
+
+_worker_trainer = None
+
+def _init_worker(playground_path: str, n_states: tuple, replay_batch_size: int, seed) -> None:
+    global _worker_trainer
+    random.seed(seed)  # Car.reset
+    model = Qmodel(n_actions=N_ACTIONS, n_states=n_states, alpha=ALHPA, gamma=GAMMA)
+    _worker_trainer = Trainer(playground_path, model, replay_batch_size, seed, count_visits=True)
+
+def _worker_train(q_table: np.ndarray, n_episodes: int, first_episode: int):
+    trainer = _worker_trainer
+    trainer.model.q_table = q_table
+    trainer.reset_visits()
+    trainer.train(n_episodes, first_episode)
+    return trainer.model.q_table, trainer.visits, trainer.arrived, trainer.trajectory if trainer.arrived else None
+
+
+class ParallelTrainer():
+    '''
+    num_workers processes, each with its own Playground and Trainer, start
+    every round from the shared Q-table, run sync_every episodes and send
+    their tables back, which are merged by "average" or "visits" weighting.
+    Training stops after the round in which a worker reaches the destination.
+    '''
+    def __init__(self, playground_path: str = PLAYGROUND_PATH, num_workers: int = None, sync_every: int = 50, merge: str = "visits",
+                 replay_batch_size: int = REPLAY_BATCH_SIZE, seed: int = None, verbose: bool = False, n_states: tuple = (CENTER_N_STATES, COMBINE_N_STATES)) -> None:
+        if merge not in ("average", "visits"):
+            raise ValueError("merge must be 'average' or 'visits'")
+        self.playground_path = playground_path
+        self.num_workers = num_workers or os.cpu_count()
+        self.sync_every = sync_every
+        self.merge = merge
+        self.replay_batch_size = replay_batch_size
+        self.seed = seed
+        self.verbose = verbose
+        self.model = Qmodel(n_actions=N_ACTIONS, n_states=tuple(n_states), alpha=ALHPA, gamma=GAMMA)
+        self.trajectory = Trajectory()
+        self.arrived = False
+        self.episodes = 0  # per worker
+
+    def save_checkpoint(self, path: str) -> None:
+        save_checkpoint(self.model, path, self.episodes, state_bounds=STATE_BOUNDS, workers=self.num_workers)
+
+    def train(self, n_episodes: int = N_EPISODES) -> int:
+        '''
+        Returns the number of rounds of sync_every episodes per worker
+        '''
+        seeds = np.random.SeedSequence(self.seed).generate_state(self.num_workers)
+        executors = [ProcessPoolExecutor(1, initializer=_init_worker, initargs=(self.playground_path, self.model.n_states, self.replay_batch_size, int(s)))
+                     for s in seeds]  # one per worker, so every worker keeps its own trainer
+        try:
+            rounds = 0
+            for first_episode in range(0, n_episodes, self.sync_every):
+                n = min(self.sync_every, n_episodes - first_episode)
+                futures = [executor.submit(_worker_train, self.model.q_table, n, first_episode) for executor in executors]
+                q_tables, visits, arrived, trajectories = zip(*[f.result() for f in futures])
+
+                self.model.q_table = merge_q_tables(q_tables, visits if self.merge == "visits" else None)
+                self.episodes = first_episode + n
+                rounds += 1
+                if self.verbose:
+                    print(f"Round {rounds}: episodes {first_episode}-{first_episode + n - 1}, {sum(arrived)} of {self.num_workers} workers arrived")
+                self.arrived = any(arrived)
+                if self.arrived:
+                    self.trajectory = next(t for t in trajectories if t is not None)
+                    break
+            return rounds
+        finally:
+            for executor in executors:
+                executor.shutdown()
+
+
+def main(args: list[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Train the HW1 Q-learning car without the UI")
+    parser.add_argument("--playground", default=PLAYGROUND_PATH)
+    parser.add_argument("--episodes", type=int, default=N_EPISODES)
+    parser.add_argument("--workers", type=int, default=1, help="> 1 trains in worker processes and merges their Q-tables")
+    parser.add_argument("--sync-every", type=int, default=50, help="episodes per worker between two merges")
+    parser.add_argument("--merge", choices=["average", "visits"], default="visits")
+    parser.add_argument("--replay-batch-size", type=int, default=REPLAY_BATCH_SIZE, help="replayed transitions per step, 0: no experience replay")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--states", type=int, nargs=2, default=[CENTER_N_STATES, COMBINE_N_STATES], metavar=("CENTER", "COMBINE"),
+                        help="number of center and combine distance states")
+    parser.add_argument("--sparse", action="store_true", help="store only the visited states, for fine state grids (single worker)")
+    parser.add_argument("--tile-coding", action="store_true", help="linear Q-function over tile coded sensor values (single worker)")
+    parser.add_argument("--resume", default=None, help="checkpoint directory to continue training from (single worker)")
+    parser.add_argument("--output", default="checkpoint", help="checkpoint directory the model is saved to")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(args)
+
+    if args.workers > 1:
+        if args.sparse or args.tile_coding or args.resume:
+            parser.error("--sparse, --tile-coding and --resume need a single worker, the workers merge dense Q-tables")
+        trainer = ParallelTrainer(args.playground, args.workers, args.sync_every, args.merge, args.replay_batch_size, args.seed, args.verbose, args.states)
+    else:
+        random.seed(args.seed)
+        if args.resume:
+            trainer = Trainer.from_checkpoint(args.resume, args.playground, replay_batch_size=args.replay_batch_size, seed=args.seed, verbose=args.verbose)
+        else:
+            if args.tile_coding:
+                model = TileCodingQmodel(N_ACTIONS, TILE_LOWS, TILE_HIGHS, N_TILES, N_TILINGS, alpha=ALHPA, gamma=GAMMA)
+            else:
+                model = (SparseQmodel if args.sparse else Qmodel)(n_actions=N_ACTIONS, n_states=tuple(args.states), alpha=ALHPA, gamma=GAMMA)
+            trainer = Trainer(args.playground, model, args.replay_batch_size, args.seed, args.verbose)
+    trainer.train(args.episodes)
+
+    memory = trainer.model.memory_usage()
+    stored = f"{memory['states']} states" if "states" in memory else f"{memory['tiles']} tiles ({memory['updated_tiles']} updated)"
+    print(f"{stored} stored in {memory['bytes']/2**20:.2f} MiB (dense table: {memory['dense_bytes']/2**20:.2f} MiB)")
+    trainer.save_checkpoint(args.output)
+    print(f"{'Arrived at destination' if trainer.arrived else 'Not arrived'}, checkpoint saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
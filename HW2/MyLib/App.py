@@ -2,23 +2,25 @@ import os
 
 import numpy as np
 import tkinter as tk
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.animation import FuncAnimation
-from matplotlib import font_manager as fm
-import matplotlib.pyplot as plt
 
 from MyLib.simple_playground import Playground
-from MyLib.Fuzzy import FuzzySystem, FuzzySet, FuzzyRule
+from MyLib.background import TrainingJob
+from MyLib.trajectory import Trajectory
+from MyLib.trajectory_io import save_trajectory
+from MyLib.Fuzzy import FuzzySystem
+from MyLib.tuning import RuleBaseEncoding, run_episode, TUNED_RULE_BASE_PATH
 
-import matplotlib.font_manager
 
 # Global Variable
 PLAYGROUND_ROOT_PTAH = ".\\playground\\"
 INIT_PLAYGROUND = "軌道座標點.txt"
 ROOT_PATH = os.path.dirname(os.path.abspath(__name__))
+TRAJECTORY_PATH = os.path.join(ROOT_PATH, "trajectory.npy")
 
 # UI Variable
 FIGURE_SIZE = 10
+MAX_ANIMATION_FRAMES = 500  # longer runs are downsampled in draw_run
+POLL_INTERVAL = 100  # ms between two progress updates while running
 
 # Sensor Variable
 MAX_CENTER_DISTANCE = 20
@@ -29,6 +31,10 @@ TURN_LEFT = -40
 TURN_RIGHT = 40
 
 # Fuzzy Variable
+DEFUZZIFICATION = "avg_of_center"  # or "centroid_of_union", "mean_of_maximum", "sugeno"
+LOOKUP_TABLE_RESOLUTION = None  # e.g. (41, 41): drive with FuzzySystem.compile, a bilinear lookup table
+
+# Plot Variable
 NUMBER_OF_POINTS_IN_FUZZY_SET = 1000
 
 
@@ -44,8 +50,13 @@ class App():
         self.fuzzy_rules = self.get_fuzzy_rules()
 
         self.fuzzy = FuzzySystem(self.fuzzy_rules)
+        if LOOKUP_TABLE_RESOLUTION is not None:
+            self.fuzzy = self.fuzzy.compile(LOOKUP_TABLE_RESOLUTION, DEFUZZIFICATION)
+            print(f"Lookup table {LOOKUP_TABLE_RESOLUTION}, error bound {self.fuzzy.error_bound:.2f} degrees")
         self.playground = Playground(self.playground_path)
         self.animation = None 
+        self.job = None
+        self.trajectory = Trajectory()
 
         # UI
         self.msg = tk.Label(self.root, text="Fuzzy System", font=('Arial', 16))
@@ -56,59 +67,23 @@ class App():
         self.init_control_panel()
 
     def get_fuzzy_rules(self):
-        triangular = lambda x, a, b, c: 0 if x <= a else (x-a)/(b-a) if a <= x <= b else (c-x)/(c-b) if b <= x <= c else 0
-        down_up = lambda x, a, b: 0 if x <= a else (x-a)/(b-a) if a <= x <= b else 1 
-        up_down = lambda x, a, b: 1 if x <= a else (b-x)/(b-a) if a <= x <= b else 0
-        trapezoid = lambda x, a, b, c, d: 0 if x <= a else (x-a)/(b-a) if a <= x <= b else 1 if b <= x <= c else (d-x)/(d-c) if c <= x <= d else 0
-
-        m_neg_set = FuzzySet(MIN_CENTER_DISTANCE, MAX_CENTER_DISTANCE, 
-                        [up_down(x, 4, 8) for x in np.linspace(MIN_CENTER_DISTANCE, MAX_CENTER_DISTANCE, NUMBER_OF_POINTS_IN_FUZZY_SET)],
-                        name="Near", id="m_neg_set")
-        m_mid_set = FuzzySet(MIN_CENTER_DISTANCE, MAX_CENTER_DISTANCE, 
-                            [triangular(x, 4, 8, 12) for x in np.linspace(MIN_CENTER_DISTANCE, MAX_CENTER_DISTANCE, NUMBER_OF_POINTS_IN_FUZZY_SET)],
-                            name="Middle", id="m_mid_set")
-        m_pos_set = FuzzySet(MIN_CENTER_DISTANCE, MAX_CENTER_DISTANCE, 
-                            [down_up(x, 8, 12) for x in np.linspace(MIN_CENTER_DISTANCE, MAX_CENTER_DISTANCE, NUMBER_OF_POINTS_IN_FUZZY_SET)],
-                            name="Far", id="m_pos_set")
-        
-        lr_neg_set = FuzzySet(MIN_COMBINE_DISTANCE, MAX_COMBINE_DISTANCE, 
-                            [up_down(x, -3, 0) for x in np.linspace(MIN_COMBINE_DISTANCE, MAX_COMBINE_DISTANCE, NUMBER_OF_POINTS_IN_FUZZY_SET)],
-                            name="Near Left", id="lr_neg_set")
-        lr_mid_set = FuzzySet(MIN_COMBINE_DISTANCE, MAX_COMBINE_DISTANCE, 
-                            [trapezoid(x, -3, -1, 1, 3) for x in np.linspace(MIN_COMBINE_DISTANCE, MAX_COMBINE_DISTANCE, NUMBER_OF_POINTS_IN_FUZZY_SET)],
-                            name="Middle", id="lr_mid_set")
-        lr_pos_set = FuzzySet(MIN_COMBINE_DISTANCE, MAX_COMBINE_DISTANCE, 
-                            [down_up(x, 0, 3) for x in np.linspace(MIN_COMBINE_DISTANCE, MAX_COMBINE_DISTANCE, NUMBER_OF_POINTS_IN_FUZZY_SET)],
-                            name="Near Right", id="lr_pos_set")
-
-        angle_neg_set = FuzzySet(TURN_LEFT, TURN_RIGHT, 
-                                [up_down(x, -40, 0) for x in np.linspace(TURN_LEFT, TURN_RIGHT, NUMBER_OF_POINTS_IN_FUZZY_SET)],
-                                name="Turn Left", id="angle_neg_set")
-        angle_mid_set = FuzzySet(TURN_LEFT, TURN_RIGHT, 
-                                [triangular(x, -20, 0, 20) for x in np.linspace(TURN_LEFT, TURN_RIGHT, NUMBER_OF_POINTS_IN_FUZZY_SET)],
-                                name="Straight", id="angle_mid_set")
-        angle_pos_set = FuzzySet(TURN_LEFT, TURN_RIGHT, 
-                                [down_up(x, 0, 40) for x in np.linspace(TURN_LEFT, TURN_RIGHT, NUMBER_OF_POINTS_IN_FUZZY_SET)],
-                                name="Turn Right", id="angle_pos_set")
-
-        fuzzy_rule_list = [
-            FuzzyRule([m_neg_set, lr_neg_set], angle_neg_set),
-            FuzzyRule([m_neg_set, lr_mid_set], angle_mid_set),
-            FuzzyRule([m_neg_set, lr_pos_set], angle_pos_set),
-
-            FuzzyRule([m_mid_set, lr_neg_set], angle_neg_set),
-            FuzzyRule([m_mid_set, lr_mid_set], angle_mid_set),
-            FuzzyRule([m_mid_set, lr_pos_set], angle_pos_set),
-
-            FuzzyRule([m_pos_set, lr_neg_set], angle_neg_set),
-            FuzzyRule([m_pos_set, lr_mid_set], angle_mid_set),
-            FuzzyRule([m_pos_set, lr_pos_set], angle_pos_set)
-        ]
-
-        return fuzzy_rule_list
+        # the hand-written rule base, or the one saved by MyLib.tuning
+        encoding = RuleBaseEncoding(DEFUZZIFICATION)
+        tuned_path = os.path.join(ROOT_PATH, TUNED_RULE_BASE_PATH)
+        if os.path.exists(tuned_path):
+            try:
+                return encoding.decode(np.load(tuned_path))
+            except ValueError as e:
+                # tuned for another DEFUZZIFICATION, "sugeno" has more entries than the Mamdani types
+                print(f"{tuned_path}: {e}, using the hand-written rule base")
+        return encoding.decode(encoding.default())
 
 
     def init_plot_pannel(self):
+        # matplotlib is imported here, not at module level, so importing MyLib.App stays cheap
+        import matplotlib.pyplot as plt
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
         # Create a Matplotlib figure and axis
         self.figure, self.ax = plt.subplots()
         self.ax.set_xlim(-10, 35)
@@ -131,6 +106,8 @@ class App():
         # Button to start some process
         self.start_button = tk.Button(group3, text="Run System", command=self.startBtn_onclick, bg="green")
         self.start_button.grid(row=1, column=0, pady=5)
+        self.cancel_button = tk.Button(group3, text="Cancel", command=self.cancelBtn_onclick, bg="light grey", state="disabled")
+        self.cancel_button.grid(row=1, column=1, pady=5)
         # Show Rule button
         self.reset_button = tk.Button(group3, text="Show Fuzzy Sets", command=self.show_fuzzy_sets, bg="light grey")
         self.reset_button.grid(row=2, column=0, pady=5)
@@ -139,6 +116,8 @@ class App():
         self.save_button.grid(row=3, column=0, pady=5)
         
     def draw_playground(self):
+        import matplotlib.pyplot as plt
+
         p = self.playground
         playground_edge_lines = [[p.lines[i].p1.x, p.lines[i].p1.y, p.lines[i].p2.x, p.lines[i].p2.y] for i in range(len(p.lines))]
 
@@ -154,71 +133,59 @@ class App():
         self.canvas.draw()
 
     def startBtn_onclick(self):
-        def state_calucate(center_distance, left_distance, right_distance):
-            left_distance = left_distance if left_distance > 0 else 0
-            right_distance = right_distance if right_distance > 0 else 0
-
-            center_state = center_distance
-            combine_distance = left_distance - right_distance
-            return center_distance, combine_distance
-
-        def start_training():
-            self.start_button.config(text="Training...", bg="grey", state="disabled")
-            self.msg.config(text="Training...", fg="black")
-
-            p = self.playground
-
-            sensor_output = p.reset()
-            center_distance, left_distance, right_distance = sensor_output
-            center_state, combine_state = state_calucate(center_distance, left_distance, right_distance)
-            self.action_list = []
-            while not p.done:
-
-                # Fuzzy System
-                action = self.fuzzy.infer((center_state, combine_state))
-                print(f"pre_state: {center_state}, {combine_state}")
-                print(f"action angle: {action}")
-                next_sensor_output = p.step(action)
-                next_center_distance, next_left_distance, next_right_distance = next_sensor_output
-                car_pos = [p.car.getPosition("center").x, p.car.getPosition("center").y]
-
-                next_center_state, next_combine_state = state_calucate(next_center_distance, next_left_distance, next_right_distance)
-
-                center_state, combine_state = next_center_state, next_combine_state
-                self.action_list.append({
-                    "previous_car_pos": car_pos,
-                    "pre_state": [next_center_distance, next_left_distance, next_right_distance],
-                    "degree": action
-                })
-                    
-                if p.done:
-                    break
-            
-            if p.isAtDestination:
-                print("success")
-                self.msg.config(text="Arrived at Destination", fg="black")
-            else:
-                print("fail")
-                self.msg.config(text="Crashed", fg="red")
-
-            self.draw_run()
-            print("Running Ended")
-
-            # except Exception as e:
-            #     self.msg.config(text=str(e), fg="red")
-
-            self.start_button.config(text="Start Running", bg="green", state="normal")
-            self.msg.config(text="Running Ended", fg="black")
-
-        start_training()
+        fuzzy, p = self.fuzzy, self.playground
+
+        def drive(report, cancelled):
+            def on_step(step):
+                report(step=step)
+                return cancelled()
+
+            return run_episode(p, fuzzy, DEFUZZIFICATION, callback=on_step).copy(), p.isAtDestination
+
+        self.start_button.config(text="Training...", bg="grey", state="disabled")
+        self.cancel_button.config(state="normal")
+        self.msg.config(text="Training...", fg="black")
+        self.job = TrainingJob(drive).start()
+        self.root.after(POLL_INTERVAL, self.poll_training)
+
+    def cancelBtn_onclick(self):
+        if self.job is not None:
+            self.job.cancel()
+            self.msg.config(text="Cancelling...", fg="black")
+
+    def poll_training(self):
+        # runs on the Tk main loop, the episode itself runs in self.job
+        done = self.job.done
+        updates = self.job.poll()
+        if updates and not self.job.cancelled:
+            progress = updates[-1]
+            self.msg.config(text=f"Step {progress['step'] + 1}", fg="black")
+        if not done:
+            self.root.after(POLL_INTERVAL, self.poll_training)
+            return
+
+        self.start_button.config(text="Start Running", bg="green", state="normal")
+        self.cancel_button.config(state="disabled")
+        if self.job.error is not None:
+            self.msg.config(text=str(self.job.error), fg="red")
+            return
+
+        self.trajectory, arrived = self.job.result
+        print("success" if arrived else "fail")
+        self.draw_run()
+        print("Running Ended")
+        self.msg.config(text="Running Cancelled" if self.job.cancelled else "Running Ended", fg="black")
 
     def saveBtn_onclick(self):
         save_path = os.path.join(ROOT_PATH, "car_path.txt")
-        with open("car_path.txt", "w") as f:
-            for action in self.action_list:
-                f.write(f"{action['previous_car_pos']}\n")
+        with open(save_path, "w") as f:
+            for position in self.trajectory.positions.tolist():
+                f.write(f"{position}\n")
+        # every column of the episode, see MyLib.trajectory_io.load_trajectories
+        save_trajectory(self.trajectory, TRAJECTORY_PATH)
         print("Car path saved to", save_path)
-        self.msg.config(text="Car path saved to .\\car_path.txt", fg="black")
+        print("Trajectory saved to", TRAJECTORY_PATH)
+        self.msg.config(text=f"Car path saved to {save_path}", fg="black")
 
 
     def run(self) -> None:
@@ -230,52 +197,59 @@ class App():
         self.root.protocol("WM_DELETE_WINDOW", on_closing)
         self.root.mainloop()
 
-    def draw_run(self) -> None:
+    def draw_run(self, max_frames: int = MAX_ANIMATION_FRAMES) -> None:
+        '''
+        animate the last episode, runs longer than max_frames steps show
+        every k-th step only (the path itself keeps every step)
+        '''
+        import matplotlib.pyplot as plt
+        from matplotlib.animation import FuncAnimation
+
+        # views of the recorded columns, every frame only slices these
+        positions = self.trajectory.positions
+        sensors = self.trajectory.sensors
+        stride = -(-len(positions) // max_frames)
+        frames = np.append(np.arange(0, len(positions) - 1, stride), len(positions) - 1)
+
         line, = self.ax.plot([], [], lw=2)
-        circle = plt.Circle(self.action_list[0]["previous_car_pos"], radius=self.playground.car.radius/2, color='r')
+        circle = plt.Circle(positions[0], radius=self.playground.car.radius/2, color='r')
+        self.ax.add_patch(circle)
         annotation = self.ax.annotate("", xy=(30, -10), xytext=(5, 5),
                                         textcoords="offset points", ha='right', va='bottom',
                                         bbox=dict(boxstyle='round,pad=0.3', alpha=0.7))
 
         def update(frame):
-            xdata = [x["previous_car_pos"][0] for x in self.action_list[:frame]]
-            ydata = [x["previous_car_pos"][1] for x in self.action_list[:frame]]
-
-            line.set_data(xdata, ydata)
-
-            circle_x, circle_y = self.action_list[frame]["previous_car_pos"][0], self.action_list[frame]["previous_car_pos"][1]
-            right = self.action_list[frame]["pre_state"][1]
-            left = self.action_list[frame]["pre_state"][2]
-            front = self.action_list[frame]["pre_state"][0]
+            line.set_data(positions[:frame + 1, 0], positions[:frame + 1, 1])
 
+            circle_x, circle_y = positions[frame]
+            front, right, left = sensors[frame]
             circle.set_center((circle_x, circle_y))
 
             label = f'car pos: ({circle_x:.2f}, {circle_y:.2f})\nfront sensor: {front:.2f}\nright sensor: {right:.2f}\nleft sensor: {left:.2f}'
             annotation.set_text(label)
 
-            self.canvas.draw()
-
+            # blit=True redraws only these artists, no canvas.draw() here
             return line, circle, annotation
 
         def init():
             line.set_data([], [])
-            circle.set_center((self.action_list[0]["previous_car_pos"][0], self.action_list[0]["previous_car_pos"][1]))
-            self.ax.add_patch(circle)
-
-            annotation = self.ax.annotate("", xy=(30, 0), xytext=(5, 5))
+            circle.set_center(positions[0])
+            annotation.set_text("")
             return line, circle, annotation
 
         if self.animation:
             self.animation.event_source.stop()
 
         try:
-            self.animation = FuncAnimation(self.figure, update, frames=len(self.action_list), init_func=init, interval=100, blit=True)
+            self.animation = FuncAnimation(self.figure, update, frames=frames, init_func=init, interval=100, blit=True)
         except Exception as e:
             print("Fail to draw animation.")
             print(e)
             pass
     
     def show_fuzzy_sets(self) -> None:  # bad
+        import matplotlib.pyplot as plt
+
         fig, axs = plt.subplots(3, 1, figsize=(8, 12))
         
         fuzzy_sets = set()
@@ -284,12 +258,13 @@ class App():
                 fuzzy_sets.add(fuzzy_set)
 
         for fuzzy_set in fuzzy_sets:
+            xs = np.linspace(fuzzy_set.min_x, fuzzy_set.max_x, NUMBER_OF_POINTS_IN_FUZZY_SET)
             if fuzzy_set.id.startswith("m_"):
-                axs[0].plot(np.linspace(MIN_CENTER_DISTANCE, MAX_CENTER_DISTANCE, NUMBER_OF_POINTS_IN_FUZZY_SET), fuzzy_set.membership_function, label=fuzzy_set.name)
+                axs[0].plot(xs, fuzzy_set.infer_membership(xs), label=fuzzy_set.name)
             elif fuzzy_set.id.startswith("lr_"):
-                axs[1].plot(np.linspace(MIN_COMBINE_DISTANCE, MAX_COMBINE_DISTANCE, NUMBER_OF_POINTS_IN_FUZZY_SET), fuzzy_set.membership_function, label=fuzzy_set.name)
+                axs[1].plot(xs, fuzzy_set.infer_membership(xs), label=fuzzy_set.name)
             elif fuzzy_set.id.startswith("angle"):
-                axs[2].plot(np.linspace(TURN_LEFT, TURN_RIGHT, NUMBER_OF_POINTS_IN_FUZZY_SET), fuzzy_set.membership_function, label=fuzzy_set.name)
+                axs[2].plot(xs, fuzzy_set.infer_membership(xs), label=fuzzy_set.name)
 
         axs[0].legend()
         axs[0].set_xticks(np.arange(MIN_CENTER_DISTANCE, MAX_CENTER_DISTANCE, 1))
@@ -1,53 +1,388 @@
 from abc import ABC, abstractmethod
 import numpy as np
-from matplotlib import pyplot as plt
 import math
+from functools import cached_property
+
+# x grid of the union of the consequent sets, when they are not sampled on a common grid
+UNION_GRID_POINTS = 1001
+# FuzzyLookupTable.error_bound samples the second derivatives this many times finer than the table
+ERROR_BOUND_REFINEMENT = 4
 
 class FuzzySet():
+    '''
+    membership_function holds the membership of the points
+    x_grid[i] = min_x + i*(max_x-min_x)/number_of_points and is treated as
+    read only, height and center_of_mass are computed once and cached.
+    '''
     def __init__(self, min_x: float, max_x: float, membership_function: list[float], name: str = "", id: str = "") -> None:
         self.min_x = min_x
         self.max_x = max_x
-        self.membership_function = membership_function
+        self.membership_function = np.asarray(membership_function, dtype=float)
         self.name = name
         self.id = id
+        self._x_grid = None
         
     @property
     def number_of_points(self):
-        return len(self.membership_function)
-    
+        return self.membership_function.size
+
     @property
+    def x_grid(self) -> np.ndarray:
+        if self._x_grid is None:
+            self._x_grid = self.min_x + np.arange(self.number_of_points)*(self.max_x-self.min_x)/self.number_of_points
+        return self._x_grid
+    
+    @cached_property
     def height(self) -> float:
-        return max(self.membership_function)
+        return float(self.membership_function.max())
 
-    @property
+    @cached_property
     def center_of_mass(self) -> float:  # uncheck
         if self.height == 0:
             return math.floor((self.min_x + self.max_x)/2)
 
-        numerator = 0
-        denominator = 0
-        for i, member_value in enumerate(self.membership_function):
-            numerator += (self.min_x + i*(self.max_x-self.min_x)/self.number_of_points)*member_value
-            denominator += member_value
-        return numerator/denominator
+        return float(np.dot(self.x_grid, self.membership_function)/self.membership_function.sum())
 
     def alpha_cut(self, alpha: float) -> 'FuzzySet':
-        new_membership_function = []
-        for i, member_value in enumerate(self.membership_function):
-            if member_value >= alpha:
-                new_membership_function.append(alpha)
+        cut_set = FuzzySet(self.min_x, self.max_x, np.minimum(self.membership_function, alpha))
+        cut_set._x_grid = self._x_grid  # same grid, no need to build it again
+        return cut_set
+
+    @cached_property
+    def _cut_tables(self):
+        # memberships in ascending order with prefix sums of mu, x*mu and x,
+        # a cut at alpha keeps the points below alpha and flattens the rest
+        order = np.argsort(self.membership_function, kind='stable')
+        mu = self.membership_function[order]
+        x = self.x_grid[order]
+        prefix = lambda v: np.concatenate([[0.0], np.cumsum(v)])
+        return mu, prefix(mu), prefix(x*mu), prefix(x)
+
+    def cut_centroid(self, alpha):
+        '''
+        alpha: float or ndarray, returns (center_of_mass, height) of
+        alpha_cut(alpha) for every alpha without building the cut sets
+        '''
+        scalar = np.ndim(alpha) == 0
+        alpha = np.asarray(alpha, dtype=float)
+        mu, mu_sum, x_mu_sum, x_sum = self._cut_tables
+        k = np.searchsorted(mu, alpha)
+        area = mu_sum[k] + alpha*(mu.size - k)
+        moment = x_mu_sum[k] + alpha*(x_sum[-1] - x_sum[k])
+        height = np.minimum(alpha, self.height)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            center = np.where(height == 0, math.floor((self.min_x + self.max_x)/2), moment/area)
+        return (float(center), float(height)) if scalar else (center, height)
+
+    def max_region(self, alpha):
+        '''
+        alpha: ndarray, returns (center, length) of the points where
+        alpha_cut(alpha) reaches its height
+        '''
+        mu, _, _, x_sum = self._cut_tables
+        k = np.searchsorted(mu, np.minimum(alpha, self.height))
+        count = mu.size - k
+        return (x_sum[-1] - x_sum[k])/count, count*(self.max_x - self.min_x)/mu.size
+
+    def infer_membership(self, x):
+        '''
+        x: float or ndarray, the membership is returned in the same shape
+        '''
+        index = np.floor((np.asarray(x) - self.min_x)/(self.max_x-self.min_x)*self.number_of_points).astype(int)
+        membership = self.membership_function[np.clip(index, 0, self.number_of_points - 1)]
+        return float(membership) if np.ndim(x) == 0 else membership
+
+
+class MembershipFunction(ABC):
+    '''
+    Membership function in closed form, evaluated exactly instead of being
+    sampled. The alpha cut min(mu(x), alpha) is integrated analytically.
+    '''
+    @abstractmethod
+    def __call__(self, x):
+        pass
+
+    @abstractmethod
+    def height(self, min_x: float, max_x: float) -> float:
+        pass
+
+    @abstractmethod
+    def cut_area_moment(self, alpha, min_x: float, max_x: float):
+        '''
+        integral of min(mu(x), alpha) and of x*min(mu(x), alpha) over
+        [min_x, max_x], alpha can be a float or an ndarray
+        '''
+        pass
+
+    @abstractmethod
+    def level_set(self, level, min_x: float, max_x: float):
+        '''
+        (center, length) of {x in [min_x, max_x] : mu(x) >= level}, level is
+        an ndarray not above height(min_x, max_x)
+        '''
+        pass
+
+
+def _trapezoid_area_moment(x0, x1, y0, y1):
+    # line from (x0, y0) to (x1, y1)
+    area = (x1 - x0)*(y0 + y1)/2
+    moment = (x1 - x0)*(x0*(2*y0 + y1) + x1*(y0 + 2*y1))/6
+    return area, moment
+
+
+class PiecewiseLinear(MembershipFunction):
+    '''
+    Linear between the break points (xs, ys), constant outside of them.
+    '''
+    def __init__(self, xs: list[float], ys: list[float]) -> None:
+        self.xs = np.asarray(xs, dtype=float)
+        self.ys = np.asarray(ys, dtype=float)
+        self._vertex_lists = {}
+
+    def __call__(self, x):
+        return np.interp(x, self.xs, self.ys)
+
+    def vertices(self, min_x: float, max_x: float):
+        xs = np.concatenate([[min_x], self.xs[(min_x < self.xs) & (self.xs < max_x)], [max_x]])
+        return xs, self(xs)
+
+    def height(self, min_x: float, max_x: float) -> float:
+        return float(self.vertices(min_x, max_x)[1].max())
+
+    def cut_area_moment(self, alpha, min_x: float, max_x: float):
+        if np.ndim(alpha) == 0:
+            return self._cut_area_moment_scalar(float(alpha), min_x, max_x)
+
+        alpha = np.asarray(alpha, dtype=float)
+        area = np.zeros(alpha.shape)
+        moment = np.zeros(alpha.shape)
+
+        xs, ys = self.vertices(min_x, max_x)
+        for x0, x1, y0, y1 in zip(xs[:-1], xs[1:], ys[:-1], ys[1:]):
+            if x1 <= x0:
+                continue
+            if y0 == y1:
+                a, m = _trapezoid_area_moment(x0, x1, np.minimum(y0, alpha), np.minimum(y1, alpha))
             else:
-                new_membership_function.append(member_value)
-        return FuzzySet(self.min_x, self.max_x, new_membership_function)
-
-    def infer_membership(self, x: float) -> float:
-        if x <= self.min_x:
-            return self.membership_function[0]
-        elif x >= self.max_x:
-            return self.membership_function[-1]
-        else:
-            print("Fix", math.floor((x-self.min_x)/(self.max_x-self.min_x)*self.number_of_points)-1)
-            return self.membership_function[math.floor((x-self.min_x)/(self.max_x-self.min_x)*self.number_of_points)]
+                # the segment crosses alpha at xc, left of it is the lower end when rising
+                level = np.clip(alpha, min(y0, y1), max(y0, y1))
+                xc = x0 + (level - y0)/(y1 - y0)*(x1 - x0)
+                if y0 < y1:
+                    a0, m0 = _trapezoid_area_moment(x0, xc, y0, level)
+                    a1, m1 = _trapezoid_area_moment(xc, x1, level, level)
+                else:
+                    a0, m0 = _trapezoid_area_moment(x0, xc, level, level)
+                    a1, m1 = _trapezoid_area_moment(xc, x1, level, y1)
+                below = alpha < min(y0, y1)  # the whole segment is cut
+                a = np.where(below, alpha*(x1 - x0), a0 + a1)
+                m = np.where(below, alpha*(x1**2 - x0**2)/2, m0 + m1)
+            area = area + a
+            moment = moment + m
+        return area, moment
+
+    def level_set(self, level, min_x: float, max_x: float):
+        level = np.asarray(level, dtype=float)
+        length = np.zeros(level.shape)
+        moment = np.zeros(level.shape)
+        # vertices reaching the level, the center when the set is a single point
+        count = np.zeros(level.shape)
+        total = np.zeros(level.shape)
+
+        xs, ys = self.vertices(min_x, max_x)
+        for x, y in zip(xs, ys):
+            count = count + (y >= level)
+            total = total + np.where(y >= level, x, 0)
+        for x0, x1, y0, y1 in zip(xs[:-1], xs[1:], ys[:-1], ys[1:]):
+            if x1 <= x0:
+                continue
+            if y0 == y1:
+                lo, hi = x0, np.where(y0 >= level, x1, x0)
+            else:
+                xc = x0 + (np.clip(level, min(y0, y1), max(y0, y1)) - y0)/(y1 - y0)*(x1 - x0)
+                lo, hi = (xc, x1) if y0 < y1 else (x0, xc)
+            length = length + (hi - lo)
+            moment = moment + (hi**2 - lo**2)/2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(length > 0, moment/length, total/count), length
+
+    def _cut_area_moment_scalar(self, alpha: float, min_x: float, max_x: float):
+        # same as cut_area_moment with plain floats, numpy is slow on scalars
+        if (min_x, max_x) not in self._vertex_lists:
+            xs, ys = self.vertices(min_x, max_x)
+            self._vertex_lists[(min_x, max_x)] = (xs.tolist(), ys.tolist())
+        xs, ys = self._vertex_lists[(min_x, max_x)]
+
+        area = moment = 0.0
+        for x0, x1, y0, y1 in zip(xs[:-1], xs[1:], ys[:-1], ys[1:]):
+            if x1 <= x0:
+                continue
+            if alpha <= min(y0, y1):
+                parts = [(x0, x1, alpha, alpha)]
+            elif alpha >= max(y0, y1):
+                parts = [(x0, x1, y0, y1)]
+            else:
+                xc = x0 + (alpha - y0)/(y1 - y0)*(x1 - x0)
+                if y0 < y1:
+                    parts = [(x0, xc, y0, alpha), (xc, x1, alpha, alpha)]
+                else:
+                    parts = [(x0, xc, alpha, alpha), (xc, x1, alpha, y1)]
+            for part in parts:
+                a, m = _trapezoid_area_moment(*part)
+                area += a
+                moment += m
+        return area, moment
+
+
+class Triangle(PiecewiseLinear):
+    def __init__(self, a: float, b: float, c: float) -> None:
+        super().__init__([a, b, c], [0, 1, 0])
+
+
+class Trapezoid(PiecewiseLinear):
+    def __init__(self, a: float, b: float, c: float, d: float) -> None:
+        super().__init__([a, b, c, d], [0, 1, 1, 0])
+
+
+class LeftShoulder(PiecewiseLinear):
+    '''
+    1 up to a, falls to 0 at b (up_down)
+    '''
+    def __init__(self, a: float, b: float) -> None:
+        super().__init__([a, b], [1, 0])
+
+
+class RightShoulder(PiecewiseLinear):
+    '''
+    0 up to a, rises to 1 at b (down_up)
+    '''
+    def __init__(self, a: float, b: float) -> None:
+        super().__init__([a, b], [0, 1])
+
+
+_erf = np.vectorize(math.erf, otypes=[float])
+
+
+class Gaussian(MembershipFunction):
+    def __init__(self, mean: float, sigma: float) -> None:
+        self.mean = mean
+        self.sigma = sigma
+
+    def __call__(self, x):
+        return np.exp(-0.5*((x - self.mean)/self.sigma)**2)
+
+    def height(self, min_x: float, max_x: float) -> float:
+        return float(self(min(max(self.mean, min_x), max_x)))
+
+    def _area_moment(self, p, q):
+        # integral of g and x*g over [p, q]
+        scale = self.sigma*math.sqrt(2)
+        area = self.sigma*math.sqrt(math.pi/2)*(_erf((q - self.mean)/scale) - _erf((p - self.mean)/scale))
+        moment = self.mean*area + self.sigma**2*(self(p) - self(q))
+        return area, moment
+
+    def cut_area_moment(self, alpha, min_x: float, max_x: float):
+        alpha = np.asarray(alpha, dtype=float)
+        # g > alpha on |x - mean| < half_width, the cut is flat there
+        with np.errstate(divide='ignore', invalid='ignore'):
+            half_width = self.sigma*np.sqrt(np.maximum(-2*np.log(np.minimum(alpha, 1)), 0))
+        lo = np.clip(self.mean - half_width, min_x, max_x)
+        hi = np.clip(self.mean + half_width, min_x, max_x)
+
+        total_area, total_moment = self._area_moment(min_x, max_x)
+        inner_area, inner_moment = self._area_moment(lo, hi)
+        area = total_area - inner_area + alpha*(hi - lo)
+        moment = total_moment - inner_moment + alpha*(hi**2 - lo**2)/2
+        return area, moment
+
+    def level_set(self, level, min_x: float, max_x: float):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            half_width = self.sigma*np.sqrt(np.maximum(-2*np.log(np.minimum(level, 1)), 0))
+        lo = np.clip(self.mean - half_width, min_x, max_x)
+        hi = np.clip(self.mean + half_width, min_x, max_x)
+        return (lo + hi)/2, hi - lo
+
+
+class AnalyticFuzzySet():
+    '''
+    Same interface as FuzzySet, backed by a MembershipFunction instead of
+    sampled points. An alpha cut only lowers self.alpha, the membership is
+    min(membership_function(x), alpha) on [min_x, max_x].
+    '''
+    def __init__(self, min_x: float, max_x: float, membership_function: MembershipFunction, name: str = "", id: str = "", alpha: float = 1.0) -> None:
+        self.min_x = min_x
+        self.max_x = max_x
+        self.membership_function = membership_function
+        self.name = name
+        self.id = id
+        self.alpha = alpha
+
+    @cached_property
+    def height(self) -> float:
+        return min(self.alpha, self.membership_function.height(self.min_x, self.max_x))
+
+    @cached_property
+    def center_of_mass(self) -> float:
+        if self.height == 0:
+            return math.floor((self.min_x + self.max_x)/2)
+
+        area, moment = self.membership_function.cut_area_moment(self.alpha, self.min_x, self.max_x)
+        return float(moment/area)
+
+    def cut_centroid(self, alpha):
+        '''
+        alpha: ndarray, returns (center_of_mass, height) of alpha_cut(alpha)
+        for every alpha without building the cut sets
+        '''
+        if np.ndim(alpha) == 0:
+            cut_set = self.alpha_cut(alpha)
+            return cut_set.center_of_mass, cut_set.height
+
+        alpha = np.minimum(np.asarray(alpha, dtype=float), self.alpha)
+        area, moment = self.membership_function.cut_area_moment(alpha, self.min_x, self.max_x)
+        height = np.minimum(alpha, self.membership_function.height(self.min_x, self.max_x))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            center = np.where(height == 0, math.floor((self.min_x + self.max_x)/2), moment/area)
+        return center, height
+
+    def max_region(self, alpha):
+        '''
+        alpha: ndarray, returns (center, length) of the points where
+        alpha_cut(alpha) reaches its height
+        '''
+        level = np.minimum(np.minimum(alpha, self.alpha), self.membership_function.height(self.min_x, self.max_x))
+        return self.membership_function.level_set(level, self.min_x, self.max_x)
+
+    def alpha_cut(self, alpha: float) -> 'AnalyticFuzzySet':
+        return AnalyticFuzzySet(self.min_x, self.max_x, self.membership_function, self.name, self.id, min(self.alpha, alpha))
+
+    def infer_membership(self, x):
+        '''
+        x: float or ndarray, the membership is returned in the same shape
+        '''
+        membership = np.minimum(self.membership_function(np.clip(x, self.min_x, self.max_x)), self.alpha)
+        return float(membership) if np.ndim(x) == 0 else membership
+
+
+class LinearConsequent():
+    '''
+    Consequent of a Sugeno (TSK) rule: constant + coefficients . input.
+    Without coefficients the rule is zero order and outputs the constant.
+    '''
+    def __init__(self, constant: float, coefficients: list[float] = (), name: str = "", id: str = "") -> None:
+        self.constant = float(constant)
+        self.coefficients = [float(c) for c in coefficients]
+        self.name = name
+        self.id = id
+
+    def __call__(self, input):
+        '''
+        input: tuple of one input, or (n, number of inputs) ndarray
+        '''
+        if np.ndim(input) < 2:
+            return self.constant + sum(c*x for c, x in zip(self.coefficients, input))
+        if not self.coefficients:
+            return np.full(len(input), self.constant)
+        return self.constant + input @ np.asarray(self.coefficients)
 
 
 class FuzzyRule():
@@ -56,54 +391,329 @@ class FuzzyRule():
         self.consequent = consequent
 
     def infer(self, variable: tuple) -> FuzzySet:
+        return self.consequent.alpha_cut(self.strength(variable))
+
+    def strength(self, variable: tuple) -> float:
+        '''
+        min of the antecedent memberships of one input
+        '''
         if len(variable) != len(self.antecedents):
             raise ValueError("The number of variables must be the same as the number of antecedents")
+        return min(antecedent.infer_membership(x) for x, antecedent in zip(variable, self.antecedents))
+
+    def firing_strength(self, inputs: np.ndarray) -> np.ndarray:
+        '''
+        inputs: (n, number of antecedents), returns the (n,) min of the
+        antecedent memberships
+        '''
+        if inputs.shape[-1] != len(self.antecedents):
+            raise ValueError("The number of variables must be the same as the number of antecedents")
+        return np.min([antecedent.infer_membership(inputs[:, i]) for i, antecedent in enumerate(self.antecedents)], axis=0)
+
+class FuzzyTrace():
+    '''
+    Records of FuzzySystem inference in preallocated arrays, one row per
+    input: the input, the firing strength (alpha) of every rule, the center
+    of mass and height of every alpha cut and the defuzzified output.
+    Once capacity rows are written the oldest rows are overwritten.
+    '''
+    def __init__(self, capacity: int, number_of_inputs: int, number_of_rules: int) -> None:
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.inputs = np.zeros((capacity, number_of_inputs))
+        self.firing_strengths = np.zeros((capacity, number_of_rules))
+        self.cut_centers = np.zeros((capacity, number_of_rules))
+        self.cut_heights = np.zeros((capacity, number_of_rules))
+        self.outputs = np.zeros(capacity)
+        self.number_of_records = 0  # including the overwritten ones
+
+    def __len__(self) -> int:
+        return min(self.number_of_records, self.capacity)
+
+    def record(self, inputs, firing_strengths, cut_centers, cut_heights, outputs) -> None:
+        '''
+        inputs: (n, number of inputs), the others (n, number of rules) and (n,)
+        '''
+        n = len(outputs)
+        rows = (self.number_of_records + np.arange(max(0, n - self.capacity), n)) % self.capacity
+        start = n - len(rows)
+        self.inputs[rows] = inputs[start:]
+        self.firing_strengths[rows] = firing_strengths[start:]
+        self.cut_centers[rows] = cut_centers[start:]
+        self.cut_heights[rows] = cut_heights[start:]
+        self.outputs[rows] = outputs[start:]
+        self.number_of_records += n
+
+    def records(self) -> dict[str, np.ndarray]:
+        '''
+        copies of the kept rows, oldest first
+        '''
+        order = (self.number_of_records - len(self) + np.arange(len(self))) % self.capacity
+        return {
+            "inputs": self.inputs[order],
+            "firing_strengths": self.firing_strengths[order],
+            "cut_centers": self.cut_centers[order],
+            "cut_heights": self.cut_heights[order],
+            "outputs": self.outputs[order],
+        }
+
+    def clear(self) -> None:
+        self.number_of_records = 0
 
-        # alpha = min([antecedent.infer_membership(x) for x, antecedent in zip(variable, self.antecedents)])
-        alphas = []
-        for x, antecedent in zip(variable, self.antecedents):
-            print('x, set name:', x, antecedent.name)
-            alphas.append(antecedent.infer_membership(x))
-        
-        min_alpha = min(alphas)
-        print('alphas', alphas)
-        print('min_alpha', min_alpha)
-
-
-        return self.consequent.alpha_cut(min_alpha)
 
 class FuzzySystem():
-    def __init__(self, rules: list[FuzzyRule]) -> None:
+    '''
+    union_grid_points: x grid of "centroid_of_union" when the consequents
+    are not sampled sets on one common grid, those use their own grid.
+    The union centroid is a sum over the grid, its error shrinks with the
+    spacing h = (max_x - min_x)/(union_grid_points - 1) and stays well
+    below h/2, about 0.005 degrees with the default 1001 points over
+    [-40, 40]. "mean_of_maximum" needs no grid, it uses the plateaus of
+    the cut sets.
+    '''
+    def __init__(self, rules: list[FuzzyRule], union_grid_points: int = UNION_GRID_POINTS) -> None:
         self.rules = rules
+        self.trace = None
+        self.union_grid_points = union_grid_points
 
-    def infer(self, input: tuple, infer_type: str = "avg_of_center") -> float:
+    def enable_tracing(self, capacity: int = 10000) -> FuzzyTrace:
+        self.trace = FuzzyTrace(capacity, len(self.rules[0].antecedents), len(self.rules))
+        return self.trace
+
+    def disable_tracing(self) -> None:
+        self.trace = None
 
+    def infer(self, input: tuple, infer_type: str = "avg_of_center") -> float:
+        '''
+        infer_type:
+            "avg_of_center": average of the cut centers weighted by the cut heights
+            "centroid_of_union": center of mass of the union of the cut sets
+            "mean_of_maximum": mean of the points where the union is highest
+            "sugeno": average of the LinearConsequent outputs weighted by the
+                firing strengths
+        '''
         if infer_type == "avg_of_center":
             numerator = 0
             denominator = 0
-            for i, rule in enumerate(self.rules):
-                print(f"\n==== Rule {i} ===")
-                result_set = rule.infer(input)
-                assert -40 <= result_set.center_of_mass and result_set.center_of_mass <= 40, "center of mass must be positive"
-                assert result_set.height >= 0, "height must be positive"
-
-                print("in start of fuzzy system")
-                print(f"center of mass: {result_set.center_of_mass}")
-                print(f"height: {result_set.height}")
-                numerator += result_set.center_of_mass * result_set.height
-                denominator += result_set.height
-            print("\n === in fuzzy system === ")
-            print(f"{numerator}/{denominator}")
+            alphas = []
+            centers = []
+            heights = []
+            for rule in self.rules:
+                alpha = rule.strength(input)
+                center, height = rule.consequent.cut_centroid(alpha)
+                assert -40 <= center and center <= 40, "center of mass must be positive"
+                assert height >= 0, "height must be positive"
+
+                numerator += center * height
+                denominator += height
+                if self.trace is not None:
+                    alphas.append(alpha)
+                    centers.append(center)
+                    heights.append(height)
 
             angle = numerator/denominator
 
             assert -40 <= angle and angle <= 40, "angle should be within -40~40"
 
-            return numerator/denominator
+            if self.trace is not None:
+                self.trace.record([input], [alphas], [centers], [heights], [angle])
+            return angle
+
+        elif infer_type == "sugeno":
+            alphas = [rule.strength(input) for rule in self.rules]
+            outputs = [rule.consequent(input) for rule in self.rules]
+            output = sum(a*y for a, y in zip(alphas, outputs))/sum(alphas)
+
+            if self.trace is not None:
+                self.trace.record([input], [alphas], [outputs], [alphas], [output])
+            return output
+
+        elif infer_type in ("centroid_of_union", "mean_of_maximum"):
+            # both work on the union of the cut sets, the batch path is as fast
+            return float(self.infer_batch([input], infer_type)[0])
         
         else:
             raise NotImplementedError
 
+    def infer_batch(self, inputs: np.ndarray, infer_type: str = "avg_of_center") -> np.ndarray:
+        '''
+        inputs: (n, number of inputs), one row per call of infer
+        output: (n,) same values as infer
+        '''
+        inputs = np.atleast_2d(np.asarray(inputs, dtype=float))
+        if infer_type not in ("avg_of_center", "sugeno", "centroid_of_union", "mean_of_maximum"):
+            raise NotImplementedError
+
+        strengths = np.stack([rule.firing_strength(inputs) for rule in self.rules], axis=1)  # (n, rules)
+        if infer_type == "sugeno":
+            centers = np.stack([rule.consequent(inputs) for rule in self.rules], axis=1)
+            heights = strengths
+        else:
+            centers, heights = zip(*[rule.consequent.cut_centroid(strengths[:, i]) for i, rule in enumerate(self.rules)])
+            centers = np.stack(centers, axis=1)
+            heights = np.stack(heights, axis=1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if infer_type in ("avg_of_center", "sugeno"):
+                outputs = (centers*heights).sum(axis=1)/heights.sum(axis=1)
+            elif infer_type == "centroid_of_union":
+                outputs = self._centroid_of_union(strengths)
+            else:
+                outputs = self._mean_of_maximum(strengths)
+
+        if self.trace is not None:
+            self.trace.record(inputs, strengths, centers, heights, outputs)
+        return outputs
+
+    def _consequent_strengths(self, strengths: np.ndarray):
+        '''
+        distinct consequent sets and their (n, sets) alphas, rules with the
+        same consequent cut it at the largest of their firing strengths
+        '''
+        consequents = []
+        columns = []
+        for i, rule in enumerate(self.rules):
+            for j, consequent in enumerate(consequents):
+                if consequent is rule.consequent:
+                    columns[j] = np.maximum(columns[j], strengths[:, i])
+                    break
+            else:
+                consequents.append(rule.consequent)
+                columns.append(strengths[:, i])
+        return consequents, np.stack(columns, axis=1)
+
+    def _union_grid(self, consequents: list) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        shared x grid and (sets, points) memberships of the consequent sets,
+        kept until the consequents change
+        '''
+        cached = getattr(self, "_union_cache", None)
+        if cached is not None and len(cached[0]) == len(consequents) and all(a is b for a, b in zip(cached[0], consequents)):
+            return cached[1], cached[2]
+
+        first = consequents[0]
+        if all(isinstance(c, FuzzySet) and (c.min_x, c.max_x, c.number_of_points) == (first.min_x, first.max_x, first.number_of_points)
+               for c in consequents):
+            grid = first.x_grid
+            memberships = np.stack([c.membership_function for c in consequents])
+        else:
+            grid = np.linspace(min(c.min_x for c in consequents), max(c.max_x for c in consequents), self.union_grid_points)
+            memberships = np.stack([c.infer_membership(grid) for c in consequents])
+        self._union_cache = (consequents, grid, memberships)
+        return grid, memberships
+
+    def _centroid_of_union(self, strengths: np.ndarray) -> np.ndarray:
+        consequents, alphas = self._consequent_strengths(strengths)
+        grid, memberships = self._union_grid(consequents)
+        union = np.minimum(memberships[0], alphas[:, 0, None])
+        for j in range(1, len(consequents)):
+            np.maximum(union, np.minimum(memberships[j], alphas[:, j, None]), out=union)
+        return (union @ grid)/union.sum(axis=1)
+
+    def _mean_of_maximum(self, strengths: np.ndarray) -> np.ndarray:
+        consequents, alphas = self._consequent_strengths(strengths)
+        heights = np.stack([np.minimum(alphas[:, j], c.height) for j, c in enumerate(consequents)], axis=1)
+        centers, lengths = map(np.column_stack, zip(*[c.max_region(alphas[:, j]) for j, c in enumerate(consequents)]))
+
+        # the union is highest on the plateaus of the highest cut sets, one
+        # interval per (convex) set, overlapping intervals are merged so the
+        # overlap is counted once. The other sets become empty intervals
+        # before the first plateau.
+        top = heights >= heights.max(axis=1, keepdims=True)
+        first = np.where(top, centers - lengths/2, np.inf).min(axis=1, keepdims=True)
+        lo = np.where(top, centers - lengths/2, first)
+        hi = np.where(top, centers + lengths/2, first)
+        order = np.argsort(lo, axis=1)
+        lo, hi = np.take_along_axis(lo, order, axis=1), np.take_along_axis(hi, order, axis=1)
+        # the part of every interval not covered by the ones before it
+        reach = np.maximum.accumulate(hi, axis=1)
+        start = np.maximum(lo, np.concatenate([lo[:, :1], reach[:, :-1]], axis=1))
+        end = np.maximum(hi, start)
+        total = (end - start).sum(axis=1)
+        by_length = ((start + end)/2*(end - start)).sum(axis=1)/total
+        by_count = np.where(top, centers, 0).sum(axis=1)/top.sum(axis=1)
+        return np.where(total > 0, by_length, by_count)
+
+    def input_bounds(self) -> list[tuple[float, float]]:
+        '''
+        (min_x, max_x) of every input, taken over the antecedent sets of all rules
+        '''
+        return [(min(s.min_x for s in sets), max(s.max_x for s in sets))
+                for sets in zip(*[rule.antecedents for rule in self.rules])]
+
+    def compile(self, resolution: tuple = (41, 41), infer_type: str = "avg_of_center", check_error: bool = True) -> 'FuzzyLookupTable':
+        return FuzzyLookupTable(self, resolution, infer_type, check_error)
+
+
+class FuzzyLookupTable():
+    '''
+    A two input FuzzySystem precomputed on a regular grid and served by
+    bilinear interpolation. The rule base must not change after compiling.
+
+    Inputs outside the antecedent ranges are clamped to the range, the
+    membership functions are constant there so the result is unchanged.
+
+    error_bound bounds the difference to the exact path by the bilinear
+    interpolation error h_x^2/8 max|f_xx| + h_y^2/8 max|f_yy|, the second
+    derivatives taken as the largest second differences of the exact path
+    on a grid ERROR_BOUND_REFINEMENT times finer. A kink or jump of the
+    output shows up there as a large second difference, so the bound stays
+    conservative for the piecewise outputs of a fuzzy system.
+    '''
+    def __init__(self, system: FuzzySystem, resolution: tuple = (41, 41), infer_type: str = "avg_of_center", check_error: bool = True) -> None:
+        if len(system.input_bounds()) != 2:
+            raise ValueError("The lookup table only supports fuzzy systems with two inputs")
+        if min(resolution) < 2:
+            raise ValueError("resolution must be at least 2 in each dimension")
+
+        (self.min_x, self.max_x), (self.min_y, self.max_y) = system.input_bounds()
+        self.n_x, self.n_y = resolution
+        self.step_x = (self.max_x - self.min_x)/(self.n_x - 1)
+        self.step_y = (self.max_y - self.min_y)/(self.n_y - 1)
+        self.x_grid = np.linspace(self.min_x, self.max_x, self.n_x)
+        self.y_grid = np.linspace(self.min_y, self.max_y, self.n_y)
+
+        grid = np.stack(np.meshgrid(self.x_grid, self.y_grid, indexing='ij'), axis=-1).reshape(-1, 2)
+        self.table = system.infer_batch(grid, infer_type).reshape(self.n_x, self.n_y)
+        self._rows = self.table.tolist()  # plain floats are faster to index one by one
+
+        self.infer_type = infer_type
+        self.error_bound = None
+        if check_error:
+            self.error_bound = self._error_bound(system)
+
+    def _error_bound(self, system: FuzzySystem, refinement: int = None) -> float:
+        refinement = refinement if refinement is not None else ERROR_BOUND_REFINEMENT
+        fine_x = np.linspace(self.min_x, self.max_x, (self.n_x - 1)*refinement + 1)
+        fine_y = np.linspace(self.min_y, self.max_y, (self.n_y - 1)*refinement + 1)
+        grid = np.stack(np.meshgrid(fine_x, fine_y, indexing='ij'), axis=-1).reshape(-1, 2)
+        exact = system.infer_batch(grid, self.infer_type).reshape(len(fine_x), len(fine_y))
+
+        h_x, h_y = self.step_x/refinement, self.step_y/refinement
+        f_xx = np.abs(exact[2:] - 2*exact[1:-1] + exact[:-2]).max()/h_x**2
+        f_yy = np.abs(exact[:, 2:] - 2*exact[:, 1:-1] + exact[:, :-2]).max()/h_y**2
+        return float(self.step_x**2/8*f_xx + self.step_y**2/8*f_yy)
+
+    def infer(self, input: tuple, infer_type: str = None) -> float:
+        '''
+        same call as FuzzySystem.infer, infer_type must be the compiled one
+        '''
+        if infer_type is not None and infer_type != self.infer_type:
+            raise ValueError(f"The lookup table was compiled for {self.infer_type}, not {infer_type}")
+        x, y = input
+        fx = (min(max(x, self.min_x), self.max_x) - self.min_x)/self.step_x
+        fy = (min(max(y, self.min_y), self.max_y) - self.min_y)/self.step_y
+        i = min(int(fx), self.n_x - 2)
+        j = min(int(fy), self.n_y - 2)
+        tx = fx - i
+        ty = fy - j
+
+        row0 = self._rows[i]
+        row1 = self._rows[i + 1]
+        return ((row0[j]*(1 - ty) + row0[j + 1]*ty)*(1 - tx)
+                + (row1[j]*(1 - ty) + row1[j + 1]*ty)*tx)
+
 
 MAX_CENTER_DISTANCE = 20
 MIN_CENTER_DISTANCE = 0
@@ -114,6 +724,8 @@ TURN_RIGHT = 40
 NUMBER_OF_POINTS_IN_FUZZY_SET = 1000
 
 if __name__ == "__main__":
+    from matplotlib import pyplot as plt  # only the demo plots
+
     MAX_X = -100
     MIN_X = 100
     mean = 0
@@ -0,0 +1,74 @@
+import os
+import time
+import argparse
+import numpy as np
+
+from MyLib.simple_playground import Playground
+from MyLib.trajectory import Trajectory
+from MyLib.trajectory_io import save_trajectory, TEXT_FORMATS
+from MyLib.Fuzzy import FuzzySystem
+from MyLib.tuning import RuleBaseEncoding, tune, run_episode, MAX_STEPS
+
+PLAYGROUND_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "playground", "軌道座標點.txt")
+INFER_TYPES = ["avg_of_center", "centroid_of_union", "mean_of_maximum", "sugeno"]
+
+
+def write_car_path(trajectory: Trajectory, path: str) -> None:
+    # same format as App.saveBtn_onclick
+    with open(path, "w") as f:
+        for position in trajectory.positions.tolist():
+            f.write(f"{position}\n")
+
+
+def describe_outcome(playground: Playground) -> str:
+    # an episode ends at the destination, against a wall, or at the step limit
+    if playground.isAtDestination:
+        return "Arrived at destination"
+    return "Crashed" if playground.done else "Stopped at the step limit"
+
+
+def main(args: list[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Drive one episode with the HW2 fuzzy system without the UI")
+    parser.add_argument("--playground", default=PLAYGROUND_PATH)
+    parser.add_argument("--infer-type", choices=INFER_TYPES, default="avg_of_center")
+    parser.add_argument("--rule-base", default=None, help=".npy rule base saved by MyLib.tuning (default: the hand-written one)")
+    parser.add_argument("--lookup-table", type=int, nargs=2, default=None, metavar=("N_CENTER", "N_COMBINE"),
+                        help="drive with a bilinear lookup table of this resolution instead of the exact inference")
+    parser.add_argument("--tune", action="store_true", help="tune the rule base with PSO before driving")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--particles", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--max-steps", type=int, default=MAX_STEPS, help="steps per episode, while tuning and driving")
+    parser.add_argument("--save-rule-base", default="tuned_rule_base.npy", help="where the tuned rule base is saved")
+    parser.add_argument("--output", default="car_path.txt", help="car path of the episode")
+    parser.add_argument("--trajectory", default=None, help="also save every column of the episode, .npy or a course text format")
+    parser.add_argument("--trajectory-format", choices=["npy"] + list(TEXT_FORMATS), default=None, help="default: npy for .npy paths, else track6D")
+    args = parser.parse_args(args)
+
+    encoding = RuleBaseEncoding(args.infer_type)
+    x = np.load(args.rule_base) if args.rule_base else encoding.default()
+    if args.tune:
+        start = time.perf_counter()
+        np.random.seed(args.seed)
+        x, fitness = tune(args.playground, encoding, args.particles, args.iterations, args.workers, args.seed, args.max_steps)
+        np.save(args.save_rule_base, x)
+        print(f"Tuned in {time.perf_counter() - start:.2f} s, fitness: {fitness:.2f}, rule base saved to {args.save_rule_base}")
+
+    playground = Playground(args.playground)
+    fuzzy = FuzzySystem(encoding.decode(x))
+    if args.lookup_table:
+        fuzzy = fuzzy.compile(tuple(args.lookup_table), args.infer_type)
+        print(f"Lookup table {args.lookup_table[0]}x{args.lookup_table[1]}, error bound {fuzzy.error_bound:.2f} degrees")
+    start = time.perf_counter()
+    trajectory = run_episode(playground, fuzzy, args.infer_type, args.max_steps)
+    elapsed = time.perf_counter() - start
+    write_car_path(trajectory, args.output)
+    if args.trajectory:
+        save_trajectory(trajectory, args.trajectory, args.trajectory_format)
+    print(f"{describe_outcome(playground)} after {len(trajectory)} steps "
+          f"in {elapsed:.2f} s, car path saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
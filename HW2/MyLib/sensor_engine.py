@@ -0,0 +1,80 @@
+import numpy as np
+
+from MyLib.simple_geometry import Line2D
+
+# sensor directions relative to the car angle: front, right, left
+SENSOR_ANGLES = np.array([0, -45, 45])
+
+
+class SensorEngine():
+    '''
+    Array based wall test used by Playground._checkDoneIntersects.
+
+    All walls are stored in one (N, 4) array [x1, y1, x2, y2], the sensor
+    rays and the collision test are evaluated against every wall in one
+    vectorized pass. Leading batch dimensions are supported, so the same
+    engine can serve one car or many cars at once.
+    '''
+
+    def __init__(self, lines: list[Line2D]) -> None:
+        self.walls = np.array([[l.p1.x, l.p1.y, l.p2.x, l.p2.y] for l in lines], dtype=float).reshape(-1, 4)
+        self.x1, self.y1 = self.walls[:, 0], self.walls[:, 1]
+        self.dx = self.walls[:, 2] - self.x1
+        self.dy = self.walls[:, 3] - self.y1
+        self.wall_len = np.hypot(self.dx, self.dy)
+        # a zero length wall has no body, only its end points can be touched
+        self.inv_len = np.divide(1, self.wall_len, out=np.zeros_like(self.wall_len), where=self.wall_len > 0)
+
+    def scan(self, centers: np.ndarray, sensor_points: np.ndarray, diameter: float):
+        '''
+        input:
+            centers: (..., 2) car center points
+            sensor_points: (..., S, 2) end point of every sensor ray
+            diameter: touch distance of the car body
+        output:
+            touched: (...) bool, car body touches a wall
+            ray_touch: (..., S) bool, ray segment center -> sensor overlaps a wall
+            dists: (..., S) distance from center to the nearest hit, -1 if none
+
+        Same conventions as Line2D.lineOverlap: a wall is hit when it lies
+        beyond the sensor point (t > 1), and a ray that already overlaps a
+        wall (0 < t <= 1) reports no hit at all.
+        '''
+        cx = centers[..., 0, None]  # (..., 1)
+        cy = centers[..., 1, None]
+        x13 = cx - self.x1  # (..., N)
+        y13 = cy - self.y1
+
+        # cross product of the wall with center - p1, shared by both tests
+        t_num = y13*self.dx - x13*self.dy
+
+        # body touch
+        dp1 = np.hypot(x13, y13)
+        dp2 = np.hypot(x13 - self.dx, y13 - self.dy)
+        touched = ((dp1 < diameter) | (dp2 < diameter)
+                   | ((np.abs(t_num)*self.inv_len < diameter) & (dp1 < self.wall_len) & (dp2 < self.wall_len)))
+
+        # sensor rays, [x1 + t(x2-x1), y1 + t(y2-y1)] = [x3 + u(x4-x3), y3 + u(y4-y3)]
+        rays = sensor_points - centers[..., None, :]  # (..., S, 2)
+        rx = rays[..., 0, None]  # (..., S, 1)
+        ry = rays[..., 1, None]
+        denom = rx*self.dy - ry*self.dx  # (..., S, N)
+        u_num = x13[..., None, :]*ry - y13[..., None, :]*rx
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = t_num[..., None, :]/denom
+            u = u_num/-denom
+
+        t_le1 = t <= 1
+        u_on = (u >= 0) & (u <= 1)  # nan or inf when the lines are parallel
+        u_in = u_on & (u != 0)
+        ray_touch = u_on & (t >= 0) & t_le1
+        ray_touch |= np.isnan(t) & (u_num == 0)  # parallel and overlapped
+        blocked = (u_in & (t > 0) & t_le1).any(axis=-1)
+
+        t_hit = np.where(u_in & ~t_le1, t, np.inf)
+        t_min = t_hit.min(axis=-1)  # nearest hit along the ray
+        found = (t_min < np.inf) & ~blocked
+        dists = np.where(found, t_min*np.hypot(rays[..., 0], rays[..., 1]), -1.0)
+
+        return touched.any(axis=-1), ray_touch.any(axis=-1), dists
@@ -2,6 +2,8 @@ import random as r
 
 from MyLib.Car import Car
 from MyLib.simple_geometry import Line2D, Point2D
+from MyLib.sensor_engine import SensorEngine, SENSOR_ANGLES
+from MyLib.trajectory import Trajectory
 import numpy as np
 
 
@@ -10,6 +12,7 @@ class Playground():
         # read path lines
         self.path_line_filename = track_name
         self._readPathLines() # Changed !!
+        self.sensor_engine = SensorEngine(self.lines)
         self.decorate_lines = [
             Line2D(-6, 0, 6, 0),  # start line
             Line2D(0, 0, 0, -3),  # middle line
@@ -17,6 +20,7 @@ class Playground():
         self.car = Car()
         self.done = False
         self.isAtDestination = False
+        self.trajectory: Trajectory = None  # set to a Trajectory to record every step
         self.reset()
 
     def _setDefaultLine(self):
@@ -80,99 +84,55 @@ class Playground():
 
     @ property
     def state(self):
-        front_dist = - 1 if len(self.front_intersects) == 0 else self.car.getPosition(
-            ).distToPoint2D(self.front_intersects[0])
-        right_dist = - 1 if len(self.right_intersects) == 0 else self.car.getPosition(
-            ).distToPoint2D(self.right_intersects[0])
-        left_dist = - 1 if len(self.left_intersects) == 0 else self.car.getPosition(
-            ).distToPoint2D(self.left_intersects[0])
-
-        return [front_dist, right_dist, left_dist]
+        return self.sensor_distances.tolist()  # [front, right, left]
 
     def _checkDoneIntersects(self):
         if self.done:
             return self.done
 
         cpos = self.car.getPosition('center')     # center point of the car
-        cfront_pos = self.car.getPosition('front')
-        cright_pos = self.car.getPosition('right')
-        cleft_pos = self.car.getPosition('left')
         diameter = self.car.diameter
 
         self.isAtDestination = cpos.isInRect(
             self.destination_line.p1, self.destination_line.p2
         )
-        done = False if not self.isAtDestination else True # 非常多餘的 code
-
-        front_intersections, find_front_inter = [], True
-        right_intersections, find_right_inter = [], True
-        left_intersections, find_left_inter = [], True
-        for wall in self.lines:  # chack every line in play ground
-            dToLine = cpos.distToLine2D(wall)
-            p1, p2 = wall.p1, wall.p2
-            dp1, dp2 = (cpos-p1).length, (cpos-p2).length
-            wall_len = wall.length
-
-            # touch conditions
-            p1_touch = (dp1 < diameter)
-            p2_touch = (dp2 < diameter)
-            body_touch = (
-                dToLine < diameter and (dp1 < wall_len and dp2 < wall_len)
-            )
-            front_touch, front_t, front_u = Line2D(
-                cpos, cfront_pos).lineOverlap(wall)
-            right_touch, right_t, right_u = Line2D(
-                cpos, cright_pos).lineOverlap(wall)
-            left_touch, left_t, left_u = Line2D(
-                cpos, cleft_pos).lineOverlap(wall)
-
-            if p1_touch or p2_touch or body_touch or front_touch:
-                if not done:
-                    done = True
-
-            # find all intersections
-            if find_front_inter and front_u and 0 <= front_u <= 1:
-                front_inter_point = (p2 - p1)*front_u+p1
-                if front_t:
-                    if front_t > 1:  # select only point in front of the car
-                        front_intersections.append(front_inter_point)
-                    elif front_touch:  # if overlapped, don't select any point
-                        front_intersections = []
-                        find_front_inter = False
-
-            if find_right_inter and right_u and 0 <= right_u <= 1:
-                right_inter_point = (p2 - p1)*right_u+p1
-                if right_t:
-                    if right_t > 1:  # select only point in front of the car
-                        right_intersections.append(right_inter_point)
-                    elif right_touch:  # if overlapped, don't select any point
-                        right_intersections = []
-                        find_right_inter = False
-
-            if find_left_inter and left_u and 0 <= left_u <= 1:
-                left_inter_point = (p2 - p1)*left_u+p1
-                if left_t:
-                    if left_t > 1:  # select only point in front of the car
-                        left_intersections.append(left_inter_point)
-                    elif left_touch:  # if overlapped, don't select any point
-                        left_intersections = []
-                        find_left_inter = False
-
-        self._setIntersections(front_intersections,
-                               left_intersections,
-                               right_intersections)
+        done = self.isAtDestination
+
+        # front, right and left sensor points, see Car.getPosition
+        center = np.array([cpos.x, cpos.y])
+        sensor_angles = np.radians(self.car.angle + SENSOR_ANGLES)
+        self.sensor_rays = self.car.radius/2 * np.stack(
+            [np.cos(sensor_angles), np.sin(sensor_angles)], axis=-1)
+
+        touched, ray_touch, dists = self.sensor_engine.scan(
+            center, center + self.sensor_rays, diameter)
+        if touched or ray_touch[0]:  # body or front sensor touches a wall
+            done = True
+
+        self.sensor_distances = dists
 
         # results
         self.done = done
         return done
 
-    def _setIntersections(self, front_inters, left_inters, right_inters):
-        self.front_intersects = sorted(front_inters, key=lambda p: p.distToPoint2D(
-            self.car.getPosition('front')))
-        self.right_intersects = sorted(right_inters, key=lambda p: p.distToPoint2D(
-            self.car.getPosition('right')))
-        self.left_intersects = sorted(left_inters, key=lambda p: p.distToPoint2D(
-            self.car.getPosition('left')))
+    def _getIntersects(self, i):
+        # nearest intersection of sensor i, built only when asked for
+        if self.sensor_distances[i] < 0:
+            return []
+        ray = self.sensor_rays[i] / np.hypot(*self.sensor_rays[i])
+        return [self.car.getPosition('center') + Point2D(*ray*self.sensor_distances[i])]
+
+    @property
+    def front_intersects(self):
+        return self._getIntersects(0)
+
+    @property
+    def right_intersects(self):
+        return self._getIntersects(1)
+
+    @property
+    def left_intersects(self):
+        return self._getIntersects(2)
 
     def reset(self):
         self.done = False
@@ -182,6 +142,8 @@ class Playground():
             self.setCarPosAndAngle(self.car_init_pos, self.car_init_angle)
 
         self._checkDoneIntersects()
+        if self.trajectory is not None:
+            self.trajectory.start(*self._recorded_state())
         return self.state
 
     def setCarPosAndAngle(self, position: Point2D = None, angle=None):
@@ -210,6 +172,128 @@ class Playground():
         if not self.done:
             self.car.tick()
             self._checkDoneIntersects()
-        
+
+        if self.trajectory is not None:
+            self._record(0.0)
+        return self.state
+
+    def _recorded_state(self) -> tuple:
+        car = self.car
+        front, right, left = self.sensor_distances
+        return car.xpos, car.ypos, car.angle, car.wheel_angle, front, right, left
+
+    def _record(self, reward: float) -> None:
+        self.trajectory.append(*self._recorded_state(), reward, self.done)
+
+
+class BatchPlayground(Playground):
+    '''
+    n_cars cars driving on the same track in lockstep.
+
+    The cars are kept as struct-of-arrays (x, y, angle, wheel_angle, done,
+    isAtDestination), one vectorized Car.tick moves every car and one
+    SensorEngine.scan checks every car against the walls. self.car is only
+    used as the template for the car size and limits.
+
+    step follows Playground.step of this homework, not the HW1/HW3 one: it
+    takes wheel angles in degrees instead of action indices and returns
+    only the state, there is no reward.
+    '''
+    def __init__(self, track_name, n_cars: int):
+        self.n_cars = n_cars
+        super().__init__(track_name)
+
+    @property
+    def state(self):
+        return self.sensor_distances  # (n_cars, 3), [front, right, left]
+
+    @property
+    def centers(self):
+        return np.stack([self.x, self.y], axis=-1)
+
+    def _normalizeAngle(self, angle):
+        # same as Car.setAngle
+        angle = angle % 360
+        return np.where(angle > self.car.angle_max, angle - (self.car.angle_max - self.car.angle_min), angle)
+
+    def _checkDoneIntersects(self):
+        running = ~self.done
+        x1, x2 = sorted([self.destination_line.p1.x, self.destination_line.p2.x])
+        y1, y2 = sorted([self.destination_line.p1.y, self.destination_line.p2.y])
+        at_destination = (x1 <= self.x) & (self.x <= x2) & (y1 <= self.y) & (self.y <= y2)
+
+        centers = self.centers
+        sensor_angles = (self.angle[:, None] + SENSOR_ANGLES)/180*np.pi
+        self.sensor_rays = self.car.radius/2 * np.stack(
+            [np.cos(sensor_angles), np.sin(sensor_angles)], axis=-1)
+        touched, ray_touch, dists = self.sensor_engine.scan(
+            centers, centers[:, None, :] + self.sensor_rays, self.car.diameter)
+
+        # finished cars keep their last readings, as in Playground
+        self.isAtDestination = np.where(running, at_destination, self.isAtDestination)
+        self.sensor_distances = np.where(running[:, None], dists, self.sensor_distances)
+        self.done = self.done | (running & (at_destination | touched | ray_touch[:, 0]))
+        return self.done
+
+    def reset(self):
+        car = self.car
+        xini_range = (car.xini_max - car.xini_min - car.radius)
+        left_xpos = car.xini_min + car.radius//2
+
+        self.x = np.random.random(self.n_cars)*xini_range + left_xpos
+        self.y = np.zeros(self.n_cars)
+        self.angle = np.full(self.n_cars, 90.0)
+        self.wheel_angle = np.zeros(self.n_cars)
+        self.done = np.zeros(self.n_cars, dtype=bool)
+        self.isAtDestination = np.zeros(self.n_cars, dtype=bool)
+        self.sensor_distances = np.full((self.n_cars, 3), -1.0)
+
+        if self.car_init_angle and self.car_init_pos:
+            self.setCarPosAndAngle(self.car_init_pos, self.car_init_angle)
+
+        self._checkDoneIntersects()
+        return self.state
+
+    def setCarPosAndAngle(self, position: Point2D = None, angle=None):
+        if position:
+            self.x = np.full(self.n_cars, float(position.x))
+            self.y = np.full(self.n_cars, float(position.y))
+        if angle:
+            self.angle = self._normalizeAngle(np.full(self.n_cars, float(angle)))
+
+        self._checkDoneIntersects()
+
+    def _tick(self):
+        '''
+        Car.tick for every car that is still running
+        '''
+        running = ~self.done
+        car_angle = self.angle/180*np.pi
+        wheel_angle = self.wheel_angle/180*np.pi
+        new_x = self.x + np.cos(car_angle+wheel_angle) + \
+            np.sin(wheel_angle)*np.sin(car_angle)
+        new_y = self.y + np.sin(car_angle+wheel_angle) - \
+            np.sin(wheel_angle)*np.cos(car_angle)
+        new_angle = (car_angle - np.arcsin(2*np.sin(wheel_angle) / (self.car.radius*1.5))) / np.pi * 180
+        new_angle = self._normalizeAngle(self._normalizeAngle(new_angle))
+
+        self.x = np.where(running, new_x, self.x)
+        self.y = np.where(running, new_y, self.y)
+        self.angle = np.where(running, new_angle, self.angle)
+
+    def step(self, action):
+        '''
+        input:
+            action: (n_cars,) wheel angle of every car
+        output:
+            state: (n_cars, 3)
+        '''
+        action = np.asarray(action)
+        angle = np.clip(action, self.car.wheel_min, self.car.wheel_max)
+        # like Playground.step, action 0 keeps the current wheel angle
+        self.wheel_angle = np.where(action != 0, angle, self.wheel_angle)
+
+        self._tick()
+        self._checkDoneIntersects()
+
         return self.state
-        
\ No newline at end of file
@@ -0,0 +1,183 @@
+import numpy as np
+import pytest
+
+from MyLib.Fuzzy import FuzzySet, FuzzyRule, FuzzySystem, AnalyticFuzzySet, LinearConsequent, Triangle, Trapezoid, LeftShoulder, RightShoulder, Gaussian
+
+
+def make_set(min_x, max_x, func, name):
+    return FuzzySet(min_x, max_x, [func(x) for x in np.linspace(min_x, max_x, 200)], name=name, id=name)
+
+
+def make_system():
+    down = lambda a, b: lambda x: 1 if x <= a else (b-x)/(b-a) if x <= b else 0
+    up = lambda a, b: lambda x: 0 if x <= a else (x-a)/(b-a) if x <= b else 1
+
+    near = make_set(0, 20, down(4, 12), "near")
+    far = make_set(0, 20, up(4, 12), "far")
+    left = make_set(-10, 10, down(-3, 3), "left")
+    right = make_set(-10, 10, up(-3, 3), "right")
+    turn_left = make_set(-40, 40, down(-40, 0), "turn_left")
+    turn_right = make_set(-40, 40, up(0, 40), "turn_right")
+
+    return FuzzySystem([
+        FuzzyRule([near, left], turn_left),
+        FuzzyRule([near, right], turn_right),
+        FuzzyRule([far, left], turn_left),
+        FuzzyRule([far, right], turn_right),
+    ])
+
+
+def test_lookup_table_matches_exact_path():
+    system = make_system()
+    table = system.compile(resolution=(11, 11))
+
+    for x, y in [(0, -10), (10, 0), (20, 10), (6, -4)]:
+        assert np.isclose(table.infer((x, y)), system.infer((x, y)))
+
+    rng = np.random.default_rng(0)
+    for x, y in rng.uniform([0, -10], [20, 10], size=(2000, 2)):
+        assert abs(table.infer((x, y)) - system.infer((x, y))) <= table.error_bound
+    assert table.infer((6, -4), "avg_of_center") == table.infer((6, -4))
+    with pytest.raises(ValueError):
+        table.infer((6, -4), "sugeno")
+
+    # inputs outside the antecedent ranges are clamped
+    assert table.infer((100, 50)) == table.infer((20, 10))
+
+
+def test_fuzzy_set_vectorized_membership_and_cut():
+    fuzzy_set = make_set(-10, 10, lambda x: max(0, 1 - abs(x)/5), "mid")
+    xs = np.array([-20, -10, -4.3, 0, 2.5, 9.99, 10, 20])
+
+    memberships = fuzzy_set.infer_membership(xs)
+    assert memberships.shape == xs.shape
+    assert np.allclose(memberships, [fuzzy_set.infer_membership(x) for x in xs])
+
+    cut = fuzzy_set.alpha_cut(0.5)
+    assert cut.height == 0.5
+    assert np.all(cut.membership_function <= 0.5)
+    assert abs(cut.center_of_mass) < 0.1
+
+
+def test_analytic_cut_matches_numeric_integration():
+    xs = np.linspace(-40, 40, 400001)
+    for membership_function in [Triangle(-20, 0, 20), Trapezoid(-3, -1, 1, 3), LeftShoulder(-40, 0), RightShoulder(0, 3), Gaussian(5, 8)]:
+        for alpha in [0.1, 0.5, 1.0]:
+            fuzzy_set = AnalyticFuzzySet(-40, 40, membership_function).alpha_cut(alpha)
+            ys = np.minimum(membership_function(xs), alpha)
+
+            assert np.isclose(fuzzy_set.height, ys.max())
+            assert np.isclose(fuzzy_set.center_of_mass, np.trapezoid(xs*ys, xs)/np.trapezoid(ys, xs), atol=1e-4)
+
+        alphas = np.linspace(0, 1, 11)
+        area, moment = membership_function.cut_area_moment(alphas, -40, 40)
+        scalar = np.array([membership_function.cut_area_moment(a, -40, 40) for a in alphas])
+        assert np.allclose(area, scalar[:, 0]) and np.allclose(moment, scalar[:, 1])
+
+
+def test_infer_batch_matches_infer():
+    inputs = np.random.default_rng(1).uniform([-2, -12], [22, 12], size=(50, 2))
+    inputs[:3] = [(0, -10), (10, 0), (20, 10)]
+
+    system = make_system()
+    analytic_system = FuzzySystem([
+        FuzzyRule([AnalyticFuzzySet(0, 20, LeftShoulder(4, 12)), AnalyticFuzzySet(-10, 10, Trapezoid(-12, -4, -1, 12))], AnalyticFuzzySet(-40, 40, Triangle(-40, -20, 0))),
+        FuzzyRule([AnalyticFuzzySet(0, 20, RightShoulder(4, 12)), AnalyticFuzzySet(-10, 10, Gaussian(2, 3))], AnalyticFuzzySet(-40, 40, RightShoulder(0, 40))),
+    ])
+
+    for s in [system, analytic_system]:
+        outputs = s.infer_batch(inputs)
+        assert outputs.shape == (len(inputs),)
+        assert np.allclose(outputs, [s.infer(tuple(x)) for x in inputs])
+
+
+def test_tracing_records_inference(capsys):
+    system = make_system()
+    assert np.isclose(system.infer((6, -4)), system.infer_batch([(6, -4)])[0])
+    assert capsys.readouterr().out == ""
+
+    trace = system.enable_tracing(capacity=4)
+    output = system.infer((6, -4))
+    system.infer_batch([(0, -10), (10, 0), (20, 10), (6, 4)])
+    assert len(trace) == 4 and trace.number_of_records == 5
+
+    records = trace.records()
+    assert np.allclose(records["inputs"], [(0, -10), (10, 0), (20, 10), (6, 4)])
+    assert np.allclose(records["outputs"], system.infer_batch(records["inputs"]))
+
+    trace.clear()
+    system.infer((6, -4))
+    records = trace.records()
+    assert records["outputs"][0] == output
+    assert np.allclose(records["firing_strengths"][0], [rule.strength((6, -4)) for rule in system.rules])
+    assert np.allclose(records["cut_heights"][0], [rule.infer((6, -4)).height for rule in system.rules])
+
+    system.disable_tracing()
+    system.infer((6, -4))
+    assert trace.number_of_records == 1
+
+
+def union_reference(system, x):
+    # union of the cut sets sampled on a fine grid
+    grid = np.linspace(-40, 40, 160001)
+    union = np.zeros_like(grid)
+    for rule in system.rules:
+        union = np.maximum(union, np.minimum(rule.consequent.infer_membership(grid), rule.strength(x)))
+    return (union @ grid)/union.sum(), grid[union >= union.max() - 1e-12].mean()
+
+
+def test_union_defuzzification():
+    near, far = AnalyticFuzzySet(0, 20, LeftShoulder(4, 12)), AnalyticFuzzySet(0, 20, RightShoulder(4, 12))
+    left, right = AnalyticFuzzySet(-10, 10, LeftShoulder(-3, 3)), AnalyticFuzzySet(-10, 10, RightShoulder(-3, 3))
+    straight = AnalyticFuzzySet(-40, 40, Trapezoid(-20, -5, 5, 20))
+    system = FuzzySystem([
+        FuzzyRule([near, left], AnalyticFuzzySet(-40, 40, Triangle(-40, -20, 0))),
+        FuzzyRule([near, right], AnalyticFuzzySet(-40, 40, Gaussian(20, 8))),
+        FuzzyRule([far, left], straight),
+        FuzzyRule([far, right], straight),
+    ])
+
+    inputs = [(6, -1), (10, 2), (2, -8), (20, 10), (9, 0)]
+    centroids = system.infer_batch(inputs, "centroid_of_union")
+    maxima = system.infer_batch(inputs, "mean_of_maximum")
+    for x, centroid, maximum in zip(inputs, centroids, maxima):
+        expected_centroid, expected_maximum = union_reference(system, x)
+        assert abs(centroid - expected_centroid) < 0.1
+        assert abs(maximum - expected_maximum) < 1e-3
+        assert np.isclose(system.infer(x, "centroid_of_union"), centroid)
+        assert np.isclose(system.infer(x, "mean_of_maximum"), maximum)
+
+    # the centroid is a sum over the union grid, within half a grid spacing of the exact one
+    coarse = FuzzySystem(system.rules, union_grid_points=101)
+    for x, centroid in zip(inputs, coarse.infer_batch(inputs, "centroid_of_union")):
+        assert abs(centroid - union_reference(system, x)[0]) < 80/100/2
+
+    # sampled sets share a grid, the union is taken on it exactly
+    sampled = make_system()
+    for x in inputs:
+        centroid, maximum = union_reference(sampled, x)
+        assert abs(sampled.infer(x, "centroid_of_union") - centroid) < 0.5
+        assert abs(sampled.infer(x, "mean_of_maximum") - maximum) < 0.5
+
+    # fully fired sets with overlapping plateaus [-20, 10] and [0, 35], the maximum is [-20, 35]
+    plateaus = [(-30, -20, 10, 15), (-5, 0, 35, 38)]
+    trapezoid = lambda a, b, c, d: lambda x: max(0, min(1, (x-a)/(b-a), (d-x)/(d-c)))
+    analytic = [AnalyticFuzzySet(-40, 40, Trapezoid(*p)) for p in plateaus]
+    sampled = [FuzzySet(-40, 40, [trapezoid(*p)(x) for x in np.linspace(-40, 40, 2000)]) for p in plateaus]
+    for consequents, tolerance in [(analytic, 1e-9), (sampled, 0.05)]:
+        overlapping = FuzzySystem([FuzzyRule([near, left], consequent) for consequent in consequents])
+        assert abs(overlapping.infer((2, -8), "mean_of_maximum") - 7.5) < tolerance
+
+
+def test_sugeno_inference():
+    near = make_set(0, 20, lambda x: max(0, min(1, (12-x)/8)), "near")
+    far = make_set(0, 20, lambda x: max(0, min(1, (x-4)/8)), "far")
+    any_combine = make_set(-10, 10, lambda x: 1, "any")
+
+    zero_order = FuzzySystem([FuzzyRule([near, any_combine], LinearConsequent(-30)), FuzzyRule([far, any_combine], LinearConsequent(10))])
+    w_near, w_far = near.infer_membership(8), far.infer_membership(8)
+    assert np.isclose(zero_order.infer((8, 0), "sugeno"), (-30*w_near + 10*w_far)/(w_near + w_far))
+
+    first_order = FuzzySystem([FuzzyRule([near, any_combine], LinearConsequent(-30, [1, 2])), FuzzyRule([far, any_combine], LinearConsequent(10, [0, -1]))])
+    inputs = np.random.default_rng(2).uniform([0, -10], [20, 10], size=(30, 2))
+    assert np.allclose(first_order.infer_batch(inputs, "sugeno"), [first_order.infer(tuple(x), "sugeno") for x in inputs])
@@ -0,0 +1,22 @@
+import numpy as np
+
+from MyLib.headless import main
+from MyLib.tuning import RuleBaseEncoding
+
+
+def test_headless_tunes_and_drives(tmp_path):
+    rule_base, output = tmp_path / "rule_base.npy", tmp_path / "car_path.txt"
+    main(["--tune", "--iterations", "1", "--particles", "2", "--seed", "0", "--max-steps", "30",
+          "--save-rule-base", str(rule_base), "--output", str(output)])
+    assert np.load(rule_base).shape == (RuleBaseEncoding().dimension,)
+    tuned_path = output.read_text()
+    assert 0 < tuned_path.count("\n") <= 30
+
+    main(["--rule-base", str(rule_base), "--max-steps", "30", "--output", str(output)])
+    assert output.read_text() == tuned_path
+
+
+def test_headless_drives_with_a_lookup_table(tmp_path):
+    output = tmp_path / "car_path.txt"
+    main(["--lookup-table", "41", "41", "--max-steps", "30", "--output", str(output)])
+    assert 0 < output.read_text().count("\n") <= 30
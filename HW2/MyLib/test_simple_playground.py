@@ -0,0 +1,26 @@
+import os
+
+import numpy as np
+
+from MyLib.simple_playground import Playground, BatchPlayground
+
+TRACK = os.path.join(os.path.dirname(__file__), "..", "playground", "軌道座標點.txt")
+
+
+def test_batch_playground_matches_playground():
+    # HW2 steps with wheel angles and returns the state only
+    n_cars = 8
+    rng = np.random.default_rng(0)
+    batch = BatchPlayground(TRACK, n_cars)
+    singles = [Playground(TRACK) for _ in range(n_cars)]
+
+    for _ in range(60):
+        angles = rng.uniform(batch.car.wheel_min, batch.car.wheel_max, size=n_cars)
+        states = batch.step(angles)
+
+        for i, p in enumerate(singles):
+            state = p.step(angles[i])
+            assert np.allclose(states[i], state)
+            assert batch.done[i] == p.done
+            assert batch.isAtDestination[i] == p.isAtDestination
+            assert np.isclose(batch.x[i], p.car.xpos) and np.isclose(batch.y[i], p.car.ypos)
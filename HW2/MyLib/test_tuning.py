@@ -0,0 +1,60 @@
+import os
+import pytest
+import numpy as np
+
+from MyLib.Fuzzy import FuzzySystem
+from MyLib.tuning import RuleBaseEncoding, RuleBaseFitness, tune, ARRIVAL_REWARD, NO_OUTPUT_FITNESS
+
+TRACK = os.path.join(os.path.dirname(__file__), "..", "playground", "軌道座標點.txt")
+
+
+def test_decode_default_and_random_vectors():
+    encoding = RuleBaseEncoding()
+    rules = encoding.decode(encoding.default())
+    assert len(rules) == 9
+    near, middle = rules[0].antecedents[0], rules[3].antecedents[0]
+    assert near.infer_membership(4) == 1 and near.infer_membership(8) == 0
+    assert middle.infer_membership(8) == 1 and middle.infer_membership(12) == 0
+
+    inputs = np.random.default_rng(0).uniform([0, -10], [20, 10], size=(200, 2))
+    for infer_type in ["avg_of_center", "sugeno"]:
+        encoding = RuleBaseEncoding(infer_type)
+        for x in np.random.default_rng(1).uniform(-0.5, 1.5, size=(10, encoding.dimension)):
+            outputs = FuzzySystem(encoding.decode(x)).infer_batch(inputs, infer_type)
+            assert np.all(np.isfinite(outputs)) and np.all(np.abs(outputs) <= 40)
+
+    with pytest.raises(ValueError):
+        RuleBaseEncoding("sugeno").decode(RuleBaseEncoding().default())
+
+
+def test_decode_boundary_vectors():
+    # breakpoints pushed against a bound must stay inside the range, a set past it has no area
+    encoding = RuleBaseEncoding()
+    inputs = [(center, combine) for center in (0, 10, 20) for combine in (-10, 0, 10)]
+    for corner in ([0, 1, 1, 1], [1, 1, 1, 1], [0, 0, 0, 0], [1, 0, 0, 0]):
+        x = encoding.default()
+        x[0:3], x[3:7], x[7:11] = corner[:3], corner, corner
+        fuzzy = FuzzySystem(encoding.decode(x))
+        for infer_type in ["avg_of_center", "centroid_of_union", "mean_of_maximum"]:
+            for input in inputs:
+                assert -40 <= fuzzy.infer(input, infer_type) <= 40
+
+
+def test_tune_keeps_the_hand_written_rule_base_as_a_candidate():
+    encoding = RuleBaseEncoding()
+    default_fitness = RuleBaseFitness(TRACK, encoding, max_steps=30)(encoding.default())
+    assert default_fitness < ARRIVAL_REWARD
+
+    np.random.seed(0)
+    best, fitness = tune(TRACK, encoding, num_particles=4, num_iteration=2, num_workers=1, max_steps=30)
+    assert best.shape == (encoding.dimension,)
+    assert fitness >= default_fitness
+
+
+def test_tune_with_overshooting_particles():
+    # particles leave [0, 1]^dimension after a few iterations
+    encoding = RuleBaseEncoding()
+    np.random.seed(0)
+    best, fitness = tune(TRACK, encoding, num_particles=10, num_iteration=5, num_workers=1, max_steps=200)
+    assert fitness > NO_OUTPUT_FITNESS
+    assert np.isfinite(FuzzySystem(encoding.decode(best)).infer((10, 0)))
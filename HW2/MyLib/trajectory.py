@@ -0,0 +1,69 @@
+import numpy as np
+
+# recorded values of every step, after the step: car center, car angle and
+# wheel angle (degrees), front, right and left sensor distances, reward, done.
+# Trajectory.initial holds the same values before the first step.
+COLUMNS = ("x", "y", "angle", "wheel", "front", "right", "left", "reward", "done")
+_COLUMN_INDEX = {name: i for i, name in enumerate(COLUMNS)}
+
+
+class Trajectory():
+    '''
+    The steps of an episode as the columns of one preallocated float array,
+    the capacity doubles when it is full, so recording a step allocates
+    nothing. Set a Trajectory as Playground.trajectory and every step is
+    recorded, Playground.reset starts it again from the reset state.
+
+    Columns are views of the recorded rows, e.g. trajectory["x"],
+    trajectory.positions (n, 2) or trajectory.sensors (n, 3).
+    '''
+    def __init__(self, capacity: int = 256) -> None:
+        self.data = np.zeros((max(capacity, 1), len(COLUMNS)))
+        self.size = 0
+        self.initial = None  # (len(COLUMNS),) row before the first step, None if unknown
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.data[:self.size, _COLUMN_INDEX[column]]
+
+    @property
+    def rows(self) -> np.ndarray:
+        return self.data[:self.size]
+
+    @property
+    def positions(self) -> np.ndarray:
+        return self.data[:self.size, 0:2]
+
+    @property
+    def sensors(self) -> np.ndarray:
+        '''
+        front, right and left sensor distance
+        '''
+        return self.data[:self.size, 4:7]
+
+    def clear(self) -> None:
+        self.size = 0
+        self.initial = None
+
+    def start(self, x: float, y: float, angle: float, wheel: float, front: float, right: float, left: float) -> None:
+        '''
+        clear and keep the state the episode starts from as initial
+        '''
+        self.size = 0
+        self.initial = np.array((x, y, angle, wheel, front, right, left, 0.0, False), dtype=float)
+
+    def append(self, x: float, y: float, angle: float, wheel: float, front: float, right: float, left: float,
+               reward: float = 0.0, done: bool = False) -> None:
+        if self.size == len(self.data):
+            self.data = np.concatenate([self.data, np.zeros_like(self.data)])
+        self.data[self.size] = (x, y, angle, wheel, front, right, left, reward, done)
+        self.size += 1
+
+    def copy(self) -> 'Trajectory':
+        trajectory = Trajectory(self.size)
+        trajectory.data[:self.size] = self.rows
+        trajectory.size = self.size
+        trajectory.initial = None if self.initial is None else self.initial.copy()
+        return trajectory
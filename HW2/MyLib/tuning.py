@@ -0,0 +1,206 @@
+import math
+import numpy as np
+from typing import Callable
+
+from MyLib.simple_playground import Playground
+from MyLib.trajectory import Trajectory
+from MyLib.pso import PSO, SerialEvaluator, ProcessPoolEvaluator
+from MyLib.Fuzzy import (FuzzySystem, FuzzyRule, AnalyticFuzzySet, LinearConsequent, Triangle, Trapezoid, LeftShoulder, RightShoulder,
+                         MAX_CENTER_DISTANCE, MIN_CENTER_DISTANCE, MAX_COMBINE_DISTANCE, MIN_COMBINE_DISTANCE, TURN_LEFT, TURN_RIGHT)
+
+# (center set, combine set, angle set) of every rule, 0: neg, 1: mid, 2: pos
+RULE_TABLE = [(i, j, j) for i in range(3) for j in range(3)]
+
+# smallest distance between two breakpoints of a variable
+MIN_BREAKPOINT_GAP = 0.1
+
+# fitness of an episode: ARRIVAL_REWARD when the car reaches the destination,
+# minus the distance from the last car position to the destination
+ARRIVAL_REWARD = 100
+MAX_STEPS = 500
+# fitness of a rule base that fires no consequent, below that of any episode
+NO_OUTPUT_FITNESS = -10*ARRIVAL_REWARD
+
+PLAYGROUND_PATH = "playground/軌道座標點.txt"
+TUNED_RULE_BASE_PATH = "tuned_rule_base.npy"
+
+
+def sensor_state(center_distance: float, left_distance: float, right_distance: float) -> tuple[float, float]:
+    '''
+    (center distance, left - right distance) fed to the fuzzy system, a
+    sensor without hit (-1) counts as 0
+    '''
+    return center_distance, max(left_distance, 0) - max(right_distance, 0)
+
+
+def _ordered(values: np.ndarray, upper: float) -> list[float]:
+    '''
+    sorted values at least MIN_BREAKPOINT_GAP apart, pushed down from upper
+    when the gaps would run past it, a set beyond the range has no area
+    '''
+    breakpoints = np.sort(values)
+    for i in range(1, len(breakpoints)):
+        breakpoints[i] = max(breakpoints[i], breakpoints[i - 1] + MIN_BREAKPOINT_GAP)
+    breakpoints[-1] = min(breakpoints[-1], upper)
+    for i in range(len(breakpoints) - 2, -1, -1):
+        breakpoints[i] = min(breakpoints[i], breakpoints[i + 1] - MIN_BREAKPOINT_GAP)
+    return breakpoints.tolist()
+
+
+class RuleBaseEncoding():
+    '''
+    The rule base of App.get_fuzzy_rules as a vector x in [0, 1]^dimension,
+    every entry is scaled to the range of its variable and the breakpoints
+    of a variable are sorted and kept inside its range, so any vector
+    decodes to a valid rule base.
+
+    x[0:3]   center distance breakpoints c0 < c1 < c2:
+             Near LeftShoulder(c0, c1), Middle Triangle(c0, c1, c2), Far RightShoulder(c1, c2)
+    x[3:7]   combine distance breakpoints k0 < k1 < k2 < k3, with m = (k1 + k2)/2:
+             Near Left LeftShoulder(k0, m), Middle Trapezoid(k0, k1, k2, k3), Near Right RightShoulder(m, k3)
+    x[7:11]  angle breakpoints, same layout as the combine distance with a
+             Triangle(q1, m, q2) in the middle ("avg_of_center" and the other
+             Mamdani types)
+    x[7:16]  a constant output angle for every rule of RULE_TABLE ("sugeno")
+    '''
+    def __init__(self, infer_type: str = "avg_of_center") -> None:
+        self.infer_type = infer_type
+        lower = [MIN_CENTER_DISTANCE]*3 + [MIN_COMBINE_DISTANCE]*4
+        upper = [MAX_CENTER_DISTANCE]*3 + [MAX_COMBINE_DISTANCE]*4
+        number_of_angles = len(RULE_TABLE) if infer_type == "sugeno" else 4
+        self.lower = np.array(lower + [TURN_LEFT]*number_of_angles, dtype=float)
+        self.upper = np.array(upper + [TURN_RIGHT]*number_of_angles, dtype=float)
+
+    @property
+    def dimension(self) -> int:
+        return len(self.lower)
+
+    def encode(self, values: list[float]) -> np.ndarray:
+        '''
+        breakpoints and angles in the layout above -> x
+        '''
+        return (np.asarray(values, dtype=float) - self.lower)/(self.upper - self.lower)
+
+    def default(self) -> np.ndarray:
+        '''
+        the hand-written rule base
+        '''
+        angles = [-40, 0, 40]*3 if self.infer_type == "sugeno" else [-40, -20, 20, 40]
+        return self.encode([4, 8, 12, -3, -1, 1, 3] + angles)
+
+    def decode(self, x: np.ndarray) -> list[FuzzyRule]:
+        if np.shape(x) != (self.dimension,):
+            raise ValueError(f"a {self.infer_type} rule base has {self.dimension} entries, got shape {np.shape(x)}")
+        values = self.lower + np.clip(x, 0, 1)*(self.upper - self.lower)
+
+        c0, c1, c2 = _ordered(values[0:3], MAX_CENTER_DISTANCE)
+        center_sets = [
+            AnalyticFuzzySet(MIN_CENTER_DISTANCE, MAX_CENTER_DISTANCE, LeftShoulder(c0, c1), name="Near", id="m_neg_set"),
+            AnalyticFuzzySet(MIN_CENTER_DISTANCE, MAX_CENTER_DISTANCE, Triangle(c0, c1, c2), name="Middle", id="m_mid_set"),
+            AnalyticFuzzySet(MIN_CENTER_DISTANCE, MAX_CENTER_DISTANCE, RightShoulder(c1, c2), name="Far", id="m_pos_set"),
+        ]
+
+        k0, k1, k2, k3 = _ordered(values[3:7], MAX_COMBINE_DISTANCE)
+        combine_sets = [
+            AnalyticFuzzySet(MIN_COMBINE_DISTANCE, MAX_COMBINE_DISTANCE, LeftShoulder(k0, (k1 + k2)/2), name="Near Left", id="lr_neg_set"),
+            AnalyticFuzzySet(MIN_COMBINE_DISTANCE, MAX_COMBINE_DISTANCE, Trapezoid(k0, k1, k2, k3), name="Middle", id="lr_mid_set"),
+            AnalyticFuzzySet(MIN_COMBINE_DISTANCE, MAX_COMBINE_DISTANCE, RightShoulder((k1 + k2)/2, k3), name="Near Right", id="lr_pos_set"),
+        ]
+
+        if self.infer_type == "sugeno":
+            return [FuzzyRule([center_sets[i], combine_sets[j]], LinearConsequent(angle))
+                    for (i, j, _), angle in zip(RULE_TABLE, values[7:])]
+
+        q0, q1, q2, q3 = _ordered(values[7:11], TURN_RIGHT)
+        angle_sets = [
+            AnalyticFuzzySet(TURN_LEFT, TURN_RIGHT, LeftShoulder(q0, (q1 + q2)/2), name="Turn Left", id="angle_neg_set"),
+            AnalyticFuzzySet(TURN_LEFT, TURN_RIGHT, Triangle(q1, (q1 + q2)/2, q2), name="Straight", id="angle_mid_set"),
+            AnalyticFuzzySet(TURN_LEFT, TURN_RIGHT, RightShoulder((q1 + q2)/2, q3), name="Turn Right", id="angle_pos_set"),
+        ]
+        return [FuzzyRule([center_sets[i], combine_sets[j]], angle_sets[k]) for i, j, k in RULE_TABLE]
+
+
+def run_episode(playground: Playground, fuzzy: FuzzySystem, infer_type: str = "avg_of_center", max_steps: int = None,
+                callback: Callable[[int], bool] = None) -> Trajectory:
+    '''
+    drive one episode with the fuzzy system (or its FuzzySystem.compile
+    lookup table), returns playground.trajectory
+    (a new Trajectory if it has none) with the steps of the episode,
+    playground.isAtDestination tells if the car arrived. callback(step) is
+    called after every step, the episode stops early when it returns True.
+    '''
+    p = playground
+    if p.trajectory is None:
+        p.trajectory = Trajectory()
+    sensor_output = p.reset()
+    while not p.done and (max_steps is None or len(p.trajectory) < max_steps):
+        action = fuzzy.infer(sensor_state(*sensor_output), infer_type)
+        sensor_output = p.step(action)
+        if callback is not None and callback(len(p.trajectory) - 1):
+            break
+    return p.trajectory
+
+
+class RuleBaseFitness():
+    '''
+    Fitness of an encoded rule base: one driving episode on the given track,
+    ARRIVAL_REWARD if the car arrives minus its final distance to the
+    destination, NO_OUTPUT_FITNESS if the rule base has no output for a
+    state on the way.
+
+    Plain attributes only, so instances can be pickled and sent to the
+    workers of a ProcessPoolEvaluator.
+    '''
+    def __init__(self, playground_path: str, encoding: RuleBaseEncoding = None, max_steps: int = MAX_STEPS) -> None:
+        self.playground = Playground(playground_path)
+        self.encoding = encoding if encoding is not None else RuleBaseEncoding()
+        self.max_steps = max_steps
+
+    def __call__(self, x: np.ndarray) -> float:
+        fuzzy = FuzzySystem(self.encoding.decode(x))
+
+        p = self.playground
+        sensor_output = p.reset()
+        step = 0
+        while not p.done and step < self.max_steps:
+            try:
+                action = fuzzy.infer(sensor_state(*sensor_output), self.encoding.infer_type)
+            except ZeroDivisionError:
+                return NO_OUTPUT_FITNESS
+            if not math.isfinite(action):
+                return NO_OUTPUT_FITNESS
+            sensor_output = p.step(action)
+            step += 1
+
+        position = p.car.getPosition("center")
+        destination = p.destination_line
+        distance = math.hypot(position.x - (destination.p1.x + destination.p2.x)/2,
+                              position.y - (destination.p1.y + destination.p2.y)/2)
+        return (ARRIVAL_REWARD if p.isAtDestination else 0) - distance
+
+
+def tune(playground_path: str, encoding: RuleBaseEncoding = None, num_particles: int = 20, num_iteration: int = 20,
+         num_workers: int = None, seed: int = None, max_steps: int = MAX_STEPS) -> tuple[np.ndarray, float]:
+    '''
+    Optimize the encoded rule base with PSO, the candidates of an iteration
+    are evaluated in a pool of num_workers processes (1: in this process).
+    The swarm starts from the hand-written rule base and random vectors.
+
+    output: best x and its fitness, RuleBaseEncoding.decode(x) gives the rules
+    '''
+    encoding = encoding if encoding is not None else RuleBaseEncoding()
+    fitness_func = RuleBaseFitness(playground_path, encoding, max_steps)
+    evaluator = SerialEvaluator(seed) if num_workers == 1 else ProcessPoolEvaluator(num_workers, seed)
+
+    with evaluator:
+        pso = PSO(encoding.dimension, num_particles, num_iteration, fitness_func, evaluator=evaluator)
+        pso.positions[0] = encoding.default()
+        pso.local_best_positions[0] = pso.positions[0]
+        best = pso.run()
+    return best, pso.global_best_fitness
+
+
+if __name__ == "__main__":
+    best, fitness = tune(PLAYGROUND_PATH)
+    np.save(TUNED_RULE_BASE_PATH, best)
+    print(f"fitness: {fitness}, rule base saved to {TUNED_RULE_BASE_PATH}")
@@ -2,23 +2,24 @@ import os
 
 import numpy as np
 import tkinter as tk
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.animation import FuncAnimation
-import matplotlib.pyplot as plt
 
 from MyLib.simple_playground import Playground
-from MyLib.Model import LinearModel
-from MyLib.ActivactionFunction import ReLu
-from MyLib.pso import PSO
+from MyLib.background import TrainingJob
+from MyLib.trajectory import Trajectory
+from MyLib.trajectory_io import save_trajectory
+from MyLib.training import default_model, train_model, run_episode, NUMBER_OF_ITERATION
 
 
 # Global Variable
 PLAYGROUND_ROOT_PTAH = ".\\playground\\"
 INIT_PLAYGROUND = "軌道座標點.txt"
 ROOT_PATH = os.path.dirname(os.path.abspath(__name__))
+TRAJECTORY_PATH = os.path.join(ROOT_PATH, "trajectory.npy")
 
 # UI Variable
 FIGURE_SIZE = 10
+MAX_ANIMATION_FRAMES = 500  # longer runs are downsampled in draw_run
+POLL_INTERVAL = 100  # ms between two progress updates while training
 
 # Sensor Variable
 MAX_CENTER_DISTANCE = 20
@@ -28,12 +29,6 @@ MIN_COMBINE_DISTANCE = -10
 TURN_LEFT = -40
 TURN_RIGHT = 40
 
-# PSO Variable
-NUMBER_OF_ITERATION = 1000
-NUMBER_OF_PARTICLE = 10
-RO1 = 0.1
-RO2 = 0.7
-
 
 class App():
     def __init__(self):
@@ -43,10 +38,12 @@ class App():
         self.playground_path = ROOT_PATH + "\\playground\\軌道座標點.txt"
         self.track_path = ROOT_PATH + "\\track\\track4D.txt"
 
-        self.default_model = LinearModel(3, 1, [30], ReLu())
+        self.default_model = default_model()
         self.model = self.default_model
         self.playground = Playground(self.playground_path)
         self.animation = None 
+        self.job = None
+        self.trajectory = Trajectory()
 
         # UI
         self.msg = tk.Label(self.root, text="Particle Swarm Optimization", font=('Arial', 16))
@@ -58,6 +55,10 @@ class App():
 
 
     def init_plot_pannel(self):
+        # matplotlib is imported here, not at module level, so importing MyLib.App stays cheap
+        import matplotlib.pyplot as plt
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
         # Create a Matplotlib figure and axis
         self.figure, self.ax = plt.subplots()
         self.ax.set_xlim(-10, 35)
@@ -80,6 +81,8 @@ class App():
         # Button to start some process
         self.start_button = tk.Button(group3, text="Start PSO", command=self.startBtn_onclick, bg="green")
         self.start_button.grid(row=1, column=0, pady=5)
+        self.cancel_button = tk.Button(group3, text="Cancel", command=self.cancelBtn_onclick, bg="light grey", state="disabled")
+        self.cancel_button.grid(row=1, column=1, pady=5)
         # Show Rule button
         self.reset_button = tk.Button(group3, text="Reset Model", command=self.reset_model, bg="light grey")
         self.reset_button.grid(row=2, column=0, pady=5)
@@ -88,6 +91,8 @@ class App():
         self.save_button.grid(row=3, column=0, pady=5)
         
     def draw_playground(self):
+        import matplotlib.pyplot as plt
+
         p = self.playground
         playground_edge_lines = [[p.lines[i].p1.x, p.lines[i].p1.y, p.lines[i].p2.x, p.lines[i].p2.y] for i in range(len(p.lines))]
 
@@ -104,81 +109,62 @@ class App():
 
 
     def startBtn_onclick(self):
-        def finess_func(x: np.ndarray):
-            model = self.default_model
-            model.setWeights_1d(x)
-
-            p = self.playground
-            sensor_output = p.reset()
-            center_distance, left_distance, right_distance = sensor_output
-            total_reword = 0
-            while not p.done:
-                wheel_angle = self.model.forward(np.array([center_distance, left_distance, right_distance]))
-                next_sensor_output, reword = p.step(wheel_angle)
-                center_distance, left_distance, right_distance = next_sensor_output
-                total_reword += reword
-                if p.done:
-                    break
-            return total_reword
-            
-
-        def start_training():
-            self.start_button.config(text="Training...", bg="grey", state="disabled")
-            self.msg.config(text="Training...", fg="black")
-
-            model_weights = self.model.getWeights()
-            x = np.concatenate([w.flatten() for w in model_weights])
-            pso = PSO(len(x), NUMBER_OF_PARTICLE ,NUMBER_OF_ITERATION, finess_func, ro1=RO1, ro2=RO2)
-            optimized_x = pso.run()
-
-
-            self.model.setWeights_1d(optimized_x)
-            p = self.playground
-
-            sensor_output = p.reset()
-            center_distance, left_distance, right_distance = sensor_output
-            self.action_list = []
-            while not p.done:
-                action = self.model.forward(np.array([center_distance, left_distance, right_distance]))
-                next_sensor_output, reword = p.step(action)
-
-
-                car_pos = [p.car.getPosition("center").x, p.car.getPosition("center").y]
-                self.action_list.append({
-                    "previous_car_pos": car_pos,
-                    "pre_state": [center_distance, left_distance, right_distance],
-                    "degree": action
-                })
-                center_distance, left_distance, right_distance = next_sensor_output
-                    
-                if p.done:
-                    break
-            
-            if p.isAtDestination:
-                print("success")
-                self.msg.config(text="Arrived at Destination", fg="black")
-            else:
-                print("fail")
-                self.msg.config(text="Crashed", fg="red")
-
-            self.draw_run()
-            print("Running Ended")
-
-            # except Exception as e:
-            #     self.msg.config(text=str(e), fg="red")
-
-            self.start_button.config(text="Start PSO", bg="green", state="normal")
-            self.msg.config(text="Running Ended", fg="black")
-
-        start_training()
+        model, p = self.model, self.playground
+
+        def train(report, cancelled):
+            def on_iteration(iteration, best_fitness):
+                report(iteration=iteration, best_fitness=best_fitness)
+                return cancelled()
+
+            train_model(self.playground_path, model, callback=on_iteration)
+            return run_episode(p, model).copy(), p.isAtDestination
+
+        self.start_button.config(text="Training...", bg="grey", state="disabled")
+        self.cancel_button.config(state="normal")
+        self.reset_button.config(state="disabled")  # the job trains self.model
+        self.msg.config(text="Training...", fg="black")
+        self.job = TrainingJob(train).start()
+        self.root.after(POLL_INTERVAL, self.poll_training)
+
+    def cancelBtn_onclick(self):
+        if self.job is not None:
+            self.job.cancel()
+            self.msg.config(text="Cancelling...", fg="black")
+
+    def poll_training(self):
+        # runs on the Tk main loop, the training itself runs in self.job
+        done = self.job.done
+        updates = self.job.poll()
+        if updates and not self.job.cancelled:
+            progress = updates[-1]
+            self.msg.config(text=f"Iteration {progress['iteration'] + 1}/{NUMBER_OF_ITERATION}, best fitness {progress['best_fitness']:.2f}", fg="black")
+        if not done:
+            self.root.after(POLL_INTERVAL, self.poll_training)
+            return
+
+        self.start_button.config(text="Start PSO", bg="green", state="normal")
+        self.cancel_button.config(state="disabled")
+        self.reset_button.config(state="normal")
+        if self.job.error is not None:
+            self.msg.config(text=str(self.job.error), fg="red")
+            return
+
+        self.trajectory, arrived = self.job.result
+        print("success" if arrived else "fail")
+        self.draw_run()
+        print("Running Ended")
+        self.msg.config(text="Training Cancelled" if self.job.cancelled else "Running Ended", fg="black")
 
     def saveBtn_onclick(self):
         save_path = os.path.join(ROOT_PATH, "car_path.txt")
-        with open("car_path.txt", "w") as f:
-            for action in self.action_list:
-                f.write(f"{action['previous_car_pos']}\n")
+        with open(save_path, "w") as f:
+            for position in self.trajectory.positions.tolist():
+                f.write(f"{position}\n")
+        # every column of the episode, see MyLib.trajectory_io.load_trajectories
+        save_trajectory(self.trajectory, TRAJECTORY_PATH)
         print("Car path saved to", save_path)
-        self.msg.config(text="Car path saved to .\\car_path.txt", fg="black")
+        print("Trajectory saved to", TRAJECTORY_PATH)
+        self.msg.config(text=f"Car path saved to {save_path}", fg="black")
 
 
     def run(self) -> None:
@@ -190,46 +176,51 @@ class App():
         self.root.protocol("WM_DELETE_WINDOW", on_closing)
         self.root.mainloop()
 
-    def draw_run(self) -> None:
+    def draw_run(self, max_frames: int = MAX_ANIMATION_FRAMES) -> None:
+        '''
+        animate the last episode, runs longer than max_frames steps show
+        every k-th step only (the path itself keeps every step)
+        '''
+        import matplotlib.pyplot as plt
+        from matplotlib.animation import FuncAnimation
+
+        # views of the recorded columns, every frame only slices these
+        positions = self.trajectory.positions
+        sensors = self.trajectory.sensors
+        stride = -(-len(positions) // max_frames)
+        frames = np.append(np.arange(0, len(positions) - 1, stride), len(positions) - 1)
+
         line, = self.ax.plot([], [], lw=2)
-        circle = plt.Circle(self.action_list[0]["previous_car_pos"], radius=self.playground.car.radius/2, color='r')
+        circle = plt.Circle(positions[0], radius=self.playground.car.radius/2, color='r')
+        self.ax.add_patch(circle)
         annotation = self.ax.annotate("", xy=(30, -10), xytext=(5, 5),
                                         textcoords="offset points", ha='right', va='bottom',
                                         bbox=dict(boxstyle='round,pad=0.3', alpha=0.7))
 
         def update(frame):
-            xdata = [x["previous_car_pos"][0] for x in self.action_list[:frame]]
-            ydata = [x["previous_car_pos"][1] for x in self.action_list[:frame]]
-
-            line.set_data(xdata, ydata)
-
-            circle_x, circle_y = self.action_list[frame]["previous_car_pos"][0], self.action_list[frame]["previous_car_pos"][1]
-            right = self.action_list[frame]["pre_state"][1]
-            left = self.action_list[frame]["pre_state"][2]
-            front = self.action_list[frame]["pre_state"][0]
+            line.set_data(positions[:frame + 1, 0], positions[:frame + 1, 1])
 
+            circle_x, circle_y = positions[frame]
+            front, right, left = sensors[frame]
             circle.set_center((circle_x, circle_y))
 
             label = f'car pos: ({circle_x:.2f}, {circle_y:.2f})\nfront sensor: {front:.2f}\nright sensor: {right:.2f}\nleft sensor: {left:.2f}'
             annotation.set_text(label)
 
-            self.canvas.draw()
-
+            # blit=True redraws only these artists, no canvas.draw() here
             return line, circle, annotation
 
         def init():
             line.set_data([], [])
-            circle.set_center((self.action_list[0]["previous_car_pos"][0], self.action_list[0]["previous_car_pos"][1]))
-            self.ax.add_patch(circle)
-
-            annotation = self.ax.annotate("", xy=(30, 0), xytext=(5, 5))
+            circle.set_center(positions[0])
+            annotation.set_text("")
             return line, circle, annotation
 
         if self.animation:
             self.animation.event_source.stop()
 
         try:
-            self.animation = FuncAnimation(self.figure, update, frames=len(self.action_list), init_func=init, interval=100, blit=True)
+            self.animation = FuncAnimation(self.figure, update, frames=frames, init_func=init, interval=100, blit=True)
         except Exception as e:
             print("Fail to draw animation.")
             print(e)
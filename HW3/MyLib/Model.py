@@ -8,29 +8,41 @@ class Layer():
         self.vlist = None
         self.ylist = None
         self.delta = None
-        self.weights = np.random.randn(output_dim, input_dim+1)
+        self.weights = np.random.randn(output_dim, input_dim+1) # last column is the bias
         self.activation_func = activation_function
 
-    def forward(self, input:np.ndarray) -> np.ndarray:
-        input = np.append(input, -1) # add bias
-        self.in_list = input
+    @property
+    def kernel(self) -> np.ndarray:
+        return self.weights[:, :-1]
+
+    @property
+    def bias(self) -> np.ndarray:
+        return self.weights[:, -1]
 
-        if input.shape[0] != self.weights.shape[1]:
+    def forward(self, input:np.ndarray) -> np.ndarray:
+        '''
+        input: (input_dim,) or (batch, input_dim)
+        '''
+        if input.shape[-1] != self.weights.shape[1] - 1:
             raise DimensionError("Dimension of layer with size: {} does not match the dimension of input with size: {}".format(self.weights.shape, input.shape))
 
-        v = np.dot(self.weights, input)
+        self.in_list = input
+        v = input @ self.kernel.T - self.bias # bias input is -1
         y = self.activation_func(v)
 
         self.vlist = v
         self.ylist = y
         return y
     
-    def backward(self, pre_delta:np.ndarray) -> None:
+    def backward(self, pre_delta:np.ndarray) -> np.ndarray:
         self.delta = pre_delta * self.activation_func.d(self.vlist)
-        return np.dot(self.weights.T, self.delta)[:-1]
+        return self.delta @ self.kernel
 
     def update(self, lr) -> None:
-        self.weights = self.weights + lr * np.outer(self.delta, self.in_list)
+        # gradients of a batch are summed, a single sample is a batch of one
+        delta = np.atleast_2d(self.delta)
+        self.weights[:, :-1] += lr * (delta.T @ np.atleast_2d(self.in_list))
+        self.weights[:, -1] -= lr * delta.sum(axis=0)
 
 
 class LinearModel():
@@ -44,7 +56,22 @@ class LinearModel():
         for i in range(self.num_layers):
             self.layer_list.append(Layer(self.layer_dim_list[i], self.layer_dim_list[i+1], activation_func)) # fix this
 
+        # all weights live in one flat buffer, every layer.weights is a view into it
+        self._bindParameters(np.concatenate([layer.weights.ravel() for layer in self.layer_list]))
+
+    def _bindParameters(self, parameters:np.ndarray) -> None:
+        self.parameters = parameters
+        offset = 0
+        for layer in self.layer_list:
+            layer_shape = layer.weights.shape
+            layer_size = layer.weights.size
+            layer.weights = parameters[offset:offset+layer_size].reshape(layer_shape)
+            offset += layer_size
+
     def forward(self, input:np.ndarray) -> np.ndarray:
+        '''
+        input: (input_dim,) for one sample or (batch, input_dim) for a batch
+        '''
         x = input
         for layer in self.layer_list:
             x = layer.forward(x)
@@ -58,17 +85,54 @@ class LinearModel():
     
     def predict(self, input:np.ndarray) -> np.ndarray:
         return self.forward(input)
-    
+
+    def forward_population(self, weights_2d:np.ndarray, input:np.ndarray) -> np.ndarray:
+        '''
+        Forward a whole population of networks with this architecture, row p
+        of weights_2d is a setWeights_1d vector and runs on input[p]. The
+        weights of this model are not used nor changed.
+
+        input:
+            weights_2d: (num_networks, num_weights)
+            input: (num_networks, input_dim) or (num_networks, batch, input_dim)
+        output:
+            (num_networks, output_dim) or (num_networks, batch, output_dim)
+        '''
+        if weights_2d.ndim != 2 or weights_2d.shape[1] != self.num_weights:
+            raise DimensionError("Population weights with size: {} do not match the model with {} weights".format(weights_2d.shape, self.num_weights))
+
+        single = input.ndim == 2
+        x = input[:, None, :] if single else input
+        offset = 0
+        for layer in self.layer_list:
+            # (num_networks, output_dim, input_dim+1) view of the rows, no copy
+            weights = weights_2d[:, offset:offset+layer.weights.size].reshape((len(weights_2d),) + layer.weights.shape)
+            offset += layer.weights.size
+            v = np.matmul(x, weights[:, :, :-1].transpose(0, 2, 1)) - weights[:, None, :, -1]
+            x = layer.activation_func(v)
+
+        return x[:, 0, :] if single else x
+
+    @property
+    def num_weights(self) -> int:
+        return self.parameters.size
+
     def getWeights(self):
         return [layer.weights for layer in self.layer_list]
-    
-    def setWeights_1d(self, weights:np.ndarray):
-        for i, layer in enumerate(self.layer_list):
-            layer_shape = layer.weights.shape
-            layer_size = layer.weights.size
-            reshaped = weights[:layer_size].reshape(layer_shape)
-            weights = weights[layer_size:]
-            layer.weights = reshaped
 
-        assert len(weights) == 0 , "weights is not empty."
-    
\ No newline at end of file
+    def getWeights_1d(self) -> np.ndarray:
+        '''
+        The flat parameter buffer itself, not a copy.
+        '''
+        return self.parameters
+
+    def setWeights_1d(self, weights:np.ndarray):
+        '''
+        Use weights as the parameter buffer of the model without copying it
+        when it is already a contiguous float64 vector, so later changes to
+        weights change the model too. Pass a copy to keep them apart.
+        '''
+        weights = np.ascontiguousarray(weights, dtype=np.float64)
+        if weights.shape != self.parameters.shape:
+            raise DimensionError("Dimension of weights with size: {} does not match the model with {} weights".format(weights.shape, self.num_weights))
+        self._bindParameters(weights)
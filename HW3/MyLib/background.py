@@ -0,0 +1,54 @@
+import queue
+import threading
+from typing import Callable
+
+
+class TrainingJob():
+    '''
+    Runs target(report, cancelled) in a daemon thread, so a long training
+    does not block the Tk main loop. target calls report(**progress) to
+    push a progress dict and should return early once cancelled() is True.
+
+    The UI polls from root.after: poll() returns the progress pushed since
+    the last call without blocking, once done the return value of target
+    is in result (or the exception it raised in error).
+    '''
+    def __init__(self, target: Callable) -> None:
+        self.target = target
+        self.progress = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.result = None
+        self.error = None
+
+    def _run(self) -> None:
+        try:
+            self.result = self.target(self.report, self.cancel_event.is_set)
+        except Exception as e:
+            self.error = e
+
+    def start(self) -> 'TrainingJob':
+        self.thread.start()
+        return self
+
+    def report(self, **progress) -> None:
+        self.progress.put(progress)
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    @property
+    def done(self) -> bool:
+        return self.thread.ident is not None and not self.thread.is_alive()
+
+    def poll(self) -> list[dict]:
+        updates = []
+        while True:
+            try:
+                updates.append(self.progress.get_nowait())
+            except queue.Empty:
+                return updates
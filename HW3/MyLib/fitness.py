@@ -0,0 +1,64 @@
+import numpy as np
+
+from MyLib.simple_playground import Playground, BatchPlayground
+from MyLib.Model import LinearModel
+from MyLib.ActivactionFunction import ActivationFunction, ReLu
+
+MAX_STEPS = 1000  # a car driving in circles never ends its episode, None drives until done
+
+
+class DrivingFitness():
+    '''
+    Fitness of a flattened LinearModel weight vector: the total reward of
+    one driving episode on the given track.
+
+    Plain attributes only, so instances can be pickled and sent to the
+    workers of a ProcessPoolEvaluator.
+    '''
+    def __init__(self, playground_path: str, hidden_dim_list: list[int] = None, activation_func: ActivationFunction = None, max_steps: int = MAX_STEPS) -> None:
+        self.playground = Playground(playground_path)
+        self.model = LinearModel(3, 1, hidden_dim_list if hidden_dim_list is not None else [30], activation_func if activation_func is not None else ReLu())
+        self.max_steps = max_steps
+
+    def __call__(self, x: np.ndarray) -> float:
+        self.model.setWeights_1d(x)
+
+        p = self.playground
+        sensor_output = p.reset()
+        total_reword = 0
+        step = 0
+        while not p.done:
+            wheel_angle = self.model.forward(np.array(sensor_output))
+            sensor_output, reword = p.step(float(wheel_angle[0]))
+            total_reword += reword
+            step += 1
+            if self.max_steps is not None and step >= self.max_steps:
+                break
+        return total_reword
+
+
+class BatchDrivingFitness():
+    '''
+    DrivingFitness for a whole swarm at once: every row of the positions is
+    a car of a BatchPlayground, driven by LinearModel.forward_population.
+    Meant for pso.BatchEvaluator.
+    '''
+    def __init__(self, playground_path: str, hidden_dim_list: list[int] = None, activation_func: ActivationFunction = None, max_steps: int = MAX_STEPS) -> None:
+        self.playground_path = playground_path
+        self.model = LinearModel(3, 1, hidden_dim_list if hidden_dim_list is not None else [30], activation_func if activation_func is not None else ReLu())
+        self.max_steps = max_steps
+
+    def __call__(self, positions: np.ndarray) -> np.ndarray:
+        p = BatchPlayground(self.playground_path, len(positions))
+        sensor_output = p.state
+        total_reword = np.zeros(len(positions))
+        step = 0
+        while not p.done.all():
+            running = ~p.done
+            wheel_angle = self.model.forward_population(positions, sensor_output)
+            sensor_output, reword = p.step(wheel_angle[:, 0])
+            total_reword += np.where(running, reword, 0)
+            step += 1
+            if self.max_steps is not None and step >= self.max_steps:
+                break
+        return total_reword
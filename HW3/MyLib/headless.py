@@ -0,0 +1,64 @@
+import os
+import time
+import argparse
+import numpy as np
+
+from MyLib.simple_playground import Playground
+from MyLib.trajectory import Trajectory
+from MyLib.trajectory_io import save_trajectory, TEXT_FORMATS
+from MyLib.training import default_model, train_model, run_episode, NUMBER_OF_ITERATION, NUMBER_OF_PARTICLE, NUMBER_OF_WORKERS, MAX_STEPS
+
+PLAYGROUND_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "playground", "軌道座標點.txt")
+
+
+def write_car_path(trajectory: Trajectory, path: str) -> None:
+    # same format as App.saveBtn_onclick
+    with open(path, "w") as f:
+        for position in trajectory.positions.tolist():
+            f.write(f"{position}\n")
+
+
+def describe_outcome(playground: Playground) -> str:
+    # an episode ends at the destination, against a wall, or at the step limit
+    if playground.isAtDestination:
+        return "Arrived at destination"
+    return "Crashed" if playground.done else "Stopped at the step limit"
+
+
+def main(args: list[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Train the HW3 PSO + MLP car and drive one episode without the UI")
+    parser.add_argument("--playground", default=PLAYGROUND_PATH)
+    parser.add_argument("--weights", default=None, help=".npy weights to drive with instead of training")
+    parser.add_argument("--iterations", type=int, default=NUMBER_OF_ITERATION)
+    parser.add_argument("--particles", type=int, default=NUMBER_OF_PARTICLE)
+    parser.add_argument("--workers", type=int, default=NUMBER_OF_WORKERS)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--max-steps", type=int, default=MAX_STEPS, help="steps per episode, while training and driving")
+    parser.add_argument("--save-weights", default="weights.npy", help="where the trained weights are saved")
+    parser.add_argument("--output", default="car_path.txt", help="car path of the episode")
+    parser.add_argument("--trajectory", default=None, help="also save every column of the episode, .npy or a course text format")
+    parser.add_argument("--trajectory-format", choices=["npy"] + list(TEXT_FORMATS), default=None, help="default: npy for .npy paths, else track6D")
+    args = parser.parse_args(args)
+
+    model = default_model()
+    start = time.perf_counter()
+    if args.weights:
+        model.setWeights_1d(np.load(args.weights))
+    else:
+        train_model(args.playground, model, args.particles, args.iterations, args.workers, args.seed, args.max_steps)
+        np.save(args.save_weights, model.getWeights_1d())
+        print(f"Trained in {time.perf_counter() - start:.2f} s, weights saved to {args.save_weights}")
+
+    playground = Playground(args.playground)
+    start = time.perf_counter()
+    trajectory = run_episode(playground, model, args.max_steps)
+    elapsed = time.perf_counter() - start
+    write_car_path(trajectory, args.output)
+    if args.trajectory:
+        save_trajectory(trajectory, args.trajectory, args.trajectory_format)
+    print(f"{describe_outcome(playground)} after {len(trajectory)} steps "
+          f"in {elapsed:.2f} s, car path saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
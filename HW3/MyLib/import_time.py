@@ -0,0 +1,38 @@
+import os
+import sys
+import json
+import subprocess
+
+# modules that must load without any plotting or GUI stack, e.g. in worker processes
+HEADLESS_MODULES = ["MyLib.simple_playground", "MyLib.Model", "MyLib.pso", "MyLib.fitness", "MyLib.training", "MyLib.headless", "MyLib.background"]
+PLOTTING_MODULES = ["matplotlib", "tkinter"]
+
+_MEASURE = '''
+import sys, time, json, importlib
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, [name for name in sys.argv[2:] if name in sys.modules]]))
+'''
+
+
+def measure_import(module: str, repeat: int = 5) -> tuple[float, list[str]]:
+    '''
+    Import module in repeat fresh interpreters (MyLib's parent directory as
+    working directory), returns the fastest import time in seconds,
+    including numpy and the other dependencies, and the PLOTTING_MODULES it
+    loaded.
+    '''
+    cwd = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", _MEASURE, module] + PLOTTING_MODULES, cwd=cwd, capture_output=True, text=True, check=True).stdout
+        elapsed, loaded = json.loads(output)
+        times.append(elapsed)
+    return min(times), loaded
+
+
+if __name__ == "__main__":
+    for module in HEADLESS_MODULES + ["MyLib.App"]:
+        elapsed, loaded = measure_import(module)
+        print(f"{module:<28} {elapsed*1000:8.1f} ms  {', '.join(loaded) or '-'}")
@@ -1,42 +1,139 @@
+import os
+import random
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from typing import Callable
 
-class Particle():
-    def __init__(self, dimension) -> None:
-        self.position = np.random.rand(dimension)
-        self.velocity = np.random.rand(dimension)
-        self.local_best_position = self.position
-        self.local_best_fitness = float('-inf')
+
+def _seeded_call(fitness_func: Callable, position: np.ndarray, seed) -> float:
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+    return fitness_func(position)
+
+
+_worker_fitness_func = None
+
+def _init_worker(fitness_func: Callable) -> None:
+    global _worker_fitness_func
+    _worker_fitness_func = fitness_func
+
+def _worker_call(position: np.ndarray, seed) -> float:
+    return _seeded_call(_worker_fitness_func, position, seed)
+
+
+class SerialEvaluator():
+    '''
+    Evaluate the particles one by one in this process.
+
+    With a seed, `random` and `np.random` are reseeded before every call
+    from (seed, number of the call), so a run gives the same fitness values
+    whichever evaluator is used.
+    '''
+    def __init__(self, seed: int = None) -> None:
+        self.seed = seed
+        self.num_calls = 0
+
+    def _next_seeds(self, n: int) -> list:
+        if self.seed is None:
+            return [None] * n
+        seeds = np.random.SeedSequence([self.seed, self.num_calls]).generate_state(n)
+        self.num_calls += 1
+        return [int(s) for s in seeds]
+
+    def map(self, fitness_func: Callable, positions: np.ndarray) -> np.ndarray:
+        seeds = self._next_seeds(len(positions))
+        return np.array([_seeded_call(fitness_func, x, s) for x, s in zip(positions, seeds)], dtype=float)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class ProcessPoolEvaluator(SerialEvaluator):
+    '''
+    Evaluate the particles concurrently in a pool of worker processes.
+
+    fitness_func must be picklable (a module level function or an object
+    such as MyLib.fitness.DrivingFitness), it is sent once to every worker.
+    '''
+    def __init__(self, num_workers: int = None, seed: int = None) -> None:
+        super().__init__(seed)
+        self.num_workers = num_workers or os.cpu_count()
+        self.executor = None
+        self.fitness_func = None
+
+    def map(self, fitness_func: Callable, positions: np.ndarray) -> np.ndarray:
+        if self.executor is None or fitness_func is not self.fitness_func:
+            self.close()
+            self.fitness_func = fitness_func
+            self.executor = ProcessPoolExecutor(self.num_workers, initializer=_init_worker, initargs=(fitness_func,))
+
+        seeds = self._next_seeds(len(positions))
+        chunksize = max(1, len(positions) // self.num_workers)
+        return np.fromiter(self.executor.map(_worker_call, positions, seeds, chunksize=chunksize), dtype=float, count=len(positions))
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+class BatchEvaluator(SerialEvaluator):
+    '''
+    Evaluate the whole swarm with a single call, fitness_func takes the
+    (num_particles, dimension) positions and returns (num_particles,)
+    fitness values, e.g. MyLib.fitness.BatchDrivingFitness.
+    '''
+    def map(self, fitness_func: Callable, positions: np.ndarray) -> np.ndarray:
+        seed = self._next_seeds(1)[0]
+        return np.asarray(_seeded_call(fitness_func, positions, seed), dtype=float)
 
 
 class PSO():
-    def __init__(self, particle_dimension: int, num_particles: int, num_iteration: int, fitness_func: Callable, ro1: float = 0.5, ro2: float = 0.5) -> None:
+    def __init__(self, particle_dimension: int, num_particles: int, num_iteration: int, fitness_func: Callable, ro1: float = 0.5, ro2: float = 0.5, evaluator: SerialEvaluator = None) -> None:
         self.dimension = particle_dimension
         self.num_particles = num_particles
         self.num_iteration = num_iteration
         self.fitness_func = fitness_func
         self.ro1 = ro1
         self.ro2 = ro2
+        self.evaluator = evaluator if evaluator is not None else SerialEvaluator()
 
-        self.particles = [Particle(particle_dimension) for _ in range(num_particles)]
+        # swarm state, one row per particle
+        self.positions = np.random.rand(num_particles, particle_dimension)
+        self.velocities = np.random.rand(num_particles, particle_dimension)
+        self.local_best_positions = self.positions.copy()
+        self.local_best_fitness = np.full(num_particles, float('-inf'))
         self.global_best_position = np.random.rand(particle_dimension)
         self.global_best_fitness = float('-inf')
-    
-    def run(self) -> np.ndarray:
+
+    def run(self, callback: Callable[[int, float], bool] = None) -> np.ndarray:
+        '''
+        callback(iteration, global best fitness) is called after every
+        iteration, the swarm stops early when it returns True
+        '''
         for i in range(self.num_iteration):
-            for particle in self.particles:
-                particle_fitness = self.fitness_func(particle.position)
-
-                if particle_fitness > self.global_best_fitness:
-                    self.global_best_position = particle.position
-                    self.global_best_fitness = particle_fitness
-                if particle_fitness > particle.local_best_fitness:
-                    particle.local_best_position = particle.position
-                    particle.local_best_fitness = particle_fitness
-                    
-                particle.velocity = particle.velocity + self.ro1 * (particle.local_best_position - particle.position) + self.ro2 * (self.global_best_position - particle.position)
-                # add velocity limit if needed
-                particle.position = particle.position + particle.velocity
+            fitness = self.evaluator.map(self.fitness_func, self.positions)
+
+            best = np.argmax(fitness)
+            if fitness[best] > self.global_best_fitness:
+                self.global_best_position = self.positions[best].copy()
+                self.global_best_fitness = float(fitness[best])
+            improved = fitness > self.local_best_fitness
+            self.local_best_positions[improved] = self.positions[improved]
+            self.local_best_fitness[improved] = fitness[improved]
+
+            self.velocities += self.ro1 * (self.local_best_positions - self.positions) + self.ro2 * (self.global_best_position - self.positions)
+            # add velocity limit if needed
+            self.positions += self.velocities
             print(f'Iter: {i+1}, Global best fitness: {self.global_best_fitness}')
-            
-        return self.global_best_position
\ No newline at end of file
+            if callback is not None and callback(i, self.global_best_fitness):
+                break
+
+        return self.global_best_position
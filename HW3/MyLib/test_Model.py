@@ -0,0 +1,63 @@
+import numpy as np
+
+from MyLib.Model import LinearModel
+from MyLib.ActivactionFunction import ReLu, Sigmoid
+
+
+def test_batch_forward_matches_single():
+    model = LinearModel(3, 2, [8, 4], Sigmoid())
+    x = np.random.randn(16, 3)
+
+    batch = model.forward(x)
+    single = np.stack([model.forward(row) for row in x])
+
+    assert batch.shape == (16, 2)
+    assert np.allclose(batch, single)
+
+
+def test_batch_update_sums_single_gradients():
+    model = LinearModel(3, 1, [5], ReLu())
+    x = np.random.randn(4, 3)
+    loss_delta = np.random.randn(4, 1)
+    before = [w.copy() for w in model.getWeights()]
+
+    # per sample gradients taken at the same weights
+    expected = [w.copy() for w in before]
+    for row, d in zip(x, loss_delta):
+        model.forward(row)
+        delta = d
+        for i, layer in reversed(list(enumerate(model.layer_list))):
+            delta = layer.backward(delta)
+            expected[i] += 0.01 * np.outer(layer.delta, np.append(layer.in_list, -1))
+
+    model.forward(x)
+    model.backward(loss_delta, 0.01)
+
+    for w, e in zip(model.getWeights(), expected):
+        assert np.allclose(w, e)
+
+
+def test_forward_population_matches_set_weights():
+    model = LinearModel(3, 2, [6], ReLu())
+    population = np.random.randn(5, model.num_weights)
+    x = np.random.randn(5, 7, 3)
+
+    out = model.forward_population(population, x)
+    for p in range(5):
+        model.setWeights_1d(population[p].copy())
+        assert np.allclose(out[p], model.forward(x[p]))
+
+    assert model.forward_population(population, x[:, 0]).shape == (5, 2)
+
+
+def test_flat_parameter_buffer_is_shared():
+    model = LinearModel(3, 1, [4], ReLu())
+    weights = np.random.randn(model.num_weights)
+
+    model.setWeights_1d(weights)
+    assert model.getWeights_1d() is weights
+    assert all(np.shares_memory(w, weights) for w in model.getWeights())
+
+    model.forward(np.random.randn(2, 3))
+    model.backward(np.ones((2, 1)), 0.1)
+    assert np.array_equal(np.concatenate([w.ravel() for w in model.getWeights()]), weights)
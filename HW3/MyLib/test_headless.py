@@ -0,0 +1,40 @@
+import numpy as np
+
+from MyLib.headless import main, describe_outcome, PLAYGROUND_PATH
+from MyLib.simple_playground import Playground
+from MyLib.training import default_model, run_episode
+
+
+def test_headless_trains_and_replays(tmp_path):
+    weights, output = tmp_path / "weights.npy", tmp_path / "car_path.txt"
+    main(["--iterations", "2", "--particles", "4", "--seed", "0", "--max-steps", "50", "--save-weights", str(weights), "--output", str(output)])
+    trained_path = output.read_text()
+    assert trained_path.count("\n") > 0
+
+    main(["--weights", str(weights), "--max-steps", "50", "--output", str(output)])
+    assert output.read_text() == trained_path
+    assert np.load(weights).ndim == 1
+
+
+def test_run_episode_steers_with_the_model_output():
+    model = default_model()
+    model.setWeights_1d(np.zeros(model.num_weights))
+    model.layer_list[-1].weights[:, -1] = -30  # constant 30 degree turn, v = x @ kernel - bias
+    playground = Playground(PLAYGROUND_PATH)
+    trajectory = run_episode(playground, model, max_steps=50)
+    assert 0 < len(trajectory) <= 50
+    assert np.all(trajectory["wheel"] == playground.calWheelAngleFromAction(30))
+
+
+def test_headless_tells_a_crash_from_the_step_limit(tmp_path, capsys):
+    weights, output = tmp_path / "weights.npy", tmp_path / "car_path.txt"
+    np.save(weights, np.zeros(default_model().num_weights))
+    main(["--weights", str(weights), "--max-steps", "3", "--output", str(output)])
+    assert capsys.readouterr().out.startswith("Stopped at the step limit after 3 steps")
+
+    model = default_model()
+    model.setWeights_1d(np.zeros(model.num_weights))
+    model.layer_list[-1].weights[:, -1] = -30
+    playground = Playground(PLAYGROUND_PATH)
+    run_episode(playground, model, max_steps=None)
+    assert describe_outcome(playground) == "Crashed"
@@ -0,0 +1,51 @@
+import numpy as np
+
+from MyLib.pso import PSO, SerialEvaluator, ProcessPoolEvaluator, BatchEvaluator
+
+
+def noisy_sphere(x: np.ndarray) -> float:
+    return -np.sum((x - 0.5)**2) + 1e-3*np.random.rand()
+
+
+def sphere(x: np.ndarray) -> np.ndarray:
+    # one position or the (num_particles, dimension) swarm of a BatchEvaluator
+    return -np.sum((np.asarray(x) - 0.5)**2, axis=-1)
+
+
+def test_process_pool_matches_serial():
+    positions = np.random.rand(8, 4)
+    serial = SerialEvaluator(seed=1).map(noisy_sphere, positions)
+    with ProcessPoolEvaluator(num_workers=2, seed=1) as evaluator:
+        pooled = evaluator.map(noisy_sphere, positions)
+
+    assert np.array_equal(serial, pooled)
+
+
+def test_pso_converges_on_sphere():
+    np.random.seed(0)
+    pso = PSO(4, 10, 100, sphere, ro1=0.1, ro2=0.3, evaluator=SerialEvaluator(seed=0))
+    best = pso.run()
+
+    assert best.shape == (4,)
+    assert pso.global_best_fitness > -5e-3
+    assert np.allclose(best, 0.5, atol=0.05)
+
+
+def test_evaluators_give_the_same_run():
+    runs = []
+    for evaluator in [SerialEvaluator(seed=3), ProcessPoolEvaluator(num_workers=2, seed=3), BatchEvaluator(seed=3)]:
+        np.random.seed(0)
+        with evaluator:
+            pso = PSO(4, 8, 10, sphere, ro1=0.1, ro2=0.3, evaluator=evaluator)
+            runs.append((pso.run(), pso.global_best_fitness))
+
+    for best, fitness in runs[1:]:
+        assert np.array_equal(best, runs[0][0]) and fitness == runs[0][1]
+
+
+def test_pso_callback_stops_early():
+    iterations = []
+    pso = PSO(4, 6, 20, noisy_sphere, evaluator=SerialEvaluator(seed=0))
+    pso.run(lambda iteration, best_fitness: iterations.append(best_fitness) or len(iterations) == 3)
+
+    assert len(iterations) == 3 and iterations == sorted(iterations)
@@ -0,0 +1,61 @@
+import numpy as np
+from typing import Callable
+
+from MyLib.simple_playground import Playground
+from MyLib.trajectory import Trajectory
+from MyLib.Model import LinearModel
+from MyLib.ActivactionFunction import ReLu
+from MyLib.pso import PSO, BatchEvaluator, ProcessPoolEvaluator
+from MyLib.fitness import DrivingFitness, BatchDrivingFitness, MAX_STEPS
+
+# Model Variable
+HIDDEN_DIM_LIST = [30]
+
+# PSO Variable
+NUMBER_OF_ITERATION = 1000
+NUMBER_OF_PARTICLE = 10
+RO1 = 0.1
+RO2 = 0.7
+NUMBER_OF_WORKERS = 1  # > 1 evaluates the particles in a process pool, else all cars drive together
+SEED = None
+
+
+def default_model() -> LinearModel:
+    return LinearModel(3, 1, HIDDEN_DIM_LIST, ReLu())
+
+
+def train_model(playground_path: str, model: LinearModel = None, num_particles: int = NUMBER_OF_PARTICLE, num_iteration: int = NUMBER_OF_ITERATION,
+                num_workers: int = NUMBER_OF_WORKERS, seed: int = SEED, max_steps: int = MAX_STEPS, callback: Callable[[int, float], bool] = None) -> LinearModel:
+    '''
+    The PSO training of the App without any UI, the weights of model
+    (default: a new default_model) are set to the best particle.
+    callback is passed to PSO.run and can stop the training early.
+    '''
+    model = model if model is not None else default_model()
+    if num_workers > 1:
+        fitness_func = DrivingFitness(playground_path, HIDDEN_DIM_LIST, ReLu(), max_steps)
+        evaluator = ProcessPoolEvaluator(num_workers, seed=seed)
+    else:
+        fitness_func = BatchDrivingFitness(playground_path, HIDDEN_DIM_LIST, ReLu(), max_steps)
+        evaluator = BatchEvaluator(seed=seed)
+
+    with evaluator:
+        pso = PSO(model.num_weights, num_particles, num_iteration, fitness_func, ro1=RO1, ro2=RO2, evaluator=evaluator)
+        model.setWeights_1d(pso.run(callback))
+    return model
+
+
+def run_episode(playground: Playground, model: LinearModel, max_steps: int = MAX_STEPS) -> Trajectory:
+    '''
+    drive one episode with the model, returns playground.trajectory (a new
+    Trajectory if it has none) with the steps of the episode,
+    playground.isAtDestination tells if the car arrived
+    '''
+    p = playground
+    if p.trajectory is None:
+        p.trajectory = Trajectory()
+    sensor_output = p.reset()
+    while not p.done and (max_steps is None or len(p.trajectory) < max_steps):
+        action = float(model.forward(np.array(sensor_output))[0])
+        sensor_output, reword = p.step(action)
+    return p.trajectory
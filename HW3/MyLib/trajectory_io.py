@@ -0,0 +1,155 @@
+import os
+import numpy as np
+
+from MyLib.trajectory import Trajectory, COLUMNS
+
+# columns of an exported .npy file, every step of every episode is one row,
+# step is INITIAL_STEP on the row of Trajectory.initial before the first step
+EXPORT_COLUMNS = ("episode", "step") + COLUMNS
+INITIAL_STEP = -1
+# course text formats, space separated: sensors (front, right, left) and the wheel angle then commanded, track6D
+# with the car center first. A row holds the state before a step, see _text_rows
+TEXT_FORMATS = {
+    "track4D": ("front", "right", "left", "wheel"),
+    "track6D": ("x", "y", "front", "right", "left", "wheel"),
+}
+
+# .npy header of a fixed size, so it can be rewritten with the final number of rows
+_NPY_MAGIC = b"\x93NUMPY\x01\x00"
+_NPY_HEADER_SIZE = 128
+
+_WHEEL = COLUMNS.index("wheel")
+
+
+def _npy_header(n_rows: int) -> bytes:
+    header = f"{{'descr': '<f8', 'fortran_order': False, 'shape': ({n_rows}, {len(EXPORT_COLUMNS)}), }}"
+    header_len = _NPY_HEADER_SIZE - len(_NPY_MAGIC) - 2
+    return _NPY_MAGIC + header_len.to_bytes(2, "little") + header.ljust(header_len - 1).encode("latin1") + b"\n"
+
+
+def _format_of(path: str, format: str = None) -> str:
+    format = format if format is not None else ("npy" if path.endswith(".npy") else "track6D")
+    if format != "npy" and format not in TEXT_FORMATS:
+        raise ValueError(f"unknown trajectory format {format}, use 'npy' or one of {list(TEXT_FORMATS)}")
+    return format
+
+
+def _text_rows(trajectory: Trajectory) -> np.ndarray:
+    '''
+    rows of the course formats: the state a step starts from with the wheel
+    angle of the step, i.e. trajectory.initial and the recorded rows but the
+    last, next to the recorded wheel angles. Without initial (episodes read
+    back by split_episodes) the first step has no state and is left out.
+    '''
+    rows = trajectory.rows
+    if len(rows) == 0:
+        return rows
+    wheel = rows[:, _WHEEL]
+    states = rows[:-1]
+    if trajectory.initial is not None:
+        states = np.vstack([trajectory.initial, states])
+    else:
+        wheel = wheel[1:]
+    states = states.copy()
+    states[:, _WHEEL] = wheel
+    return states
+
+
+class TrajectoryWriter():
+    '''
+    Streams episodes to one file, write appends a Trajectory without
+    keeping earlier episodes in memory.
+
+        "npy" (default for .npy paths): every column of every step as float64
+            rows of EXPORT_COLUMNS, the initial state first, a regular .npy
+            file once closed
+        "track4D", "track6D": the course text formats, no episode boundaries
+            and only the columns of TEXT_FORMATS, one row per step with the
+            state before the step
+
+    load_trajectories reads both back.
+    '''
+    def __init__(self, path: str, format: str = None) -> None:
+        self.path = path
+        self.format = _format_of(path, format)
+        self.n_rows = 0
+        self.n_episodes = 0
+        if self.format == "npy":
+            self.file = open(path, "wb")
+            self.file.write(_npy_header(0))
+        else:
+            self.file = open(path, "w")
+            self.columns = [COLUMNS.index(name) for name in TEXT_FORMATS[self.format]]
+
+    def write(self, trajectory: Trajectory) -> None:
+        rows = trajectory.rows
+        if self.format == "npy":
+            steps = np.arange(len(rows), dtype=float)
+            if trajectory.initial is not None:
+                rows = np.vstack([trajectory.initial, rows])
+                steps = np.append(INITIAL_STEP, steps)
+            episode = np.full(len(rows), self.n_episodes, dtype=float)
+            np.column_stack([episode, steps, rows]).astype("<f8").tofile(self.file)
+        else:
+            rows = _text_rows(trajectory)
+            np.savetxt(self.file, rows[:, self.columns], fmt="%.7f")
+        self.n_rows += len(rows)
+        self.n_episodes += 1
+
+    def close(self) -> None:
+        if self.file.closed:
+            return
+        if self.format == "npy":
+            self.file.seek(0)
+            self.file.write(_npy_header(self.n_rows))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def save_trajectory(trajectory: Trajectory, path: str, format: str = None) -> None:
+    with TrajectoryWriter(path, format) as writer:
+        writer.write(trajectory)
+
+
+def load_trajectories(path: str, format: str = None, mmap: bool = True) -> dict[str, np.ndarray]:
+    '''
+    The columns of a file written by TrajectoryWriter, {name: (n_rows,)}.
+    A .npy file is memory-mapped read only unless mmap=False, the columns
+    are views of it, "episode" numbers the episodes from 0 and "step" the
+    steps of an episode, INITIAL_STEP on its initial state.
+    '''
+    format = _format_of(path, format)
+    if format == "npy":
+        rows = np.load(path, mmap_mode="r" if mmap else None)
+        names = EXPORT_COLUMNS
+    else:
+        rows = np.loadtxt(path, ndmin=2) if os.path.getsize(path) else np.zeros((0, len(TEXT_FORMATS[format])))
+        names = TEXT_FORMATS[format]
+    return {name: rows[:, i] for i, name in enumerate(names)}
+
+
+def split_episodes(columns: dict[str, np.ndarray]) -> list[Trajectory]:
+    '''
+    the episodes of a loaded .npy file as Trajectory objects, with their
+    initial state when it was saved
+    '''
+    rows = np.stack([columns[name] for name in COLUMNS], axis=1)
+    if len(rows) == 0:
+        return []
+    boundaries = np.flatnonzero(np.diff(columns["episode"])) + 1
+    trajectories = []
+    for part, steps in zip(np.split(rows, boundaries), np.split(np.asarray(columns["step"]), boundaries)):
+        initial = steps == INITIAL_STEP
+        trajectory = Trajectory(len(part))
+        if initial.any():
+            trajectory.initial = np.array(part[initial][0])
+            part = part[~initial]
+        trajectory.data[:len(part)] = part
+        trajectory.size = len(part)
+        trajectories.append(trajectory)
+    return trajectories
@@ -1,6 +1,11 @@
-
-from MyLib.App import App
+import sys
 
 if __name__ == '__main__':
-    app = App()
-    app.run()
\ No newline at end of file
+    if "--headless" in sys.argv:
+        # no Tk window, e.g. python main.py --headless --iterations 100
+        from MyLib.headless import main
+        main([arg for arg in sys.argv[1:] if arg != "--headless"])
+    else:
+        from MyLib.App import App
+        app = App()
+        app.run()